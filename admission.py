@@ -0,0 +1,190 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from telemetry import counter, gauge, get_logger, histogram
+
+# Admission limits (overridable from .env)
+ADMISSION_REMOTE_SLOTS = int(os.getenv("ADMISSION_REMOTE_SLOTS", "4"))
+ADMISSION_ENCODE_SLOTS = int(os.getenv("ADMISSION_ENCODE_SLOTS", "1"))
+ADMISSION_PER_USER = int(os.getenv("ADMISSION_PER_USER", "2"))
+ADMISSION_PER_GUILD = int(os.getenv("ADMISSION_PER_GUILD", "6"))
+
+QUEUE_WAIT = histogram("clanker_queue_wait_seconds", "Time jobs waited for an admission slot")
+SLOTS_ACTIVE = gauge("clanker_slots_active", "Admission slots currently held")
+QUEUE_DEPTH = gauge("clanker_queue_depth", "Jobs waiting for an admission slot")
+REJECTED = counter("clanker_admission_rejected_total", "Commands refused for being over a user or guild cap")
+log = get_logger("admission")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a user or guild already has as many jobs as it is allowed"""
+
+
+class _Waiter:
+    def __init__(self):
+        self.event = asyncio.Event()  # set whenever the queue moves or the slot is granted
+        self.granted = False
+        self.queued_at = time.monotonic()
+
+
+class SlotPool:
+    """
+    Fixed number of slots handed out first come, first served.
+
+    Callers that find every slot taken wait in a FIFO queue; on_queued(position)
+    is awaited when they join and again every time the queue moves, so the
+    caller can show its place in line.
+    """
+
+    def __init__(self, name: str, slots: int):
+        self.name = name
+        self.slots = max(1, slots)
+        self.active = 0
+        self._waiters = deque()
+        # Metrics
+        self.admitted = 0
+        self.queued_total = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def depth(self) -> int:
+        return len(self._waiters)
+
+    def _update_gauges(self):
+        SLOTS_ACTIVE.set(self.active, pool=self.name)
+        QUEUE_DEPTH.set(len(self._waiters), pool=self.name)
+
+    def _grant(self):
+        while self.active < self.slots and self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.active += 1
+            waiter.event.set()
+        for waiter in self._waiters:
+            waiter.event.set()  # everyone behind moved up
+        self._update_gauges()
+
+    def _record_wait(self, seconds):
+        self.admitted += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        QUEUE_WAIT.observe(seconds, pool=self.name)
+
+    async def acquire(self, on_queued=None):
+        if self.active < self.slots and not self._waiters:
+            self.active += 1
+            self._record_wait(0.0)
+            self._update_gauges()
+            return
+
+        waiter = _Waiter()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        self._update_gauges()
+        try:
+            while not waiter.granted:
+                waiter.event.clear()
+                if on_queued is not None:
+                    try:
+                        await on_queued(self._waiters.index(waiter) + 1)
+                    except Exception as e:
+                        log.warning("queue_listener_failed", pool=self.name, error=e)
+                if not waiter.granted:
+                    await waiter.event.wait()
+        except BaseException:
+            if waiter.granted:
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._grant()
+            raise
+
+        waited = time.monotonic() - waiter.queued_at
+        self._record_wait(waited)
+        log.info("slot_granted", pool=self.name, waited=f"{waited:.1f}")
+
+    def release(self):
+        self.active -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, on_queued=None):
+        await self.acquire(on_queued)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self) -> dict:
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "queue_depth": self.depth(),
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "wait_avg_seconds": self.wait_total / self.admitted if self.admitted else 0.0,
+            "wait_max_seconds": self.wait_max,
+        }
+
+
+class Admission:
+    """
+    Admission control for every generation command.
+
+    remote: slots for jobs that drive Magic Hour / Gemini, so a burst of
+        commands queues here instead of tripping upstream rate limits.
+    encode: slots for local ffmpeg/MoviePy encodes, which are CPU and memory
+        heavy and must not all run at once.
+    job(): caps how many jobs a single user and a single guild can have
+        running or queued; over the cap the command is rejected rather than
+        queued, so one user cannot fill the queue for everyone.
+    """
+
+    def __init__(self, remote_slots: int = ADMISSION_REMOTE_SLOTS, encode_slots: int = ADMISSION_ENCODE_SLOTS,
+                 per_user: int = ADMISSION_PER_USER, per_guild: int = ADMISSION_PER_GUILD):
+        self.remote = SlotPool("remote", remote_slots)
+        self.encode = SlotPool("encode", encode_slots)
+        self.per_user = per_user
+        self.per_guild = per_guild
+        self.user_jobs = {}
+        self.guild_jobs = {}
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def job(self, user_id, guild_id=None):
+        if self.user_jobs.get(user_id, 0) >= self.per_user:
+            self.rejected += 1
+            REJECTED.inc(scope="user")
+            raise AdmissionRejected(f"You already have {self.per_user} jobs running. Wait for one to finish.")
+        if guild_id is not None and self.guild_jobs.get(guild_id, 0) >= self.per_guild:
+            self.rejected += 1
+            REJECTED.inc(scope="guild")
+            raise AdmissionRejected(f"This server already has {self.per_guild} jobs running. Try again shortly.")
+
+        self.user_jobs[user_id] = self.user_jobs.get(user_id, 0) + 1
+        if guild_id is not None:
+            self.guild_jobs[guild_id] = self.guild_jobs.get(guild_id, 0) + 1
+        try:
+            yield
+        finally:
+            self._leave(self.user_jobs, user_id)
+            if guild_id is not None:
+                self._leave(self.guild_jobs, guild_id)
+
+    @staticmethod
+    def _leave(counts, key):
+        counts[key] -= 1
+        if counts[key] <= 0:
+            del counts[key]
+
+    def metrics(self) -> dict:
+        return {
+            "remote": self.remote.metrics(),
+            "encode": self.encode.metrics(),
+            "users_active": len(self.user_jobs),
+            "guilds_active": len(self.guild_jobs),
+            "rejected": self.rejected,
+        }
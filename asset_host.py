@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+
+import aiohttp
+from aiohttp import web
+
+from single_flight import SingleFlight
+from spool import Spool
+from telemetry import get_logger, histogram, span
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Comma-separated backends to publish to at the same time; the first URL wins
+ASSET_HOSTS = os.getenv("ASSET_HOSTS", "local,catbox,litterbox")
+# Public base URL that reaches the local asset server (e.g. https://bot.example.com);
+# the local backend is skipped without it
+ASSET_PUBLIC_URL = os.getenv("ASSET_PUBLIC_URL", "").rstrip("/")
+ASSET_BIND = os.getenv("ASSET_BIND", "0.0.0.0")
+ASSET_PORT = int(os.getenv("ASSET_PORT", "8089"))
+ASSET_DIR = os.getenv("ASSET_DIR", os.path.join(ROOT_DIR, "outputs", "assets"))
+ASSET_URL_TTL = float(os.getenv("ASSET_URL_TTL_HOURS", "24")) * 3600
+ASSET_SECRET_PATH = os.path.join(ROOT_DIR, ".cache", "asset_secret")
+ASSET_URL_CACHE_PATH = os.path.join(ROOT_DIR, ".cache", "asset_urls.json")
+# A remembered link is checked with a HEAD request at most this often
+ASSET_HEAD_INTERVAL = 3600
+# Publish again when a link has less than this left, so whoever it is handed to can still fetch it
+ASSET_URL_MARGIN = 30 * 60
+
+CATBOX_URL = "https://catbox.moe/user/api.php"
+LITTERBOX_URL = "https://litterbox.catbox.moe/resources/internals/api.php"
+LITTERBOX_TTL = 3600  # uploads are made with time=1h
+
+UPLOAD_SECONDS = histogram("clanker_upload_seconds", "Time to publish a file, by host and outcome")
+log = get_logger("assets")
+
+_ASSET_NAME = re.compile(r"^[0-9a-f]{32}\.[A-Za-z0-9]{1,8}$")
+
+
+class HostedAsset:
+    def __init__(self, url, host, expires):
+        self.url = url
+        self.host = host
+        self.expires = expires  # epoch seconds, or None for long-lived links
+
+    def valid_for(self, seconds: float = 0) -> bool:
+        return self.expires is None or self.expires - seconds > time.time()
+
+
+def _asset_secret():
+    """ASSET_SECRET, or a random key kept in .cache so signed links survive restarts"""
+    secret = os.getenv("ASSET_SECRET")
+    if secret:
+        return secret.encode("utf-8")
+    try:
+        with open(ASSET_SECRET_PATH, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        secret = secrets.token_hex(32).encode("utf-8")
+        os.makedirs(os.path.dirname(ASSET_SECRET_PATH), exist_ok=True)
+        with open(ASSET_SECRET_PATH, "wb") as f:
+            f.write(secret)
+        return secret
+
+
+class LocalAssetServer:
+    """
+    Serves published files from ASSET_DIR over the bot's own aiohttp server.
+
+    Files are stored under their content hash, and links are signed with an
+    HMAC over the name and expiry time, so only URLs handed out by publish()
+    work and they stop working after ttl. Range requests are answered by
+    aiohttp's FileResponse, so players and Magic Hour can seek.
+    """
+
+    name = "local"
+
+    def __init__(self, public_url: str = ASSET_PUBLIC_URL, directory: str = ASSET_DIR, bind: str = ASSET_BIND,
+                 port: int = ASSET_PORT, ttl: float = ASSET_URL_TTL, secret: bytes = None):
+        self.public_url = public_url
+        self.directory = directory
+        self.bind = bind
+        self.port = port
+        self.ttl = ttl
+        self.secret = secret or _asset_secret()
+        self._runner = None
+
+    def _sign(self, name, expires):
+        return hmac.new(self.secret, f"{name}:{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def url_for(self, name):
+        expires = int(time.time() + self.ttl)
+        return f"{self.public_url}/assets/{name}?exp={expires}&sig={self._sign(name, expires)}", expires
+
+    async def _serve(self, request):
+        name = request.match_info["name"]
+        try:
+            expires = int(request.query["exp"])
+            signature = request.query["sig"]
+        except (KeyError, ValueError):
+            raise web.HTTPForbidden()
+        if not _ASSET_NAME.match(name) or expires < time.time() \
+                or not hmac.compare_digest(signature, self._sign(name, expires)):
+            raise web.HTTPForbidden()
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            raise web.HTTPNotFound()
+        return web.FileResponse(path, headers={"Cache-Control": "private, max-age=3600"})
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        app = web.Application()
+        app.router.add_get("/assets/{name}", self._serve)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.bind, self.port).start()
+        print(f"[Assets] Serving {self.directory} on {self.bind}:{self.port} as {self.public_url}", flush=True)
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _store_file(self, path, extension):
+        """Copies path into the asset directory under its content hash (blocking)"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        name = f"{digest.hexdigest()[:32]}{extension}"
+        target = os.path.join(self.directory, name)
+        if not os.path.exists(target):
+            tmp_path = f"{target}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return name
+
+    async def publish(self, source, filename, content_type):
+        extension = os.path.splitext(filename)[1] or ".bin"
+        os.makedirs(self.directory, exist_ok=True)
+        if isinstance(source, Spool):
+            # The whole file has to exist before it can be signed and served
+            digest = hashlib.sha256()
+            tmp_path = os.path.join(self.directory, f"incoming-{secrets.token_hex(8)}")
+            try:
+                with open(tmp_path, "wb") as f:
+                    async for data in source.stream():
+                        digest.update(data)
+                        f.write(data)
+                name = f"{digest.hexdigest()[:32]}{extension}"
+                os.replace(tmp_path, os.path.join(self.directory, name))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        else:
+            loop = asyncio.get_running_loop()
+            name = await loop.run_in_executor(None, self._store_file, source, extension)
+        url, expires = self.url_for(name)
+        return url, expires
+
+
+class CatboxHost:
+    """catbox.moe file upload (long-lived links); litterbox=True uses its 1h temporary sibling"""
+
+    def __init__(self, pool, litterbox: bool = False):
+        self.pool = pool
+        self.litterbox = litterbox
+        self.name = "litterbox" if litterbox else "catbox"
+
+    async def publish(self, source, filename, content_type):
+        form = aiohttp.FormData()
+        form.add_field('reqtype', 'fileupload')
+        if self.litterbox:
+            form.add_field('time', '1h')
+        body = source.stream() if isinstance(source, Spool) else open(source, "rb")
+        try:
+            form.add_field('fileToUpload', body, filename=filename, content_type=content_type)
+            async with self.pool.session().post(LITTERBOX_URL if self.litterbox else CATBOX_URL, data=form) as resp:
+                text = (await resp.text()).strip()
+                if resp.status != 200 or not text.startswith('https://'):
+                    raise RuntimeError(f"upload failed ({resp.status}): {text[:200]}")
+        finally:
+            # Also when a faster host won and this upload was cancelled
+            if not isinstance(source, Spool):
+                body.close()
+        return text, time.time() + LITTERBOX_TTL if self.litterbox else None
+
+
+class AssetHosting:
+    """
+    Publishes a file (a path, or a Spool that may still be filling) to every
+    backend at once and returns the first URL that comes back as a
+    HostedAsset; the slower uploads are cancelled. Returns None only when
+    every backend failed.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.wins = {}
+        self.failures = {}
+
+    async def start(self):
+        for backend in self.backends:
+            if hasattr(backend, "start"):
+                await backend.start()
+
+    async def close(self):
+        for backend in self.backends:
+            if hasattr(backend, "close"):
+                await backend.close()
+
+    async def publish(self, source, filename: str = None, content_type: str = "application/octet-stream"):
+        filename = filename or os.path.basename(source)
+        with span("publish", filename=filename) as current:
+            started = time.perf_counter()
+            tasks = {asyncio.ensure_future(backend.publish(source, filename, content_type)): backend
+                     for backend in self.backends}
+            pending = set(tasks)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        backend = tasks[task]
+                        elapsed = time.perf_counter() - started
+                        if task.exception() is None:
+                            url, expires = task.result()
+                            self.wins[backend.name] = self.wins.get(backend.name, 0) + 1
+                            UPLOAD_SECONDS.observe(elapsed, host=backend.name, outcome="ok")
+                            current.set(host=backend.name)
+                            log.info("published", filename=filename, host=backend.name, seconds=f"{elapsed:.2f}",
+                                     url=url)
+                            return HostedAsset(url, backend.name, expires)
+                        self.failures[backend.name] = self.failures.get(backend.name, 0) + 1
+                        UPLOAD_SECONDS.observe(elapsed, host=backend.name, outcome="error")
+                        log.warning("publish_failed", filename=filename, host=backend.name, error=task.exception())
+                return None
+            finally:
+                for task in pending:
+                    task.cancel()
+                for task in tasks:
+                    if task.done() and not task.cancelled():
+                        task.exception()  # losers that failed alongside the winner are already accounted for
+
+
+def default_hosting(pool) -> AssetHosting:
+    """Backends named in ASSET_HOSTS (the local server only when ASSET_PUBLIC_URL is set)"""
+    backends = []
+    for name in (part.strip() for part in ASSET_HOSTS.split(",")):
+        if name == "local":
+            if ASSET_PUBLIC_URL:
+                backends.append(LocalAssetServer())
+            else:
+                print("[Assets] ASSET_PUBLIC_URL not set, local asset server disabled", flush=True)
+        elif name == "catbox":
+            backends.append(CatboxHost(pool))
+        elif name == "litterbox":
+            backends.append(CatboxHost(pool, litterbox=True))
+        elif name:
+            print(f"[Assets] Unknown asset host '{name}' ignored", flush=True)
+    return AssetHosting(backends)
+
+
+def file_sha256(path):
+    """Content hash of a file (blocking; run it in an executor)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AssetURLCache:
+    """
+    Remembers which URL each local file was published under, across restarts.
+
+    Entries are stored in a JSON file with the file's content hash (plus size
+    and mtime, so unchanged files are not re-read), the host and the link's
+    expiry. ensure() returns a remembered link when the file is unchanged, the
+    link has more than margin left and a HEAD request (at most once per
+    ASSET_HEAD_INTERVAL) says it still resolves; otherwise it publishes again.
+    url() answers from memory only, for callers that must not wait.
+    """
+
+    def __init__(self, hosting: AssetHosting, pool, path: str = ASSET_URL_CACHE_PATH,
+                 margin: float = ASSET_URL_MARGIN):
+        self.hosting = hosting
+        self.pool = pool
+        self.path = path
+        self.margin = margin
+        self.inflight = SingleFlight()
+        self._version = 0  # bumped per snapshot, so an older one never overwrites a newer one
+        self._written = 0
+        self._write_lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as e:
+            print(f"[Assets] Ignoring unreadable URL cache at {path}: {e}", flush=True)
+            self.entries = {}
+
+    def _valid(self, entry):
+        return entry["expires"] is None or entry["expires"] - self.margin > time.time()
+
+    def url(self, key: str):
+        entry = self.entries.get(key)
+        return entry["url"] if entry is not None and self._valid(entry) else None
+
+    async def _save(self):
+        """Writes a snapshot of the entries, taken on the loop so the writer thread never sees them change"""
+        self._version += 1
+        snapshot = {key: dict(entry) for key, entry in self.entries.items()}
+        await asyncio.get_running_loop().run_in_executor(None, self._write, self._version, snapshot)
+
+    def _write(self, version, entries):
+        with self._write_lock:
+            if version <= self._written:
+                return  # a newer snapshot is already on disk
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=1)
+            os.replace(tmp_path, self.path)
+            self._written = version
+
+    async def _head_ok(self, url):
+        try:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with self.pool.session().head(url, allow_redirects=True, timeout=timeout) as resp:
+                return resp.status == 200
+        except Exception:
+            return False
+
+    def _fingerprint(self, path, entry):
+        """(sha256, size, mtime) of path, reusing the stored hash when size and mtime match (blocking)"""
+        stat = os.stat(path)
+        if entry is not None and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return entry["sha256"], stat.st_size, stat.st_mtime
+        return file_sha256(path), stat.st_size, stat.st_mtime
+
+    async def _ensure(self, key, path, filename, content_type):
+        loop = asyncio.get_running_loop()
+        entry = self.entries.get(key)
+        sha256, size, mtime = await loop.run_in_executor(None, self._fingerprint, path, entry)
+
+        if entry is not None and entry["sha256"] == sha256 and self._valid(entry):
+            if time.time() - entry["checked"] < ASSET_HEAD_INTERVAL:
+                return entry["url"]
+            if await self._head_ok(entry["url"]):
+                entry["checked"] = time.time()
+                await self._save()
+                return entry["url"]
+            print(f"[Assets] Link for {key} no longer resolves, publishing again", flush=True)
+
+        asset = await self.hosting.publish(path, filename, content_type)
+        if asset is None:
+            return None
+        self.entries[key] = {"sha256": sha256, "size": size, "mtime": mtime, "url": asset.url,
+                             "host": asset.host, "expires": asset.expires, "checked": time.time()}
+        await self._save()
+        return asset.url
+
+    async def ensure(self, key: str, path: str, filename: str = None, content_type: str = "application/octet-stream"):
+        """URL for the file at path, publishing it only when no remembered link is usable"""
+        filename = filename or os.path.basename(path)
+        return await self.inflight.do(key, lambda publish: self._ensure(key, path, filename, content_type))
+
+    async def prewarm(self, items):
+        """ensure() every (key, path, filename, content_type) concurrently; returns how many have a URL"""
+        results = await asyncio.gather(*(self.ensure(*item) for item in items), return_exceptions=True)
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                print(f"[Assets] Prewarming {item[0]} failed: {result}", flush=True)
+        return sum(1 for result in results if isinstance(result, str))
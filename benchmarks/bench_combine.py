@@ -0,0 +1,65 @@
+"""
+Benchmark: combine_audio_video stream-copy path vs MoviePy re-encode.
+
+Generates a synthetic 720p H.264 clip and a narration-length audio track with
+ffmpeg, then muxes them with each mode and reports wall time, CPU seconds
+(this process plus the ffmpeg children) and output size.
+
+    python benchmarks/bench_combine.py --clip-seconds 10 --audio-seconds 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generate_lesson"))
+
+from ffmpeg_tools import run_ffmpeg
+from main import combine_audio_video
+
+
+def make_inputs(workdir, clip_seconds, audio_seconds):
+    video_path = os.path.join(workdir, "clip.mp4")
+    audio_path = os.path.join(workdir, "narration.mp3")
+    run_ffmpeg(["-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=24:duration={clip_seconds}",
+                "-c:v", "libx264", "-preset", "veryfast", "-b:v", "1000k", "-pix_fmt", "yuv420p", video_path])
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=440:duration={audio_seconds}",
+                "-c:a", "libmp3lame", "-b:a", "48k", audio_path])
+    return video_path, audio_path
+
+
+def cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def measure(mode, video_path, audio_path, output_path):
+    wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+    result = combine_audio_video(video_path, audio_path, output_path, mode=mode)
+    wall, cpu = time.perf_counter() - wall_start, cpu_seconds() - cpu_start
+    size_mb = os.path.getsize(result) / 1024 / 1024 if result else 0.0
+    return wall, cpu, size_mb, result is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clip-seconds", type=float, default=10)
+    parser.add_argument("--audio-seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        video_path, audio_path = make_inputs(workdir, args.clip_seconds, args.audio_seconds)
+        rows = []
+        for mode in ("copy", "reencode"):
+            output_path = os.path.join(workdir, f"out_{mode}.mp4")
+            rows.append((mode,) + measure(mode, video_path, audio_path, output_path))
+
+    print()
+    print(f"{'mode':<10}{'wall (s)':>10}{'cpu (s)':>10}{'size (MB)':>12}  ok")
+    for mode, wall, cpu, size_mb, ok in rows:
+        print(f"{mode:<10}{wall:>10.2f}{cpu:>10.2f}{size_mb:>12.2f}  {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: event loop lag while lesson combines run on a thread vs in an EncodePool.
+
+Runs --jobs MoviePy re-encodes (the GIL-heavy combine path) at once, first on
+the default thread pool as the bot used to, then in an EncodePool, while a
+timer on the event loop records how late each 50ms wakeup is. Also times a
+job killed by the memory limit and one killed by the timeout.
+
+    python benchmarks/bench_encode_lag.py --jobs 2 --clip-seconds 5 --audio-seconds 15
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generate_lesson"))
+
+from bench_combine import make_inputs
+from encode_pool import EncodeError, EncodePool
+from main import moviepy_reencode_audio_video
+
+TICK = 0.05
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))]
+
+
+async def lag_during(work):
+    """Runs the work coroutine while sampling loop lag; returns (wall seconds, lag samples)"""
+    loop = asyncio.get_running_loop()
+    samples = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            due = loop.time() + TICK
+            await asyncio.sleep(TICK)
+            samples.append(max(0.0, loop.time() - due))
+
+    tick_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    try:
+        await work
+    finally:
+        done.set()
+        await tick_task
+    return time.perf_counter() - started, samples
+
+
+def hold_memory(mb, seconds):
+    """Job for the memory-limit check (run as bench_encode_lag.hold_memory, since workers do not run __main__)"""
+    block = bytearray(mb * 1024 * 1024)
+    time.sleep(seconds)
+    return len(block)
+
+
+async def run(args, workdir, video_path, audio_path):
+    loop = asyncio.get_running_loop()
+    outputs = [os.path.join(workdir, f"out_{n}.mp4") for n in range(args.jobs)]
+
+    threaded = asyncio.gather(*(loop.run_in_executor(None, moviepy_reencode_audio_video, video_path, audio_path,
+                                                     output) for output in outputs))
+    rows = [("thread pool",) + await lag_during(threaded)]
+
+    pool = EncodePool(args.jobs, memory_limit_mb=args.memory_limit_mb)
+    pool.start()
+    await asyncio.sleep(3)  # let the workers boot, as they do in the bot right after login
+    pooled = asyncio.gather(*(pool.run(moviepy_reencode_audio_video, video_path, audio_path, output)
+                              for output in outputs))
+    rows.append(("encode pool",) + await lag_during(pooled))
+
+    print(f"\n{args.jobs} concurrent MoviePy combines ({args.clip_seconds:g}s clip, {args.audio_seconds:g}s audio)")
+    print(f"{'runner':<14}{'wall (s)':>10}{'lag p50 (ms)':>14}{'lag p99 (ms)':>14}{'lag max (ms)':>14}")
+    for name, wall, samples in rows:
+        print(f"{name:<14}{wall:>10.2f}{percentile(samples, 50) * 1000:>14.1f}"
+              f"{percentile(samples, 99) * 1000:>14.1f}{max(samples) * 1000:>14.1f}")
+
+    from bench_encode_lag import hold_memory as memory_job
+    for label, job in (("memory limit", pool.run(memory_job, int(args.memory_limit_mb * 2), 10)),
+                       ("timeout", pool.run(time.sleep, args.timeout * 3, timeout=args.timeout))):
+        started = time.perf_counter()
+        try:
+            await job
+            print(f"{label}: job was not stopped")
+        except EncodeError as e:
+            print(f"{label}: worker killed after {time.perf_counter() - started:.1f}s ({e})")
+    print(f"peak worker RSS {pool.peak_rss / 1024 / 1024:.0f}MB, {pool.killed} worker(s) killed")
+    await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--clip-seconds", type=float, default=5)
+    parser.add_argument("--audio-seconds", type=float, default=15)
+    parser.add_argument("--timeout", type=float, default=2, help="timeout for the timeout check (s)")
+    parser.add_argument("--memory-limit-mb", type=float, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        video_path, audio_path = make_inputs(workdir, args.clip_seconds, args.audio_seconds)
+        asyncio.run(run(args, workdir, video_path, audio_path))
+
+
+if __name__ == "__main__":
+    main()
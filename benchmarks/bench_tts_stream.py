@@ -0,0 +1,133 @@
+"""
+Benchmark: buffered TTS upload (concatenate every chunk, then upload) vs the
+streamed Spool upload used by generate_tts_audio.
+
+A fake synthesizer yields MP3-sized chunks at a fixed rate, like edge_tts
+does, and a local stub stands in for catbox, reading the upload at a capped
+bandwidth. Each run happens in a fresh process so peak RSS is not polluted by
+the previous one. Reports time-to-URL and peak RSS growth for a short and a
+long script.
+
+    python benchmarks/bench_tts_stream.py --synth-mbps 2 --upload-mbps 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spool import Spool
+
+CHUNK_SIZE = 4096
+# Roughly what edge_tts produces per character of script at 48 kbit/s
+BYTES_PER_CHAR = 400
+SCRIPTS = {"short": 400, "long": 40000}
+
+
+async def fake_tts(chars, synth_mbps):
+    total = chars * BYTES_PER_CHAR
+    delay = CHUNK_SIZE / (synth_mbps * 1024 * 1024)
+    sent = 0
+    while sent < total:
+        size = min(CHUNK_SIZE, total - sent)
+        await asyncio.sleep(delay)
+        sent += size
+        yield os.urandom(size)
+
+
+async def start_stub_host(upload_mbps):
+    async def upload(request):
+        # Read at a capped rate and throw the bytes away, like a remote host would
+        received = 0
+        async for data in request.content.iter_chunked(64 * 1024):
+            received += len(data)
+            await asyncio.sleep(len(data) / (upload_mbps * 1024 * 1024))
+        return web.Response(text=f"https://files.example/{received}.mp3")
+
+    app = web.Application(client_max_size=1024 ** 3)
+    app.router.add_post("/api.php", upload)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/api.php"
+
+
+async def upload_buffered(session, url, chunks):
+    # The previous generate_tts_audio: concatenate everything, then upload
+    audio_data = b""
+    async for data in chunks:
+        audio_data += data
+    form = aiohttp.FormData()
+    form.add_field("reqtype", "fileupload")
+    form.add_field("fileToUpload", audio_data, filename="tts.mp3", content_type="audio/mpeg")
+    async with session.post(url, data=form) as resp:
+        return (await resp.text()).strip()
+
+
+async def upload_streamed(session, url, chunks):
+    spool = Spool()
+    synthesis = asyncio.ensure_future(spool.fill(chunks))
+    try:
+        await spool.wait_for_data()
+        form = aiohttp.FormData()
+        form.add_field("reqtype", "fileupload")
+        form.add_field("fileToUpload", spool.stream(), filename="tts.mp3", content_type="audio/mpeg")
+        async with session.post(url, data=form) as resp:
+            return (await resp.text()).strip()
+    finally:
+        await synthesis
+        spool.close()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+async def child(mode, chars, synth_mbps, upload_mbps):
+    runner, url = await start_stub_host(upload_mbps)
+    upload = upload_buffered if mode == "buffered" else upload_streamed
+    async with aiohttp.ClientSession() as session:
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        result = await upload(session, url, fake_tts(chars, synth_mbps))
+        elapsed = time.perf_counter() - started
+    await runner.cleanup()
+    print(json.dumps({"seconds": elapsed, "rss_growth_mb": peak_rss_mb() - baseline, "url": result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synth-mbps", type=float, default=2.0, help="fake synthesis speed (MB/s)")
+    parser.add_argument("--upload-mbps", type=float, default=4.0, help="stub host read speed (MB/s)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "CHARS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.child[0], int(args.child[1]), args.synth_mbps, args.upload_mbps))
+        return
+
+    print(f"{'script':<8}{'mode':<10}{'audio (MB)':>11}{'time-to-URL (s)':>17}{'peak RSS +MB':>14}")
+    for name, chars in SCRIPTS.items():
+        for mode in ("buffered", "streamed"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, str(chars),
+                 "--synth-mbps", str(args.synth_mbps), "--upload-mbps", str(args.upload_mbps)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            row = json.loads(out.strip().splitlines()[-1])
+            audio_mb = chars * BYTES_PER_CHAR / 1024 / 1024
+            print(f"{name:<8}{mode:<10}{audio_mb:>11.2f}{row['seconds']:>17.2f}{row['rss_growth_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Local stand-in for the Magic Hour and Gemini (text + Veo) APIs, so the bot's
+own orchestration can be exercised and measured without credentials or
+credits.
+
+Magic Hour: POST /v1/{text-to-video,image-to-video,animation,face-swap,
+lip-sync,ai-talking-photo,ai-voice-generator} start a project that renders
+for a sampled time; GET /v1/{video,audio}-projects/{id} reports it and
+/outputs/{id}.{mp4,mp3} serves the result. /v1/files/upload-urls and the
+matching PUT accept uploads.
+
+Gemini: POST /v1beta/models/{model}:generateContent and
+:streamGenerateContent (SSE) return a short script, :generateVideo starts a
+Veo operation polled at GET /v1beta/operations/{id}, whose video is served at
+/v1beta/files/{id}:download (or inline with --veo-inline).
+
+Latencies take a distribution: fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA
+or exp:MEAN (seconds). GET /_stats returns request counts per route.
+
+    python benchmarks/fake_backends.py --port 8090 --render-time lognormal:8,0.4
+    MAGIC_HOUR_API_BASE=http://127.0.0.1:8090/v1 GEMINI_API_BASE=http://127.0.0.1:8090/v1beta python bot.py
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+from aiohttp import web
+
+MAGIC_HOUR_ENDPOINTS = {
+    "text-to-video": "video",
+    "image-to-video": "video",
+    "animation": "video",
+    "face-swap": "video",
+    "lip-sync": "video",
+    "ai-talking-photo": "video",
+    "ai-voice-generator": "audio",
+}
+SCRIPT_SENTENCES = [
+    "Every living thing is made of tiny building blocks called cells.",
+    "Cells take in food and turn it into the energy they need to work.",
+    "Some cells carry oxygen, while others fight germs or send signals.",
+    "When many cells work together, they form tissues and organs.",
+    "So the next time you move a finger, thank billions of busy cells.",
+]
+SERVE_CHUNK = 64 * 1024
+
+
+def parse_distribution(spec: str):
+    """'lognormal:8,0.4' -> a function returning a sampled number of seconds"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / values[0])
+    raise argparse.ArgumentTypeError(f"unknown distribution '{spec}'")
+
+
+def distribution_median(spec: str) -> float:
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "uniform":
+        return (values[0] + values[1]) / 2
+    if kind == "exp":
+        return values[0] * math.log(2)
+    return values[0]
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("fake backends")
+    group.add_argument("--api-latency", default="uniform:0.02,0.08", help="per-request API latency")
+    group.add_argument("--render-time", default="lognormal:8,0.4", help="Magic Hour render time")
+    group.add_argument("--veo-time", default="lognormal:12,0.3", help="Veo operation time")
+    group.add_argument("--gemini-latency", default="lognormal:1.5,0.3", help="time to write a whole script")
+    group.add_argument("--create-error-rate", type=float, default=0.0, help="share of project creates answered 500")
+    group.add_argument("--render-error-rate", type=float, default=0.0, help="share of renders that end in error")
+    group.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of Gemini calls answered 429")
+    group.add_argument("--video-kb", type=int, default=2048, help="size of each output video")
+    group.add_argument("--audio-kb", type=int, default=160, help="size of each output audio file")
+    group.add_argument("--media", choices=["random", "real"], default="random",
+                       help="serve random bytes, or real clips made with ffmpeg (needed by /generate_lesson)")
+    group.add_argument("--veo-inline", action="store_true", help="return Veo videos inline as base64")
+
+
+def backend_argv(args) -> list:
+    """The fake-backend options in args, as command-line arguments for a child process"""
+    argv = []
+    for name in ("api_latency", "render_time", "veo_time", "gemini_latency", "create_error_rate",
+                 "render_error_rate", "rate_limit_rate", "video_kb", "audio_kb", "media"):
+        argv += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    if args.veo_inline:
+        argv.append("--veo-inline")
+    return argv
+
+
+def make_media(workdir: str, video_kb: int, audio_kb: int):
+    """Short real clips (via MoviePy's ffmpeg) near the requested sizes"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generate_lesson"))
+    from ffmpeg_tools import run_ffmpeg
+
+    seconds = 5
+    video = os.path.join(workdir, "sample.mp4")
+    audio = os.path.join(workdir, "sample.mp3")
+    run_ffmpeg(["-f", "lavfi", "-i", f"testsrc=duration={seconds}:size=640x360:rate=24",
+                "-c:v", "libx264", "-b:v", f"{max(video_kb * 8 // seconds, 50)}k", "-pix_fmt", "yuv420p", video])
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=duration={max(audio_kb * 8 // 64, 1)}",
+                "-c:a", "libmp3lame", "-b:a", "64k", audio])
+    return video, audio
+
+
+class FakeBackends:
+    def __init__(self, args):
+        self.args = args
+        self.api_latency = parse_distribution(args.api_latency)
+        self.render_time = parse_distribution(args.render_time)
+        self.veo_time = parse_distribution(args.veo_time)
+        self.gemini_latency = parse_distribution(args.gemini_latency)
+        self.projects = {}
+        self.operations = {}
+        self.requests = Counter()
+        self.injected = Counter()
+        self.bytes_served = 0
+        self.workdir = tempfile.mkdtemp(prefix="fake_backends_")
+        if args.media == "real":
+            self.video_file, self.audio_file = make_media(self.workdir, args.video_kb, args.audio_kb)
+        else:
+            self.video_file = self.audio_file = None
+        # One random block, reused for every byte served
+        self.block = os.urandom(SERVE_CHUNK)
+        self.base_url = None
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/v1/files/upload-urls", self.upload_urls)
+        app.router.add_put("/uploads/{name}", self.upload)
+        app.router.add_post("/v1/{endpoint}", self.create_project)
+        app.router.add_get("/v1/{project_type}-projects/{project_id}", self.project_status)
+        app.router.add_get("/outputs/{name}", self.output)
+        app.router.add_post("/v1beta/models/{model_action}", self.gemini)
+        app.router.add_get("/v1beta/operations/{operation_id}", self.operation)
+        app.router.add_get("/v1beta/files/{name}", self.veo_file)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+    async def _latency(self, route: str):
+        self.requests[route] += 1
+        await asyncio.sleep(self.api_latency())
+
+    # Magic Hour
+
+    async def create_project(self, request):
+        endpoint = request.match_info["endpoint"]
+        if endpoint not in MAGIC_HOUR_ENDPOINTS:
+            raise web.HTTPNotFound()
+        await self._latency(f"POST /v1/{endpoint}")
+        await request.read()
+        if random.random() < self.args.create_error_rate:
+            self.injected["create_error"] += 1
+            return web.json_response({"message": "Injected server error"}, status=500)
+        project_id = uuid.uuid4().hex[:16]
+        self.projects[project_id] = {
+            "type": MAGIC_HOUR_ENDPOINTS[endpoint],
+            "ready_at": time.monotonic() + self.render_time(),
+            "fail": random.random() < self.args.render_error_rate,
+        }
+        return web.json_response({"id": project_id, "credits_charged": 10})
+
+    async def project_status(self, request):
+        project_type = request.match_info["project_type"]
+        await self._latency(f"GET /v1/{project_type}-projects")
+        project_id = request.match_info["project_id"]
+        project = self.projects.get(project_id)
+        if project is None:
+            return web.json_response({"message": "Project not found"}, status=404)
+        if time.monotonic() < project["ready_at"]:
+            return web.json_response({"id": project_id, "status": "rendering"})
+        if project["fail"]:
+            self.injected["render_error"] += 1
+            return web.json_response({"id": project_id, "status": "error",
+                                      "error": {"message": "Injected render failure"}})
+        extension = "mp3" if project["type"] == "audio" else "mp4"
+        return web.json_response({
+            "id": project_id, "status": "complete", "credits_charged": 10,
+            "downloads": [{"url": f"{self.base_url}/outputs/{project_id}.{extension}", "expires_at": None}],
+        })
+
+    async def _serve(self, request, path, size, content_type):
+        if path is not None:
+            self.bytes_served += os.path.getsize(path)
+            return web.FileResponse(path, headers={"Content-Type": content_type})
+        resp = web.StreamResponse(headers={"Content-Type": content_type, "Content-Length": str(size)})
+        await resp.prepare(request)
+        sent = 0
+        while sent < size:
+            data = self.block[:min(SERVE_CHUNK, size - sent)]
+            await resp.write(data)
+            sent += len(data)
+        self.bytes_served += sent
+        await resp.write_eof()
+        return resp
+
+    async def output(self, request):
+        await self._latency("GET /outputs")
+        if request.match_info["name"].endswith(".mp3"):
+            return await self._serve(request, self.audio_file, self.args.audio_kb * 1024, "audio/mpeg")
+        return await self._serve(request, self.video_file, self.args.video_kb * 1024, "video/mp4")
+
+    async def upload_urls(self, request):
+        await self._latency("POST /v1/files/upload-urls")
+        items = (await request.json()).get("items") or [{}]
+        result = []
+        for item in items:
+            name = f"{uuid.uuid4().hex[:12]}.{item.get('extension', 'bin')}"
+            result.append({"upload_url": f"{self.base_url}/uploads/{name}", "file_path": f"api-assets/{name}"})
+        return web.json_response({"items": result})
+
+    async def upload(self, request):
+        await self._latency("PUT /uploads")
+        async for _ in request.content.iter_chunked(SERVE_CHUNK):
+            pass
+        return web.Response()
+
+    # Gemini
+
+    async def gemini(self, request):
+        model, _, action = request.match_info["model_action"].partition(":")
+        await self._latency(f"POST /v1beta/models:{action}")
+        body = await request.json()
+        if random.random() < self.args.rate_limit_rate:
+            self.injected["rate_limited"] += 1
+            return web.json_response({"error": {"code": 429, "message": "Injected rate limit"}}, status=429)
+        # Reject malformed requests like the real API, so client payload bugs show up here
+        required = "prompt" if action == "generateVideo" else "contents"
+        if not body.get(required):
+            return web.json_response({"error": {"code": 400, "message": f"Missing required field: {required}"}},
+                                     status=400)
+
+        if action == "generateVideo":
+            operation_id = uuid.uuid4().hex[:16]
+            self.operations[operation_id] = time.monotonic() + self.veo_time()
+            return web.json_response({"name": f"operations/{operation_id}"})
+
+        script = " ".join(random.sample(SCRIPT_SENTENCES, 3))
+        if action == "generateContent":
+            await asyncio.sleep(self.gemini_latency())
+            return web.json_response({"candidates": [{"content": {"parts": [{"text": script}]}}]})
+        if action == "streamGenerateContent":
+            pieces = [script[i:i + 24] for i in range(0, len(script), 24)]
+            delay = self.gemini_latency() / len(pieces)
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            for piece in pieces:
+                await asyncio.sleep(delay)
+                event = {"candidates": [{"content": {"parts": [{"text": piece}]}}]}
+                await resp.write(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            await resp.write_eof()
+            return resp
+        raise web.HTTPNotFound()
+
+    async def operation(self, request):
+        await self._latency("GET /v1beta/operations")
+        operation_id = request.match_info["operation_id"]
+        ready_at = self.operations.get(operation_id)
+        if ready_at is None:
+            return web.json_response({"error": {"code": 404, "message": "Operation not found"}}, status=404)
+        if time.monotonic() < ready_at:
+            return web.json_response({"name": f"operations/{operation_id}", "done": False})
+        if self.args.veo_inline:
+            if self.video_file is not None:
+                with open(self.video_file, "rb") as f:
+                    data = f.read()
+            else:
+                data = self.block * (self.args.video_kb * 1024 // SERVE_CHUNK + 1)
+                data = data[:self.args.video_kb * 1024]
+            self.bytes_served += len(data)
+            video = {"bytesBase64Encoded": base64.b64encode(data).decode(), "mimeType": "video/mp4"}
+        else:
+            video = {"uri": f"{self.base_url}/v1beta/files/{operation_id}:download?alt=media"}
+        return web.json_response({"name": f"operations/{operation_id}", "done": True,
+                                  "response": {"generatedVideos": [{"video": video}]}})
+
+    async def veo_file(self, request):
+        await self._latency("GET /v1beta/files")
+        return await self._serve(request, self.video_file, self.args.video_kb * 1024, "video/mp4")
+
+    async def stats(self, request):
+        return web.json_response({
+            "requests": dict(self.requests),
+            "injected": dict(self.injected),
+            "projects": len(self.projects),
+            "operations": len(self.operations),
+            "bytes_served": self.bytes_served,
+        })
+
+    def cleanup(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+async def serve(args):
+    backends = FakeBackends(args)
+    runner = web.AppRunner(backends.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, args.host, args.port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    backends.base_url = f"http://{args.host}:{port}"
+    # First line is machine-readable for benchmarks/load_test.py
+    print(backends.base_url, flush=True)
+    print(f"MAGIC_HOUR_API_BASE={backends.base_url}/v1", flush=True)
+    print(f"GEMINI_API_BASE={backends.base_url}/v1beta", flush=True)
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        backends.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090, help="0 picks a free port")
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Load test: N concurrent slash-command invocations against the fake backends.
+
+Starts benchmarks/fake_backends.py in a child process, points the bot's
+Magic Hour and Gemini clients at it (MAGIC_HOUR_API_BASE / GEMINI_API_BASE),
+then runs the real command callbacks from bot.py with stand-in interactions,
+so admission, polling, caching, downloads and delivery all run as in
+production. Each invocation uses a unique prompt so the result cache never
+answers for it. Reports p50/p95/p99 end-to-end latency per command, outcome
+counts, upstream requests by route and peak RSS.
+
+    python benchmarks/load_test.py --invocations 50 --concurrency 20 --mix text2video=3,animate=1,veo=1
+    python benchmarks/load_test.py --invocations 6 --mix generate_lesson=1 --media real
+
+Bot logs go to load_test.log, and the final /metrics snapshot to metrics.prom,
+in a scratch directory that is removed afterwards (--keep leaves it; --verbose
+prints the logs instead).
+Admission limits come from the usual ADMISSION_* environment variables.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import aiohttp
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import fake_backends
+
+COMMANDS = ["text2video", "img2video", "animate", "faceswap", "lipsync", "talkingphoto", "veo", "generate_lesson"]
+SAMPLE_IMAGE = "https://example.com/face.png"
+SAMPLE_VIDEO = "https://example.com/clip.mp4"
+SAMPLE_AUDIO = "https://example.com/voice.mp3"
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def percentile(values, p):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))]
+
+
+def parse_mix(spec: str) -> list:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in COMMANDS:
+            raise argparse.ArgumentTypeError(f"unknown command '{name}' (choose from {', '.join(COMMANDS)})")
+        mix += [name] * int(weight or 1)
+    return mix
+
+
+class FakeMessage:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def edit(self, **kwargs):
+        self.interaction.edits += 1
+
+    async def delete(self):
+        pass
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, embed=None, file=None, **kwargs):
+        if file is not None:
+            # Read the attachment like discord.py would when uploading it
+            self.interaction.delivered_bytes += sum(len(chunk) for chunk in iter(lambda: file.fp.read(64 * 1024), b""))
+        self.interaction.sent.append((content, embed, file is not None))
+        return FakeMessage(self.interaction)
+
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_message(self, *args, **kwargs):
+        self.done = True
+
+    def is_done(self):
+        return self.done
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the command callbacks"""
+
+    def __init__(self, user_id: int, guild_id: int):
+        self.user = SimpleNamespace(id=user_id)
+        self.guild_id = guild_id
+        # 25MB: a level 2 boosted server
+        self.guild = SimpleNamespace(id=guild_id, filesize_limit=25 * 1024 * 1024)
+        self.application_id = 1
+        self.token = uuid.uuid4().hex
+        self.channel_id = guild_id  # one channel per guild, for the status edit limits
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(self)
+        self.sent = []
+        self.edits = 0
+        self.delivered_bytes = 0
+
+    async def edit_original_response(self, **kwargs):
+        self.edits += 1
+
+    def outcome(self) -> str:
+        if any(has_file for _, _, has_file in self.sent):
+            return "delivered"
+        if any(embed is not None for _, embed, _ in self.sent):
+            return "link"
+        return "failed"
+
+
+async def invoke(bot, command: str, n: int, interaction: FakeInteraction) -> str:
+    prompt = f"load test {n} {uuid.uuid4().hex[:8]}"
+    if command == "veo":
+        # Not a slash command yet; call the generator directly
+        result, error = await bot.generate_video_with_gemini(prompt)
+        if result and os.path.exists(result["video_path"]):
+            os.remove(result["video_path"])
+        return "delivered" if result else "failed"
+    callbacks = {
+        "text2video": lambda: bot.text2video.callback(interaction, prompt=prompt, duration=5),
+        "img2video": lambda: bot.img2video.callback(interaction, image_url=SAMPLE_IMAGE, prompt=prompt, duration=5),
+        "animate": lambda: bot.animate.callback(interaction, prompt=prompt, duration=3),
+        "faceswap": lambda: bot.faceswap.callback(interaction, video_url=f"{SAMPLE_VIDEO}?{n}", face_image_url=SAMPLE_IMAGE),
+        "lipsync": lambda: bot.lipsync.callback(interaction, video_url=f"{SAMPLE_VIDEO}?{n}", audio_url=SAMPLE_AUDIO),
+        "talkingphoto": lambda: bot.talkingphoto.callback(interaction, image_url=f"{SAMPLE_IMAGE}?{n}", audio_url=SAMPLE_AUDIO),
+        "generate_lesson": lambda: bot.generate_lesson.callback(interaction, topic=prompt),
+    }
+    await callbacks[command]()
+    return interaction.outcome()
+
+
+def seed_poll_stats(path: str, args):
+    """Gives the adaptive poller a warm history matching the fake render times"""
+    render = fake_backends.distribution_median(args.render_time)
+    veo = fake_backends.distribution_median(args.veo_time)
+    samples = {kind: [render] * 10 for kind in
+               ("text-to-video", "image-to-video", "animation", "face-swap", "lip-sync", "ai-talking-photo", "voice")}
+    samples["veo"] = [veo] * 10
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(samples, f)
+
+
+async def run(args, base_url: str, log):
+    import bot
+    import telemetry
+
+    bot.job_store.start()
+    mix = parse_mix(args.mix)
+    limiter = asyncio.Semaphore(args.concurrency)
+    latencies = defaultdict(list)
+    outcomes = Counter()
+    delivered = 0
+
+    async def one(n):
+        nonlocal delivered
+        command = mix[n % len(mix)]
+        interaction = FakeInteraction(user_id=n % args.users, guild_id=n % args.guilds)
+        async with limiter:
+            started = time.perf_counter()
+            try:
+                outcome = await invoke(bot, command, n, interaction)
+            except bot.AdmissionRejected:
+                outcome = "rejected"
+            except Exception as e:
+                print(f"{command} #{n} raised {type(e).__name__}: {e}", file=log, flush=True)
+                outcome = "error"
+            latencies[command].append(time.perf_counter() - started)
+            outcomes[(command, outcome)] += 1
+            delivered += interaction.delivered_bytes
+
+    idle_rss = rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(args.invocations)))
+    wall = time.perf_counter() - started
+    peak_rss = rss_mb()
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/_stats") as resp:
+            upstream = await resp.json()
+
+    with open("metrics.prom", "w", encoding="utf-8") as f:
+        f.write(telemetry.registry.render())
+
+    await bot.api.close()
+    await bot.lesson_api.close()
+    await bot.gemini.close()
+    await bot.encode_pool.close()
+    await bot.status_board.close()
+    await bot.job_store.close()
+    await bot.bot.http_pool.close()
+    return latencies, outcomes, upstream, wall, idle_rss, peak_rss, delivered
+
+
+def report(args, latencies, outcomes, upstream, wall, idle_rss, peak_rss, delivered):
+    print(f"\n{args.invocations} invocations, {args.concurrency} at a time, {wall:.1f}s wall clock")
+    print(f"\n{'command':<16}{'n':>5}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}  outcomes")
+    for command, values in sorted(latencies.items()):
+        counts = ", ".join(f"{outcome} {count}" for (name, outcome), count in sorted(outcomes.items())
+                           if name == command)
+        print(f"{command:<16}{len(values):>5}{percentile(values, 50):>10.2f}{percentile(values, 95):>10.2f}"
+              f"{percentile(values, 99):>10.2f}  {counts}")
+    every = [v for values in latencies.values() for v in values]
+    print(f"{'all':<16}{len(every):>5}{percentile(every, 50):>10.2f}{percentile(every, 95):>10.2f}"
+          f"{percentile(every, 99):>10.2f}")
+
+    print(f"\nUpstream requests ({sum(upstream['requests'].values())} total):")
+    for route, count in sorted(upstream["requests"].items(), key=lambda item: -item[1]):
+        print(f"  {route:<40}{count:>7}")
+    if upstream["injected"]:
+        print(f"Injected failures: {upstream['injected']}")
+    print(f"\nServed {upstream['bytes_served'] / 1024 / 1024:.1f}MB, delivered {delivered / 1024 / 1024:.1f}MB to Discord")
+    print(f"Peak RSS {peak_rss:.0f}MB ({peak_rss - idle_rss:+.0f}MB over idle after import)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invocations", type=int, default=20, help="total command invocations")
+    parser.add_argument("--concurrency", type=int, default=20, help="invocations in flight at once")
+    parser.add_argument("--mix", default="text2video=2,img2video=1,animate=1,veo=1",
+                        help=f"weighted commands, from {', '.join(COMMANDS)}")
+    parser.add_argument("--users", type=int, default=1000, help="distinct users the invocations come from")
+    parser.add_argument("--guilds", type=int, default=100, help="distinct guilds the invocations come from")
+    parser.add_argument("--cold-poll-stats", action="store_true",
+                        help="start the adaptive poller without render history (as on a fresh install)")
+    parser.add_argument("--verbose", action="store_true", help="print bot logs instead of writing load_test.log")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory (logs, job store, outputs)")
+    fake_backends.add_arguments(parser)
+    args = parser.parse_args()
+    parse_mix(args.mix)
+    if "generate_lesson" in args.mix and args.media != "real":
+        print("generate_lesson combines real media: using --media real")
+        args.media = "real"
+
+    server = subprocess.Popen(
+        [sys.executable, fake_backends.__file__, "--port", "0"] + fake_backends.backend_argv(args),
+        stdout=subprocess.PIPE, text=True,
+    )
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        base_url = server.stdout.readline().strip()
+        if not base_url:
+            raise SystemExit("fake backends failed to start")
+        # Everything the bot writes (job store, caches, outputs) goes to a scratch directory
+        os.environ.update({
+            "MAGIC_HOUR_API_BASE": f"{base_url}/v1",
+            "GEMINI_API_BASE": f"{base_url}/v1beta",
+            "MAGIC_HOUR_API_KEY": "fake",
+            "MAGIC_HOUR_API_KEY_PREMIUM": "fake",
+            "GEMINI_API_KEY": "fake",
+            "JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+            "RESULT_CACHE_DIR": os.path.join(workdir, "results"),
+            "POLL_STATS_PATH": os.path.join(workdir, "poll_stats.json"),
+            "ASSET_HOSTS": "",
+        })
+        if not args.cold_poll_stats:
+            seed_poll_stats(os.environ["POLL_STATS_PATH"], args)
+        os.chdir(workdir)
+        print(f"Fake backends at {base_url}; scratch directory {workdir}")
+
+        log = sys.stdout if args.verbose else open(os.path.join(workdir, "load_test.log"), "w", encoding="utf-8")
+        with contextlib.redirect_stdout(log):
+            results = asyncio.run(run(args, base_url, log))
+        if log is not sys.stdout:
+            log.close()
+        report(args, *results)
+    finally:
+        server.terminate()
+        server.wait()
+        os.chdir(os.path.dirname(workdir))
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
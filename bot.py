@@ -1,13 +1,21 @@
-import discord
-from discord import app_commands
-from discord.ext import commands
+from startup import startup_timer, LazyModule, CommandSync, warm
+
+with startup_timer.phase("import discord"):
+    import discord
+    from discord import app_commands
+    from discord.ext import commands
 import os
 import aiohttp
 import asyncio
-import io
+import functools
+import inspect
+from contextlib import asynccontextmanager
+import json
 import random
-import edge_tts
+import time
 import sys
+import tempfile
+import traceback
 from dotenv import load_dotenv
 
 # Fix Windows console encoding for Unicode characters
@@ -18,208 +26,253 @@ if sys.platform == 'win32':
 # Add generate_lesson to path
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate_lesson"))
 
-import traceback
-try:
-    from LLM.llm import generate_video_description
-    from text_to_video import generate_text_to_video
-    from text_speech import generate_speech
-    from main import combine_audio_video
-except ImportError as e:
-    print(f"CRITICAL ERROR importing generate_lesson modules: {e}")
-    traceback.print_exc()
-    # Define dummy functions to prevent NameError, but command will fail
-    def generate_video_description(*args): raise ImportError("Module not loaded")
-    def generate_text_to_video(*args): raise ImportError("Module not loaded")
-    def generate_speech(*args): raise ImportError("Module not loaded")
-    def combine_audio_video(*args): raise ImportError("Module not loaded")
-
-
-
+with startup_timer.phase("import bot modules"):
+    from http_pool import HTTPPool
+    from magic_hour_api import MagicHourAPI
+    from poll_strategy import AdaptivePollStrategy
+    from result_cache import default_cache, normalize
+    from single_flight import SingleFlight
+    from spool import Spool
+    from asset_host import AssetURLCache, default_hosting
+    from veo_media import read_veo_response, download_veo_file
+    from admission import Admission, AdmissionRejected
+    from job_store import JobStore, current_job, JOB_RESUME_MAX_AGE
+    from job_poller import POLLS, POLLS_PER_JOB, PollPacer
+    from status_updates import StatusBoard
+    from encode_pool import EncodePool
+    from telemetry import MetricsServer, counter, get_logger, histogram, http_trace_config, span, watch_loop_lag
+    from LLM.gemini_client import GeminiClient, GEMINI_API_BASE
+    from pipeline import run_stages, StageFailed, format_progress, format_timings
+
+# Generation backends are heavy (edge_tts; MoviePy and the magic_hour SDK via
+# the lesson pipeline), so they load on first use or in the background after login
+edge_tts = LazyModule("edge_tts")
+lesson_pipeline = LazyModule("main")
 
 load_dotenv()
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 MAGIC_HOUR_API_KEY = os.getenv("MAGIC_HOUR_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-API_BASE_URL = "https://api.magichour.ai/v1"
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-GEMINI_VEO_URL = "https://generativelanguage.googleapis.com/v1beta/models/veo-3.1-generate-preview:generateVideo"
+GEMINI_VEO_URL = f"{GEMINI_API_BASE}/models/veo-3.1-generate-preview:generateVideo"
+# Interaction followups stop working 15 minutes after the command
+INTERACTION_TOKEN_TTL = 14 * 60
+
+COMMAND_SECONDS = histogram("clanker_command_seconds", "End-to-end slash command latency, by command and outcome")
+DISCORD_BYTES = counter("clanker_discord_upload_bytes_total", "Bytes of video attached to Discord messages")
+log = get_logger("bot")
+
+
+class ClankerBot(commands.Bot):
+    """Bot that owns the shared HTTP connection pool and the job store"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Every upstream call is timed by host and endpoint for /metrics
+        self.http_pool = HTTPPool(trace_configs=[http_trace_config()])
+        self.metrics_server = MetricsServer()
+        self.command_sync = CommandSync(self.tree)
+        self.warmup = None
+        self.logged_in_at = None
+
+    async def login(self, token):
+        # Includes setup_hook
+        with startup_timer.phase("login"):
+            await super().login(token)
+        self.logged_in_at = time.perf_counter()
+
+    async def setup_hook(self):
+        job_store.start()
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            log.warning("metrics_endpoint_unavailable", error=e)
+        await asset_hosting.start()
+        # Encode workers boot (and import the lesson pipeline) in their own processes
+        encode_pool.start()
+        self.loop.create_task(watch_loop_lag())
+        self.loop.create_task(prewarm_characters())
+        # Snapshot before any new command can add jobs of its own
+        self.loop.create_task(resume_jobs(job_store.unfinished()))
+
+    async def close(self):
+        await api.close()
+        await lesson_api.close()
+        await gemini.close()
+        await job_store.close()
+        await asset_hosting.close()
+        await status_board.close()
+        await encode_pool.close()
+        await self.metrics_server.close()
+        await self.http_pool.close()
+        await super().close()
+
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-
-class MagicHourAPI:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-    async def _request(self, method: str, endpoint: str, data: dict = None):
-        async with aiohttp.ClientSession() as session:
-            url = f"{API_BASE_URL}{endpoint}"
-            async with session.request(method, url, headers=self.headers, json=data) as resp:
-                return await resp.json(), resp.status
-
-    async def _poll_project_with_updates(self, project_id: str, interaction: discord.Interaction,
-                                          prompt: str, project_type: str = "video"):
-        """Poll until project is complete with live status updates"""
-        endpoint = f"/{project_type}-projects/{project_id}"
-        last_status = None
-        status_msg = None
-
-        for i in range(120):  # Max 10 minutes
-            result, status = await self._request("GET", endpoint)
-            if status != 200:
-                return None, f"Error checking status: {result}"
-
-            state = result.get("status")
-            print(f"[Poll {i+1}] Project {project_id}: {state}", flush=True)
-
-            # Update Discord message when status changes
-            if state != last_status:
-                last_status = state
-                status_icons = {
-                    "queued": "**Queued** - Waiting in line...",
-                    "rendering": "**Rendering** - Creating your video...",
-                    "complete": "**Complete** - Video ready!"
-                }
-                status_text = status_icons.get(state, f"{state}")
-
-                embed = discord.Embed(
-                    title="Animation in Progress",
-                    description=f"**Prompt:** {prompt}\n\n{status_text}",
-                    color=0xffa500 if state != "complete" else 0x00ff00
-                )
-
-                if status_msg is None:
-                    status_msg = await interaction.followup.send(embed=embed)
-                else:
-                    await status_msg.edit(embed=embed)
-
-            if state == "complete":
-                return result, None
-            elif state == "error":
-                return None, f"Generation failed: {result.get('error', 'Unknown error')}"
-
-            await asyncio.sleep(5)
-        return None, "Timeout: Generation took longer than 10 minutes"
-
-    async def download_video(self, url: str) -> bytes:
-        """Download video from URL"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    return await resp.read()
-                return None
-
-    async def text_to_video(self, prompt: str, duration: int = 5):
-        data = {
-            "end_seconds": duration,
-            "style": {
-                "prompt": prompt
-            }
-        }
-        result, status = await self._request("POST", "/text-to-video", data)
-        if status not in [200, 201]:
-            return None, f"API Error ({status}): {result.get('message', result)}"
-
-        project_id = result.get("id")
-        return await self._poll_project(project_id, "video")
-
-    async def image_to_video(self, image_url: str, prompt: str = "", duration: int = 5):
-        data = {
-            "end_seconds": duration,
-            "assets": {
-                "image_file_path": image_url
-            }
-        }
-        if prompt:
-            data["style"] = {"prompt": prompt}
-        result, status = await self._request("POST", "/image-to-video", data)
-        if status not in [200, 201]:
-            return None, f"API Error ({status}): {result.get('message', result)}"
-
-        project_id = result.get("id")
-        return await self._poll_project(project_id, "video")
-
-    async def face_swap(self, video_url: str, face_image_url: str):
-        data = {
-            "assets": {
-                "video_url": video_url,
-                "face_image_url": face_image_url
-            }
-        }
-        result, status = await self._request("POST", "/face-swap", data)
-        if status not in [200, 201]:
-            return None, f"API Error ({status}): {result.get('message', result)}"
-
-        project_id = result.get("id")
-        return await self._poll_project(project_id, "video")
-
-    async def animation(self, prompt: str, interaction: discord.Interaction, image_url: str = None,
-                        art_style: str = "Photograph", camera_effect: str = "Simple Zoom In",
-                        duration: float = 3, fps: int = 8, audio_url: str = None):
-        data = {
-            "fps": fps,
-            "end_seconds": duration,
-            "height": 576,
-            "width": 576,
-            "style": {
-                "art_style": art_style,
-                "camera_effect": camera_effect,
-                "prompt_type": "custom",
-                "prompt": prompt,
-                "transition_speed": 5
-            },
-            "assets": {
-                "audio_source": "none" if not audio_url else "file",
-            }
-        }
-        if image_url:
-            data["assets"]["image_file_path"] = image_url
-        if audio_url:
-            data["assets"]["audio_file_path"] = audio_url
-        result, status = await self._request("POST", "/animation", data)
-        if status not in [200, 201]:
-            return None, f"API Error ({status}): {result.get('message', result)}"
-
-        project_id = result.get("id")
-        return await self._poll_project_with_updates(project_id, interaction, prompt, "video")
-
-    async def lip_sync(self, video_url: str, audio_url: str):
-        data = {
-            "assets": {
-                "video_url": video_url,
-                "audio_url": audio_url
-            }
-        }
-        result, status = await self._request("POST", "/lip-sync", data)
-        if status not in [200, 201]:
-            return None, f"API Error ({status}): {result.get('message', result)}"
-
-        project_id = result.get("id")
-        return await self._poll_project(project_id, "video")
-
-    async def ai_talking_photo(self, image_url: str, audio_url: str):
-        data = {
-            "assets": {
-                "image_url": image_url,
-                "audio_url": audio_url
-            }
-        }
-        result, status = await self._request("POST", "/ai-talking-photo", data)
-        if status not in [200, 201]:
-            return None, f"API Error ({status}): {result.get('message', result)}"
+bot = ClankerBot(command_prefix="!", intents=intents)
+
+# Learned render times shared by the Magic Hour poller and the Veo loop
+poll_strategy = AdaptivePollStrategy()
+
+
+# Where audio and images go to get a URL Magic Hour can fetch
+asset_hosting = default_hosting(bot.http_pool)
 
-        project_id = result.get("id")
-        return await self._poll_project(project_id, "video")
+# In-flight jobs and upstream projects, kept on disk so a restart can finish them
+job_store = JobStore()
 
+# One MAGIC_HOUR_POLL_QPS budget for every status check the bot sends
+poll_pacer = PollPacer()
+api = MagicHourAPI(MAGIC_HOUR_API_KEY, bot.http_pool, poll_strategy, default_cache(), job_store, poll_pacer)
+# Lesson tools prefer the premium key, so they get their own client (and poller, paced with the one above)
+lesson_api = MagicHourAPI(os.getenv("MAGIC_HOUR_API_KEY_PREMIUM") or MAGIC_HOUR_API_KEY, bot.http_pool, poll_strategy,
+                          default_cache(), job_store, poll_pacer)
+# Brainrot scripts and lesson scripts share one Gemini client (and its connections)
+gemini = GeminiClient(GEMINI_API_KEY, pool=bot.http_pool)
 
-api = MagicHourAPI(MAGIC_HOUR_API_KEY)
+# Caps concurrent generations, local encodes and jobs per user/guild
+admission = Admission()
+
+# Lesson combines run in worker processes (one per encode slot) so MoviePy cannot stall the event loop
+encode_pool = EncodePool(admission.encode.slots, preload=("main",))
+
+# Every progress edit goes through here, coalesced and paced under Discord's edit limits
+status_board = StatusBoard()
+
+
+def queue_notice(interaction: discord.Interaction, what: str):
+    """Queue listener that shows the caller's place in line in the deferred response"""
+    status = status_board.track(interaction.edit_original_response, interaction.channel_id)
+
+    async def show_position(position):
+        status.report(f"Queued for {what} - position **{position}** in line...")
+
+    return show_position
+
+
+@asynccontextmanager
+async def admit(interaction: discord.Interaction, what: str, on_queued=None):
+    """
+    Holds a per-user/per-guild job slot and a remote generation slot for a
+    command. on_queued(position) replaces the default queue notice.
+    """
+    async with admission.job(interaction.user.id, interaction.guild_id):
+        async with admission.remote.slot(on_queued=on_queued or queue_notice(interaction, what)):
+            job_store.update(current_job.get(), stage="generating")
+            yield
+
+
+def resumable(command: str):
+    """Records each run of a command in the job store so resume_jobs() can finish it after a restart"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(interaction: discord.Interaction, **params):
+            bound = signature.bind(interaction, **params)
+            bound.apply_defaults()
+            job_params = {name: value for name, value in bound.arguments.items() if name != "interaction"}
+            job_id = job_store.create(command, job_params, interaction.application_id, interaction.token,
+                                      interaction.channel_id, interaction.user.id, interaction.guild_id)
+            token = current_job.set(job_id)
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                with span("command", command=command, job=job_id[:8]):
+                    await func(interaction, **params)
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise  # shutting down: leave the job for resume_jobs()
+            except Exception as e:
+                outcome = "rejected" if isinstance(e, AdmissionRejected) else "error"
+                job_store.finish(job_id, error=str(e) or type(e).__name__)
+                raise
+            else:
+                job_store.finish(job_id)
+            finally:
+                current_job.reset(token)
+                COMMAND_SECONDS.observe(time.perf_counter() - started, command=command, outcome=outcome)
+
+        return wrapper
+    return decorator
+
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    original = getattr(error, "original", error)
+    if isinstance(original, AdmissionRejected):
+        if interaction.response.is_done():
+            await interaction.followup.send(str(original), ephemeral=True)
+        else:
+            await interaction.response.send_message(str(original), ephemeral=True)
+        return
+    print(f"Command error: {error}", flush=True)
+    traceback.print_exception(type(original), original, original.__traceback__)
+
+
+def animation_status(interaction: discord.Interaction, prompt: str):
+    """Status listener for the poller that keeps a live progress embed up to date"""
+    status = None
+    status_icons = {
+        "queued": "**Queued** - Waiting in line...",
+        "rendering": "**Rendering** - Creating your video...",
+        "complete": "**Complete** - Video ready!"
+    }
+
+    async def show_status(state, result=None):
+        nonlocal status
+        status_text = status_icons.get(state, f"{state}")
+        embed = discord.Embed(
+            title="Animation in Progress",
+            description=f"**Prompt:** {prompt}\n\n{status_text}",
+            color=0xffa500 if state != "complete" else 0x00ff00
+        )
+        if status is None:
+            status_msg = await interaction.followup.send(embed=embed)
+            status = status_board.track(status_msg.edit, interaction.channel_id)
+        else:
+            status.update(embed=embed)
+
+    return show_status
+
+
+def result_video_url(result: dict):
+    """Download URL of a finished Magic Hour project, or None when it has none"""
+    downloads = result.get("downloads") or [{}]
+    return downloads[0].get("url") or result.get("video_url") or (result.get("output") or {}).get("url")
+
+
+def guild_upload_limit(guild) -> int:
+    """Largest attachment the bot may post here (8MB for standard servers and DMs, more for boosted ones)"""
+    return guild.filesize_limit if guild else 8 * 1024 * 1024
+
+
+async def relay_video(send, video_url: str, embed: discord.Embed, max_bytes: int, filename: str = "video.mp4"):
+    """
+    Posts a finished video as an attachment through send(embed=..., file=...).
+    The download streams into a spool on the shared pool and stops as soon as it
+    is known to exceed max_bytes, in which case only the link is posted.
+    """
+    with span("download"):
+        spool = await api.download_to_spool(video_url, max_bytes)
+    if spool is None:
+        embed.add_field(name="Video", value=f"[Download Video]({video_url})")
+        await send(embed=embed)
+        return
+    attachment = discord.File(spool.fileobj(), filename=filename)
+    try:
+        with span("discord_upload", bytes=spool.size):
+            await send(embed=embed, file=attachment)
+        DISCORD_BYTES.inc(spool.size)
+    finally:
+        attachment.close()
+        spool.close()
+
+
+async def send_video(interaction: discord.Interaction, video_url: str, embed: discord.Embed, filename: str = "video.mp4"):
+    """Shared delivery for commands that produce a video URL"""
+    await relay_video(interaction.followup.send, video_url, embed, guild_upload_limit(interaction.guild), filename)
 
 
 async def generate_brainrot_script(prompt: str, character_name: str) -> str:
@@ -240,36 +293,12 @@ Rules:
 
 Just output the script, nothing else."""
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-            payload = {
-                "contents": [{"parts": [{"text": system_prompt}]}],
-                "generationConfig": {
-                    "temperature": 1.0,
-                    "maxOutputTokens": 150
-                }
-            }
-            print(f"Calling Gemini API for script generation...", flush=True)
-            async with session.post(
-                f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            ) as resp:
-                print(f"Gemini API response status: {resp.status}", flush=True)
-                if resp.status == 200:
-                    data = await resp.json()
-                    if "candidates" in data and len(data["candidates"]) > 0:
-                        script = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-                        print(f"Gemini script: {script}", flush=True)
-                        return script
-                    else:
-                        print(f"Gemini response missing candidates: {data}", flush=True)
-                else:
-                    error = await resp.text()
-                    print(f"Gemini API error ({resp.status}): {error}", flush=True)
-    except asyncio.TimeoutError:
-        print(f"Gemini API timeout after 30 seconds", flush=True)
-    except aiohttp.ClientError as e:
-        print(f"Gemini API connection error: {e}", flush=True)
+        log.debug("brainrot_script_request", character=character_name)
+        script, error = await gemini.generate(system_prompt, temperature=1.0, max_output_tokens=150, timeout=30)
+        if script:
+            log.debug("brainrot_script", script=script)
+            return script
+        log.warning("brainrot_script_failed", error=error)
     except Exception as e:
         print(f"Gemini error: {e}", flush=True)
 
@@ -278,59 +307,101 @@ Just output the script, nothing else."""
     return prompt
 
 
+TTS_PROVIDER = "edge_tts"
+# Re-upload links this close to expiring rather than hand out a dying URL
+TTS_URL_MARGIN = 5 * 60
+
+
+async def tts_chunks(text: str, voice: str):
+    """Audio chunks from edge_tts as they are synthesized"""
+    communicate = (await edge_tts.aload()).Communicate(text, voice)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+def tts_url_value(asset):
+    """Cache value for a hosted TTS file: its URL, host and when the link stops working"""
+    return {"url": asset.url, "host": asset.host, "url_expires": asset.expires}
+
+
 async def generate_tts_audio(text: str, voice: str = "en-US-ChristopherNeural") -> str:
     """Generate TTS audio and upload to file hosting, returns URL"""
+    loop = asyncio.get_running_loop()
+    cache = default_cache()
+    cache_params = {"text": text, "voice": voice, "provider": TTS_PROVIDER}
+    entry = await loop.run_in_executor(None, cache.get, "tts", cache_params)
+    if entry is not None:
+        expires = entry.value.get("url_expires")
+        if entry.value.get("url") and (expires is None or expires - TTS_URL_MARGIN > time.time()):
+            return entry.value["url"]
+        # The hosted copy has expired: upload the cached audio again instead of re-synthesizing
+        audio_path = entry.files[0]
+        print(f"Re-uploading cached TTS audio ({entry.value.get('host')} link expired)", flush=True)
+        asset = await asset_hosting.publish(audio_path, "tts.mp3", "audio/mpeg")
+        if asset is None:
+            return None
+        await loop.run_in_executor(None, lambda: cache.put("tts", cache_params, tts_url_value(asset),
+                                                           files=[audio_path]))
+        return asset.url
+
+    # Synthesis writes into a spool and the uploads read from it as chunks arrive,
+    # so they start before synthesis finishes and the MP3 is never concatenated
+    spool = Spool()
+    synthesis = asyncio.ensure_future(spool.fill(tts_chunks(text, voice)))
     try:
-        # Generate TTS audio
         print(f"Generating TTS for: {text[:50]}...", flush=True)
-        communicate = edge_tts.Communicate(text, voice)
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-
-        print(f"TTS generated, size: {len(audio_data)} bytes", flush=True)
-
-        if len(audio_data) == 0:
+        if not await spool.wait_for_data():
+            await synthesis  # raises if edge_tts failed
             print("Error: No audio data generated", flush=True)
             return None
 
-        async with aiohttp.ClientSession() as session:
-            # Try catbox.moe (reliable for audio files)
-            try:
-                form = aiohttp.FormData()
-                form.add_field('reqtype', 'fileupload')
-                form.add_field('fileToUpload', audio_data, filename='tts.mp3', content_type='audio/mpeg')
-                async with session.post('https://catbox.moe/user/api.php', data=form) as resp:
-                    print(f"Catbox response status: {resp.status}", flush=True)
-                    if resp.status == 200:
-                        url = (await resp.text()).strip()
-                        print(f"Catbox URL: {url}", flush=True)
-                        if url.startswith('https://'):
-                            return url
-            except Exception as e:
-                print(f"Catbox error: {e}", flush=True)
-
-            # Fallback: try litterbox (temporary catbox)
-            try:
-                form2 = aiohttp.FormData()
-                form2.add_field('reqtype', 'fileupload')
-                form2.add_field('time', '1h')
-                form2.add_field('fileToUpload', audio_data, filename='tts.mp3', content_type='audio/mpeg')
-                async with session.post('https://litterbox.catbox.moe/resources/internals/api.php', data=form2) as resp:
-                    print(f"Litterbox response status: {resp.status}", flush=True)
-                    if resp.status == 200:
-                        url = (await resp.text()).strip()
-                        print(f"Litterbox URL: {url}", flush=True)
-                        if url.startswith('https://'):
-                            return url
-            except Exception as e:
-                print(f"Litterbox error: {e}", flush=True)
-
-        return None
+        asset = await asset_hosting.publish(spool, "tts.mp3", "audio/mpeg")
+        await synthesis
+        print(f"TTS generated, size: {spool.size} bytes", flush=True)
+
+        # Keep the audio even if hosting failed, so a retry only has to upload it
+        def store():
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                audio_path = os.path.join(tmp_dir, "tts.mp3")
+                spool.save(audio_path)
+                cache.put("tts", cache_params, tts_url_value(asset) if asset else {"url": None}, files=[audio_path])
+        await loop.run_in_executor(None, store)
+        return asset.url if asset else None
     except Exception as e:
         print(f"TTS Error: {e}", flush=True)
         return None
+    finally:
+        if not synthesis.done():
+            synthesis.cancel()
+        elif not synthesis.cancelled():
+            synthesis.exception()  # already reported through the spool
+        spool.close()
+
+
+async def veo_video_result(response: dict, video_paths: list, session, timeout) -> tuple:
+    """Turns a finished Veo response into ({"video_path": ...}, None) or (None, error)"""
+    if video_paths:
+        # The inline base64 video was already decoded to disk while the response streamed in
+        for extra in video_paths[1:]:
+            os.remove(extra)
+        print(f"Veo video saved to {video_paths[0]} ({os.path.getsize(video_paths[0])} bytes)", flush=True)
+        return {"video_path": video_paths[0]}, None
+
+    videos = (response.get("generatedVideos") or response.get("generated_videos")
+              or response.get("generateVideoResponse", {}).get("generatedSamples") or [])
+    if not videos or "video" not in videos[0]:
+        return None, "No video data in response"
+    video_data = videos[0]["video"]
+    uri = video_data if isinstance(video_data, str) else video_data.get("uri")
+    if not uri:
+        return None, "No video data in response"
+    try:
+        path = await download_veo_file(session, uri, GEMINI_API_KEY, timeout=timeout)
+    except Exception as e:
+        return None, f"Failed to download Veo video: {e}"
+    print(f"Veo video downloaded to {path} ({os.path.getsize(path)} bytes)", flush=True)
+    return {"video_path": path}, None
 
 
 async def generate_video_with_gemini(prompt: str, image_url: str = None, interaction: discord.Interaction = None) -> tuple:
@@ -343,20 +414,32 @@ async def generate_video_with_gemini(prompt: str, image_url: str = None, interac
     2. Veo 3.1 preview is enabled for your account
     3. The model name is correct: veo-3.1-generate-preview
     
-    Returns tuple of (result_dict, error_string)
+    Returns tuple of (result_dict, error_string); the video is written to
+    disk and result_dict["video_path"] points at it.
     """
     import base64
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
+        session = bot.http_pool.session()
+        timeout = aiohttp.ClientTimeout(total=300)
+
+        # Start the async generation, unless this request already has an operation
+        # running from before a restart
+        veo_key = "veo:" + json.dumps(normalize({"prompt": prompt, "image_url": image_url}), sort_keys=True)
+        stored = job_store.project(veo_key)
+        operation_name = stored["project_id"] if stored else None
+        if operation_name:
+            print(f"Resuming Veo operation: {operation_name}", flush=True)
+
+        if operation_name is None:
             # Build the request payload for Veo 3.1 (Gemini API format)
             payload = {
                 "prompt": prompt
             }
-            
+
             # If we have an image, add it as reference for image-to-video
             if image_url:
                 try:
-                    async with session.get(image_url) as img_resp:
+                    async with session.get(image_url, timeout=timeout) as img_resp:
                         if img_resp.status == 200:
                             img_data = await img_resp.read()
                             img_b64 = base64.b64encode(img_data).decode('utf-8')
@@ -368,28 +451,21 @@ async def generate_video_with_gemini(prompt: str, image_url: str = None, interac
                     print(f"Failed to download image for Veo: {e}", flush=True)
 
             print(f"Starting Gemini Veo generation for: {prompt[:50]}...", flush=True)
-            print(f"Veo API URL: {GEMINI_VEO_URL}", flush=True)
-            print(f"Payload keys: {list(payload.keys())}", flush=True)
-
-            # Start the async generation
-            operation_name = None
             try:
                 async with session.post(
                     f"{GEMINI_VEO_URL}?key={GEMINI_API_KEY}",
                     json=payload,
-                    headers={"Content-Type": "application/json"}
+                    headers={"Content-Type": "application/json"},
+                    timeout=timeout
                 ) as resp:
-                    response_text = await resp.text()
                     print(f"Veo response status: {resp.status}", flush=True)
-                    print(f"Veo response headers: {dict(resp.headers)}", flush=True)
-                    print(f"Veo full response: {response_text[:1000]}", flush=True)
 
                     if resp.status != 200:
-                        print(f"Veo API error (status {resp.status}): {response_text[:1000]}", flush=True)
+                        response_text = await resp.text()
+                        print(f"Veo API error (status {resp.status}): {response_text[:300]}", flush=True)
                         # Extract more detailed error if available
                         try:
-                            error_json = await resp.json()
-                            print(f"Veo error JSON: {error_json}", flush=True)
+                            error_json = json.loads(response_text)
                             if "error" in error_json:
                                 error_detail = error_json["error"].get("message", str(error_json["error"]))
                                 error_code = error_json["error"].get("code", "")
@@ -399,107 +475,81 @@ async def generate_video_with_gemini(prompt: str, image_url: str = None, interac
                         return None, f"Veo API Error ({resp.status}): {response_text[:300]}"
 
                     try:
-                        result = await resp.json()
-                        print(f"Veo response JSON: {str(result)[:500]}", flush=True)
-                    except Exception as json_err:
-                        print(f"Failed to parse JSON: {json_err}, raw: {response_text[:500]}", flush=True)
-                        result = {"raw": response_text}
-
-                    # Check if it's a long-running operation
-                    operation_name = result.get("name")
-                    
-                    # Also check for error in response
-                    if "error" in result:
-                        error_info = result.get("error", {})
-                        error_msg = error_info.get("message", str(error_info))
-                        print(f"Veo API returned error: {error_msg}", flush=True)
-                        return None, f"Veo API error: {error_msg}"
-
-                    if not operation_name:
-                        # Maybe direct response with video? (Veo 3.1 format)
-                        if "generatedVideos" in result or "generated_videos" in result:
-                            videos = result.get("generatedVideos") or result.get("generated_videos", [])
-                            if videos and len(videos) > 0:
-                                video_obj = videos[0]
-                                # Veo 3.1 returns video as file reference or base64
-                                if "video" in video_obj:
-                                    video_data = video_obj["video"]
-                                    if isinstance(video_data, dict):
-                                        video_b64 = video_data.get("bytesBase64Encoded")
-                                        if video_b64:
-                                            video_bytes = base64.b64decode(video_b64)
-                                            print(f"Veo video generated directly, size: {len(video_bytes)} bytes", flush=True)
-                                            return {"video_bytes": video_bytes}, None
-                        # Log the full response for debugging
-                        print(f"Veo unexpected response structure: {str(result)[:1000]}", flush=True)
-                        return None, f"Unexpected response format. Check logs for details."
-
-                    print(f"Veo operation started: {operation_name}", flush=True)
+                        result, video_paths = await read_veo_response(resp)
+                    except ValueError as json_err:
+                        print(f"Failed to parse Veo response: {json_err}", flush=True)
+                        return None, "Unexpected response format. Check logs for details."
+
+                # Check if it's a long-running operation
+                operation_name = result.get("name")
+
+                # Also check for error in response
+                if "error" in result:
+                    error_info = result.get("error", {})
+                    error_msg = error_info.get("message", str(error_info))
+                    print(f"Veo API returned error: {error_msg}", flush=True)
+                    return None, f"Veo API error: {error_msg}"
+
+                if not operation_name:
+                    # Maybe direct response with video? (Veo 3.1 format)
+                    if video_paths or "generatedVideos" in result or "generated_videos" in result:
+                        return await veo_video_result(result, video_paths, session, timeout)
+                    print(f"Veo unexpected response structure, keys: {list(result.keys())}", flush=True)
+                    return None, "Unexpected response format. Check logs for details."
+
+                print(f"Veo operation started: {operation_name}", flush=True)
+                job_store.remember_project(veo_key, operation_name, kind="veo")
             except aiohttp.ClientError as conn_err:
                 print(f"Veo connection error: {conn_err}", flush=True)
                 return None, f"Veo connection error: {str(conn_err)}"
 
-            if not operation_name:
-                return None, "No operation name returned from Veo API"
+        if not operation_name:
+            return None, "No operation name returned from Veo API"
 
-            # Poll for completion
-            # Veo 3.1 operations format: operations/{operation_id} or just the ID
-            if "/" in operation_name:
-                # Already has full path
-                if operation_name.startswith("operations/"):
-                    poll_url = f"https://generativelanguage.googleapis.com/v1beta/{operation_name}?key={GEMINI_API_KEY}"
-                else:
-                    poll_url = f"https://generativelanguage.googleapis.com/v1beta/{operation_name}?key={GEMINI_API_KEY}"
-            else:
-                # Just the operation ID
-                poll_url = f"https://generativelanguage.googleapis.com/v1beta/operations/{operation_name}?key={GEMINI_API_KEY}"
+        # Poll for completion
+        # Veo 3.1 operations format: operations/{operation_id} or just the ID
+        if "/" in operation_name:
+            # Already has full path
+            poll_url = f"{GEMINI_API_BASE}/{operation_name}?key={GEMINI_API_KEY}"
+        else:
+            # Just the operation ID
+            poll_url = f"{GEMINI_API_BASE}/operations/{operation_name}?key={GEMINI_API_KEY}"
 
-            for i in range(60):  # Max 5 minutes (5 sec intervals)
-                await asyncio.sleep(5)
+        # Space checks by the learned Veo render time instead of a fixed 5s
+        started = time.monotonic()
+        i = 0
+        while time.monotonic() - started < 300:  # Max 5 minutes
+            await asyncio.sleep(poll_strategy.next_delay("veo", time.monotonic() - started))
+            i += 1
+            POLLS.inc(kind="veo")
 
-                try:
-                    async with session.get(poll_url) as poll_resp:
-                        if poll_resp.status != 200:
-                            print(f"[Veo Poll {i+1}] Status: {poll_resp.status}", flush=True)
-                            continue
-
-                        poll_result = await poll_resp.json()
-                        done = poll_result.get("done", False)
-
-                        print(f"[Veo Poll {i+1}] Done: {done}", flush=True)
-
-                        if done:
-                            # Check for error
-                            if "error" in poll_result:
-                                error = poll_result["error"]
-                                return None, f"Veo generation failed: {error.get('message', str(error))}"
-
-                            # Get the video (Veo 3.1 format)
-                            response = poll_result.get("response", {})
-                            videos = response.get("generatedVideos") or response.get("generated_videos", [])
-
-                            if videos and len(videos) > 0:
-                                video_obj = videos[0]
-                                if "video" in video_obj:
-                                    video_data = video_obj["video"]
-                                    if isinstance(video_data, dict):
-                                        video_b64 = video_data.get("bytesBase64Encoded")
-                                        if video_b64:
-                                            video_bytes = base64.b64decode(video_b64)
-                                            print(f"Veo video generated, size: {len(video_bytes)} bytes", flush=True)
-                                            return {"video_bytes": video_bytes}, None
-                                    # If video is a file reference, we'd need to download it
-                                    elif isinstance(video_data, str):
-                                        # File URI - would need to download
-                                        print(f"Veo returned file reference: {video_data}", flush=True)
-                                        return None, "Video returned as file reference (not yet implemented)"
-
-                            return None, "No video data in response"
-                except Exception as poll_error:
-                    print(f"[Veo Poll {i+1}] Error: {poll_error}", flush=True)
-                    continue
-
-            return None, "Timeout: Veo generation took too long"
+            try:
+                async with session.get(poll_url, timeout=timeout) as poll_resp:
+                    if poll_resp.status != 200:
+                        log.warning("veo_poll_status", operation=operation_name, poll=i, status=poll_resp.status)
+                        continue
+
+                    # A finished operation can carry the whole video inline; it goes straight to disk
+                    poll_result, video_paths = await read_veo_response(poll_resp)
+                done = poll_result.get("done", False)
+
+                log.debug("veo_poll", operation=operation_name, poll=i, done=done)
+
+                if done:
+                    job_store.forget_project(veo_key)
+                    POLLS_PER_JOB.observe(i, kind="veo", outcome="error" if "error" in poll_result else "ok")
+                    # Check for error
+                    if "error" in poll_result:
+                        error = poll_result["error"]
+                        return None, f"Veo generation failed: {error.get('message', str(error))}"
+
+                    poll_strategy.record("veo", time.monotonic() - started)
+                    return await veo_video_result(poll_result.get("response", {}), video_paths, session, timeout)
+            except Exception as poll_error:
+                log.warning("veo_poll_failed", operation=operation_name, poll=i, error=poll_error)
+                continue
+
+        return None, "Timeout: Veo generation took too long"
 
     except Exception as e:
         print(f"Veo error: {e}", flush=True)
@@ -509,74 +559,83 @@ async def generate_video_with_gemini(prompt: str, image_url: str = None, interac
 @bot.event
 async def on_ready():
     print(f"Bot is ready! Logged in as {bot.user}", flush=True)
+    first_ready = bot.warmup is None
+    if first_ready:
+        startup_timer.record("gateway connect", time.perf_counter() - bot.logged_in_at)
+        bot.warmup = bot.loop.create_task(warm([edge_tts, lesson_pipeline]))
     try:
-        # Sync to all guilds for instant command visibility
-        for guild in bot.guilds:
-            bot.tree.copy_global_to(guild=guild)
-            await bot.tree.sync(guild=guild)
-            print(f"Synced commands to {guild.name}", flush=True)
-        print(f"Synced commands to {len(bot.guilds)} server(s)", flush=True)
+        # Sync to all guilds for instant command visibility (only where the tree changed)
+        with startup_timer.phase("command sync"):
+            synced, unchanged, failed = await bot.command_sync.sync(bot.guilds)
+        print(f"Synced commands to {synced} server(s), {unchanged} already up to date"
+              f"{f', {failed} failed' if failed else ''}", flush=True)
     except Exception as e:
         print(f"Failed to sync commands: {e}", flush=True)
+    if first_ready:
+        await bot.warmup
+        print(startup_timer.report(), flush=True)
 
 
 @bot.tree.command(name="text2video", description="Generate a video from a text prompt")
 @app_commands.describe(prompt="Describe the video you want to generate", duration="Video duration in seconds (default: 5)")
+@resumable("text2video")
 async def text2video(interaction: discord.Interaction, prompt: str, duration: int = 5):
     await interaction.response.defer(thinking=True)
 
-    result, error = await api.text_to_video(prompt, duration)
+    async with admit(interaction, "video generation"):
+        result, error = await api.text_to_video(prompt, duration)
 
     if error:
         await interaction.followup.send(f"Failed to generate video: {error}")
         return
 
-    video_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    video_url = result_video_url(result)
     if video_url:
         embed = discord.Embed(title="Text to Video", description=f"**Prompt:** {prompt}", color=0x00ff00)
-        embed.add_field(name="Video", value=f"[Download Video]({video_url})")
-        await interaction.followup.send(embed=embed)
+        await send_video(interaction, video_url, embed, "text2video.mp4")
     else:
         await interaction.followup.send(f"Video generated but couldn't get download URL. Response: {result}")
 
 
 @bot.tree.command(name="img2video", description="Convert an image to a video")
 @app_commands.describe(image_url="URL of the image", prompt="Optional motion description", duration="Video duration in seconds (default: 5)")
+@resumable("img2video")
 async def img2video(interaction: discord.Interaction, image_url: str, prompt: str = "", duration: int = 5):
     await interaction.response.defer(thinking=True)
 
-    result, error = await api.image_to_video(image_url, prompt, duration)
+    async with admit(interaction, "video generation"):
+        result, error = await api.image_to_video(image_url, prompt, duration)
 
     if error:
         await interaction.followup.send(f"Failed to generate video: {error}")
         return
 
-    video_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    video_url = result_video_url(result)
     if video_url:
         embed = discord.Embed(title="Image to Video", color=0x00ff00)
         embed.set_thumbnail(url=image_url)
-        embed.add_field(name="Video", value=f"[Download Video]({video_url})")
-        await interaction.followup.send(embed=embed)
+        await send_video(interaction, video_url, embed, "img2video.mp4")
     else:
         await interaction.followup.send(f"Video generated but couldn't get download URL. Response: {result}")
 
 
 @bot.tree.command(name="faceswap", description="Swap a face in a video")
 @app_commands.describe(video_url="URL of the video", face_image_url="URL of the face image to swap in")
+@resumable("faceswap")
 async def faceswap(interaction: discord.Interaction, video_url: str, face_image_url: str):
     await interaction.response.defer(thinking=True)
 
-    result, error = await api.face_swap(video_url, face_image_url)
+    async with admit(interaction, "face swap"):
+        result, error = await api.face_swap(video_url, face_image_url)
 
     if error:
         await interaction.followup.send(f"Failed to swap face: {error}")
         return
 
-    output_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    output_url = result_video_url(result)
     if output_url:
         embed = discord.Embed(title="Face Swap", color=0x00ff00)
-        embed.add_field(name="Video", value=f"[Download Video]({output_url})")
-        await interaction.followup.send(embed=embed)
+        await send_video(interaction, output_url, embed, "faceswap.mp4")
     else:
         await interaction.followup.send(f"Face swap completed but couldn't get download URL. Response: {result}")
 
@@ -598,73 +657,77 @@ async def faceswap(interaction: discord.Interaction, video_url: str, face_image_
     app_commands.Choice(name="Anime", value="Futuristic Anime"),
     app_commands.Choice(name="Fantasy", value="Fantasy"),
 ])
+@resumable("animate")
 async def animate(interaction: discord.Interaction, prompt: str, image_url: str = None,
                   art_style: str = "Photograph", duration: int = 3):
     await interaction.response.defer()
 
-    result, error = await api.animation(prompt, interaction, image_url, art_style, "Simple Zoom In", duration)
+    show_status = animation_status(interaction, prompt)
+    async with admit(interaction, "animation"):
+        result, error = await api.animation(prompt, image_url, art_style, "Simple Zoom In", duration,
+                                            on_status=show_status)
+    if result is not None:
+        try:
+            await show_status("complete")
+        except discord.HTTPException:
+            pass
 
     if error:
         await interaction.followup.send(f"Failed to animate: {error}")
         return
 
-    video_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    video_url = result_video_url(result)
     if video_url:
-        # Download and upload video directly
-        video_data = await api.download_video(video_url)
-        if video_data:
-            file = discord.File(io.BytesIO(video_data), filename="animation.mp4")
-            embed = discord.Embed(
-                title="Animation Complete!",
-                description=f"**Prompt:** {prompt}\n**Style:** {art_style}",
-                color=0x00ff00
-            )
-            await interaction.followup.send(embed=embed, file=file)
-        else:
-            embed = discord.Embed(title="Animation", description=f"**Prompt:** {prompt}", color=0x00ff00)
-            embed.add_field(name="Video", value=f"[Download Video]({video_url})")
-            await interaction.followup.send(embed=embed)
+        # Stream the video into Discord (or post the link if it is over the upload limit)
+        embed = discord.Embed(
+            title="Animation Complete!",
+            description=f"**Prompt:** {prompt}\n**Style:** {art_style}",
+            color=0x00ff00
+        )
+        await send_video(interaction, video_url, embed, "animation.mp4")
     else:
         await interaction.followup.send(f"Animation completed but couldn't get download URL. Response: {result}")
 
 
 @bot.tree.command(name="lipsync", description="Sync lips in a video to audio")
 @app_commands.describe(video_url="URL of the video", audio_url="URL of the audio file")
+@resumable("lipsync")
 async def lipsync(interaction: discord.Interaction, video_url: str, audio_url: str):
     await interaction.response.defer(thinking=True)
 
-    result, error = await api.lip_sync(video_url, audio_url)
+    async with admit(interaction, "lip sync"):
+        result, error = await api.lip_sync(video_url, audio_url)
 
     if error:
         await interaction.followup.send(f"Failed to lip sync: {error}")
         return
 
-    output_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    output_url = result_video_url(result)
     if output_url:
         embed = discord.Embed(title="Lip Sync", color=0x00ff00)
-        embed.add_field(name="Video", value=f"[Download Video]({output_url})")
-        await interaction.followup.send(embed=embed)
+        await send_video(interaction, output_url, embed, "lipsync.mp4")
     else:
         await interaction.followup.send(f"Lip sync completed but couldn't get download URL. Response: {result}")
 
 
 @bot.tree.command(name="talkingphoto", description="Make a photo talk with audio")
 @app_commands.describe(image_url="URL of the image (should contain a face)", audio_url="URL of the audio file")
+@resumable("talkingphoto")
 async def talkingphoto(interaction: discord.Interaction, image_url: str, audio_url: str):
     await interaction.response.defer(thinking=True)
 
-    result, error = await api.ai_talking_photo(image_url, audio_url)
+    async with admit(interaction, "talking photo"):
+        result, error = await api.ai_talking_photo(image_url, audio_url)
 
     if error:
         await interaction.followup.send(f"Failed to create talking photo: {error}")
         return
 
-    video_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    video_url = result_video_url(result)
     if video_url:
         embed = discord.Embed(title="Talking Photo", color=0x00ff00)
         embed.set_thumbnail(url=image_url)
-        embed.add_field(name="Video", value=f"[Download Video]({video_url})")
-        await interaction.followup.send(embed=embed)
+        await send_video(interaction, video_url, embed, "talkingphoto.mp4")
     else:
         await interaction.followup.send(f"Talking photo created but couldn't get download URL. Response: {result}")
 
@@ -681,36 +744,34 @@ BRAINROT_CHARACTERS = {
     "sahur": ("Ta Ta Ta Sahur", "memes_ref/Ta-Ta-Ta-Sahur-TikTok-Viral-Character-5520.png"),
 }
 
-# Cache for uploaded character images
-CHARACTER_IMAGE_URLS = {}
+BRAINROT_STYLE = "Italian brainrot meme style, surreal absurdist comedy, colorful vibrant animation, exaggerated expressions, chaotic energy"
 
+# Published character image links, kept across restarts
+character_urls = AssetURLCache(asset_hosting, bot.http_pool)
+# How often the background task re-checks the links (litterbox and signed local ones expire)
+CHARACTER_REFRESH_INTERVAL = 15 * 60
 
-async def upload_character_image(character_key: str) -> str:
-    """Upload a character image to catbox and cache the URL"""
-    if character_key in CHARACTER_IMAGE_URLS:
-        return CHARACTER_IMAGE_URLS[character_key]
 
+def character_asset(character_key: str):
     _, filepath = BRAINROT_CHARACTERS[character_key]
-    full_path = os.path.join(os.path.dirname(__file__), filepath)
+    return character_key, os.path.join(os.path.dirname(__file__), filepath), os.path.basename(filepath), "image/png"
+
 
+async def upload_character_image(character_key: str) -> str:
+    """Publish a character image through the asset hosts (unless a remembered link still works), returns its URL"""
     try:
-        with open(full_path, 'rb') as f:
-            image_data = f.read()
-
-        async with aiohttp.ClientSession() as session:
-            form = aiohttp.FormData()
-            form.add_field('reqtype', 'fileupload')
-            form.add_field('fileToUpload', image_data, filename=os.path.basename(filepath), content_type='image/png')
-            async with session.post('https://catbox.moe/user/api.php', data=form) as resp:
-                if resp.status == 200:
-                    url = (await resp.text()).strip()
-                    if url.startswith('https://'):
-                        CHARACTER_IMAGE_URLS[character_key] = url
-                        print(f"Uploaded {character_key}: {url}", flush=True)
-                        return url
+        return await character_urls.ensure(*character_asset(character_key))
     except Exception as e:
         print(f"Failed to upload character image: {e}", flush=True)
-    return None
+        return None
+
+
+async def prewarm_characters():
+    """Keeps every character image published in the background, so /brainrot_v2 never waits on an upload"""
+    while True:
+        ready = await character_urls.prewarm([character_asset(key) for key in BRAINROT_CHARACTERS])
+        print(f"Character images ready: {ready}/{len(BRAINROT_CHARACTERS)}", flush=True)
+        await asyncio.sleep(CHARACTER_REFRESH_INTERVAL)
 
 
 @bot.tree.command(name="brainrot_v2", description="Generate brainrot-style AI video (5 sec)")
@@ -725,36 +786,46 @@ async def upload_character_image(character_key: str) -> str:
         app_commands.Choice(name="unhinged", value="unhinged"),
     ]
 )
+@resumable("brainrot_v2")
 async def brainrot(interaction: discord.Interaction, prompt: str, intensity: str = "medium"):
     await interaction.response.defer()
 
-    # Randomly select a brainrot character first
-    character = random.choice(list(BRAINROT_CHARACTERS.keys()))
+    # Randomly select a brainrot character first, from those whose image is already hosted
+    ready = [key for key in BRAINROT_CHARACTERS if character_urls.url(key)]
+    character = random.choice(ready or list(BRAINROT_CHARACTERS.keys()))
     character_name, _ = BRAINROT_CHARACTERS[character]
 
     # Status update
     status_msg = await interaction.followup.send(f"{character_name} is preparing...")
+    status = status_board.track(status_msg.edit, interaction.channel_id)
 
-    await status_msg.edit(content=f"Loading {character_name}...")
-    image_url = await upload_character_image(character)
+    status.report(f"Loading {character_name}...")
+    image_url = character_urls.url(character)
+    # The request (and so the stored project) is keyed on this exact URL, so resume reuses it
+    job_store.update(current_job.get(), artifacts={"character": character, "image_url": image_url})
     if not image_url:
-        await status_msg.edit(content="Failed to upload character, continuing without image...")
-        image_url = None
+        # Never wait on an upload here; the background prewarm keeps retrying
+        status.report("Character image isn't hosted yet, continuing without image...")
+
+    status.report("Creating 5s video with Magic Hour...")
 
-    await status_msg.edit(content="Creating 5s video with Magic Hour...")
+    async def brainrot_queue_notice(position):
+        status.report(f"{character_name} is queued - position **{position}** in line...")
 
     # Use Magic Hour image-to-video
     # We pass the prompt as the style prompt
-    full_prompt = f"{prompt}, Italian brainrot meme style, surreal absurdist comedy, colorful vibrant animation, exaggerated expressions, chaotic energy"
+    full_prompt = f"{prompt}, {BRAINROT_STYLE}"
     
-    result, error = await api.image_to_video(image_url, full_prompt, duration=5)
+    async with admit(interaction, "brainrot video", on_queued=brainrot_queue_notice):
+        result, error = await api.image_to_video(image_url, full_prompt, duration=5)
 
     if error:
-        await status_msg.edit(content=f"Magic Hour failed: {error}")
+        status.report(f"Magic Hour failed: {error}")
+        await status.flush()
         return
     
     # Magic Hour returns download URL in result
-    video_url = result.get("downloads", [{}])[0].get("url") or result.get("video_url") or result.get("output", {}).get("url")
+    video_url = result_video_url(result)
 
     if video_url:
         embed = discord.Embed(
@@ -762,11 +833,12 @@ async def brainrot(interaction: discord.Interaction, prompt: str, intensity: str
             description=f"**Prompt:** {prompt}\n**Character:** {character_name}",
             color=0xff00ff
         )
-        embed.add_field(name="Video", value=f"[Download Video]({video_url})")
+        await status.close()
         await status_msg.delete()
-        await interaction.followup.send(embed=embed)
+        await send_video(interaction, video_url, embed, "brainrot.mp4")
     else:
-        await status_msg.edit(content=f"Video generated but couldn't get download URL. Response: {result}")
+        status.report(f"Video generated but couldn't get download URL. Response: {result}")
+        await status.flush()
 
 
 @bot.tree.command(name="magichelp", description="Show all available Magic Hour commands")
@@ -781,6 +853,7 @@ async def magichelp(interaction: discord.Interaction):
         ("`/animate`", "Animate a static image"),
         ("`/lipsync`", "Sync video lips to audio"),
         ("`/talkingphoto`", "Make a photo talk with audio"),
+        ("`/queue`", "Show how busy the bot is"),
     ]
 
     for cmd, desc in commands_list:
@@ -790,70 +863,114 @@ async def magichelp(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed)
 
 
+@bot.tree.command(name="queue", description="Show how many jobs are running and queued")
+async def queue(interaction: discord.Interaction):
+    metrics = admission.metrics()
+    embed = discord.Embed(title="Bot Queue", color=0x9b59b6)
+    for name in ("remote", "encode"):
+        pool = metrics[name]
+        embed.add_field(
+            name="Generation" if name == "remote" else "Encoding",
+            value=(f"Running: {pool['active']}/{pool['slots']}\n"
+                   f"Queued: {pool['queue_depth']}\n"
+                   f"Avg wait: {pool['wait_avg_seconds']:.0f}s (max {pool['wait_max_seconds']:.0f}s)"),
+        )
+    await interaction.response.send_message(embed=embed)
+
+
+# Users asking for the same lesson at the same time share one pipeline run
+lesson_flights = SingleFlight()
+
+
 @bot.tree.command(name="generate_lesson", description="Generate an educational video lesson")
 @app_commands.describe(topic="The lesson topic (e.g., 'Photosynthesis', 'Gravity')")
+@resumable("generate_lesson")
 async def generate_lesson(interaction: discord.Interaction, topic: str):
     await interaction.response.defer(thinking=True)
 
-    status_msg = await interaction.followup.send(f"[1/4] Generating script for: **{topic}**...")
+    status_msg = await interaction.followup.send(f"Generating lesson: **{topic}**...")
+    status = status_board.track(status_msg.edit, interaction.channel_id, header=f"Generating lesson: **{topic}**")
 
     async def safe_edit(content):
-        """Safely edit status message, ignoring errors if message was deleted"""
-        try:
-            await status_msg.edit(content=content)
-        except discord.NotFound:
-            pass  # Message was deleted, ignore
-        except Exception:
-            pass  # Other error, ignore
-
-    loop = asyncio.get_running_loop()
-    os.makedirs("outputs", exist_ok=True)
+        """Shows a final status and waits for it to be sent (a deleted message is ignored)"""
+        status.update(content=content)
+        await status.flush()
+
+    # Discord limit: 8MB for standard servers, more for boosted ones
+    upload_limit = guild_upload_limit(interaction.guild)
+    # Encode for a bit under the limit so the upload never bounces
+    max_size_mb = upload_limit / 1024 / 1024 * 0.94
+
+    async def run_lesson(publish):
+        """Runs the pipeline once; every caller waiting on the same topic gets its progress"""
+        os.makedirs("outputs", exist_ok=True)
+        final_filename = f"outputs/final_lesson_{topic.replace(' ', '_')}_{random.randint(1000,9999)}.mp4"
+        job_id = current_job.get()
+        job_store.update(job_id, artifacts={"final_filename": final_filename, "max_size_mb": max_size_mb})
+
+        # Script streams into the narration, video starts once it is done, then combine
+        states = {}
+        script_text = ""
+
+        async def show():
+            progress = format_progress(stages, states)
+            if script_text and states.get("script") != "done":
+                # Tail of the script as Gemini writes it, within Discord's message limit
+                progress += f"\n> {'...' if len(script_text) > 300 else ''}{script_text[-300:]}"
+            await publish(progress, 100 * list(states.values()).count("done") / len(stages))
+
+        async def on_script(text):
+            nonlocal script_text
+            script_text = text
+            await show()
+
+        lesson = await lesson_pipeline.aload()
+        stages = lesson.lesson_stages(topic, final_filename, lesson_api, max_size_mb, admission.encode.slot,
+                                      gemini, on_script, encode_pool=encode_pool)
+
+        async def on_progress(name, state):
+            states[name] = state
+            log.debug("lesson_stage", topic=topic, stage=name, state=state)
+            if state == "running":
+                job_store.update(job_id, stage=name)
+            await show()
+
+        async def show_position(position):
+            await publish(f"Queued - position **{position}** in line...")
+
+        async with admission.remote.slot(on_queued=show_position):
+            started = time.perf_counter()
+            results, timings = await run_stages(stages, on_progress=on_progress)
+        return results, format_timings(timings, time.perf_counter() - started)
+
+    async def show_progress(progress_text, pct=None):
+        status.report(progress_text, pct)
 
     try:
-        # Step 1: Generate Script
-        print(f"Generating script for {topic}...")
-        script = await loop.run_in_executor(None, generate_video_description, topic)
-        if not script:
-            await safe_edit("Error: Failed to generate script")
-            return
-
-        await safe_edit(f"[2/4] Generating audio narration for: **{topic}**...")
-
-        # Step 2: Generate Audio
-        print("Generating audio...")
-        audio_path = await loop.run_in_executor(None, generate_speech, script)
-        if not audio_path:
-            await safe_edit("Error: Failed to generate audio")
+        try:
+            flight_key = json.dumps(normalize({"topic": topic, "max_size_mb": round(max_size_mb, 2)}), sort_keys=True)
+            async with admission.job(interaction.user.id, interaction.guild_id):
+                results, timing_report = await lesson_flights.do(flight_key, run_lesson, show_progress)
+        except StageFailed as e:
+            print(f"Lesson stage failed: {e}")
+            await safe_edit(f"Error: Failed to generate {e.stage.label}")
             return
-
-        await safe_edit(f"[3/4] Generating video visuals for: **{topic}**... (this takes the longest)")
-
-        # Step 3: Generate Video
-        print("Generating video visual...")
-        video_prompt = f"Educational video, clear visualization. {script}"
-        video_result = await loop.run_in_executor(None, generate_text_to_video, video_prompt)
-
-        if not video_result or not video_result.downloaded_paths:
-            await safe_edit("Error: Failed to generate video")
+        except AdmissionRejected as e:
+            await safe_edit(str(e))
             return
+        print(f"Lesson timings for {topic}: {timing_report}")
 
-        video_path = video_result.downloaded_paths[0]
-
-        await safe_edit(f"[4/4] Combining audio and video for: **{topic}**...")
-
-        # Step 4: Combine
-        print("Combining audio and video...")
-        final_filename = f"outputs/final_lesson_{topic.replace(' ', '_')}_{random.randint(1000,9999)}.mp4"
-        final_path = await loop.run_in_executor(None, combine_audio_video, video_path, audio_path, final_filename)
-
+        script = results["script"]
+        final_path = results["combine"]
         if final_path and os.path.exists(final_path):
             file_size = os.path.getsize(final_path)
-            # Discord limit: 8MB for standard servers
-            if file_size > 8 * 1024 * 1024:
+            if file_size > upload_limit:
                 await safe_edit(f"Video generated but it's too large to upload ({file_size/1024/1024:.1f}MB). Saved locally as `{final_path}`")
             else:
                 file = discord.File(final_path)
                 embed = discord.Embed(title=f"Lesson: {topic}", description=f"{script[:200]}...", color=0x3498db)
+                embed.set_footer(text=timing_report)
+                await status.close()
                 try:
                     await status_msg.delete()
                 except discord.NotFound:
@@ -868,6 +985,124 @@ async def generate_lesson(interaction: discord.Interaction, topic: str):
         await safe_edit(f"An error occurred: {str(e)}")
 
 
+async def deliver_resumed(job, content: str = None, embed: discord.Embed = None, file: discord.File = None):
+    """Sends a resumed job's result as the interaction followup, or to the channel once the token has expired"""
+    kwargs = {"embed": embed} if embed is not None else {}
+    if file is not None:
+        kwargs["file"] = file
+    if job["interaction_token"] and time.time() - job["created"] < INTERACTION_TOKEN_TTL:
+        webhook = discord.Webhook.partial(job["application_id"], job["interaction_token"], client=bot)
+        try:
+            await webhook.send(content=content or discord.utils.MISSING, **kwargs)
+            return
+        except discord.HTTPException as e:
+            print(f"Followup for job {job['id'][:8]} failed, posting to the channel: {e}", flush=True)
+            if file is not None:
+                file.reset()
+    channel = bot.get_channel(job["channel_id"]) or await bot.fetch_channel(job["channel_id"])
+    await channel.send(content=f"<@{job['user_id']}> {content or ''}".strip(), **kwargs)
+
+
+# How to re-issue each Magic Hour command from its recorded parameters. The
+# request is identical, so MagicHourAPI picks up the project it already started.
+MAGIC_HOUR_RESUMERS = {
+    "text2video": lambda p: api.text_to_video(p["prompt"], p["duration"]),
+    "img2video": lambda p: api.image_to_video(p["image_url"], p["prompt"], p["duration"]),
+    "faceswap": lambda p: api.face_swap(p["video_url"], p["face_image_url"]),
+    "animate": lambda p: api.animation(p["prompt"], p["image_url"], p["art_style"], "Simple Zoom In", p["duration"]),
+    "lipsync": lambda p: api.lip_sync(p["video_url"], p["audio_url"]),
+    "talkingphoto": lambda p: api.ai_talking_photo(p["image_url"], p["audio_url"]),
+}
+
+
+async def resume_brainrot(params, artifacts):
+    if "image_url" in artifacts:
+        image_url = artifacts["image_url"]
+    else:
+        # Recorded before the image URL was stored
+        image_url = await upload_character_image(artifacts["character"])
+    return await api.image_to_video(image_url, f"{params['prompt']}, {BRAINROT_STYLE}", duration=5)
+
+
+async def resume_lesson(job):
+    params, artifacts = job["params"], job["artifacts"]
+    topic = params["topic"]
+    final_filename = artifacts.get("final_filename") or f"outputs/final_lesson_{topic.replace(' ', '_')}_{job['id'][:4]}.mp4"
+    max_size_mb = artifacts.get("max_size_mb") or 8 * 0.94
+    os.makedirs("outputs", exist_ok=True)
+
+    # Finished stages come back from the result cache, running ones are picked up again
+    lesson = await lesson_pipeline.aload()
+    stages = lesson.lesson_stages(topic, final_filename, lesson_api, max_size_mb, admission.encode.slot, gemini,
+                                  encode_pool=encode_pool)
+    try:
+        results, timings = await run_stages(stages)
+    except StageFailed as e:
+        await deliver_resumed(job, f"Error: Failed to generate {e.stage.label} for lesson **{topic}**")
+        return
+    final_path = results["combine"]
+    if not final_path or not os.path.exists(final_path):
+        await deliver_resumed(job, f"Error: Video file was not created for lesson **{topic}**")
+        return
+    file_size = os.path.getsize(final_path)
+    if file_size > guild_upload_limit(bot.get_guild(job["guild_id"] or 0)):
+        await deliver_resumed(job, f"Lesson **{topic}** was generated but it's too large to upload "
+                                   f"({file_size/1024/1024:.1f}MB). Saved locally as `{final_path}`")
+        return
+    embed = discord.Embed(title=f"Lesson: {topic}", description=f"{results['script'][:200]}...", color=0x3498db)
+    embed.set_footer(text=format_timings(timings))
+    await deliver_resumed(job, embed=embed, file=discord.File(final_path))
+
+
+async def resume_job(job):
+    job_id = job["id"]
+    token = current_job.set(job_id)
+    try:
+        if time.time() - job["created"] > JOB_RESUME_MAX_AGE:
+            job_store.finish(job_id, error="expired before restart")
+            return
+        print(f"Resuming /{job['command']} job {job_id[:8]} (stage: {job['stage']})", flush=True)
+        async with admission.remote.slot():
+            if job["command"] == "generate_lesson":
+                await resume_lesson(job)
+            else:
+                if job["command"] == "brainrot_v2":
+                    result, error = await resume_brainrot(job["params"], job["artifacts"])
+                elif job["command"] in MAGIC_HOUR_RESUMERS:
+                    result, error = await MAGIC_HOUR_RESUMERS[job["command"]](job["params"])
+                else:
+                    job_store.finish(job_id, error="not resumable")
+                    return
+                if error:
+                    await deliver_resumed(job, f"Your /{job['command']} job failed: {error}")
+                elif not result_video_url(result):
+                    await deliver_resumed(job, f"Your /{job['command']} video was generated but couldn't get "
+                                               f"download URL. Response: {result}")
+                else:
+                    embed = discord.Embed(title=f"/{job['command']} finished", color=0x00ff00)
+
+                    async def send(**kwargs):
+                        await deliver_resumed(job, **kwargs)
+
+                    await relay_video(send, result_video_url(result), embed,
+                                      guild_upload_limit(bot.get_guild(job["guild_id"] or 0)), f"{job['command']}.mp4")
+        job_store.finish(job_id)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Failed to resume job {job_id[:8]}: {e}", flush=True)
+        job_store.finish(job_id, error=str(e) or type(e).__name__)
+    finally:
+        current_job.reset(token)
+
+
+async def resume_jobs(jobs):
+    """Finishes the jobs that were still running when the bot last stopped"""
+    await bot.wait_until_ready()
+    if jobs:
+        print(f"Resuming {len(jobs)} unfinished job(s)", flush=True)
+        await asyncio.gather(*(resume_job(job) for job in jobs))
+
 
 if __name__ == "__main__":
     bot.run(DISCORD_TOKEN)
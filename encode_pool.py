@@ -0,0 +1,215 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import types
+from contextlib import contextmanager
+
+from telemetry import counter, get_logger, histogram
+
+try:
+    import psutil  # optional: memory of ffmpeg children on every platform
+except ImportError:
+    psutil = None
+
+# Encode workers (overridable from .env)
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", str(os.cpu_count() or 1)))
+ENCODE_TIMEOUT = float(os.getenv("ENCODE_TIMEOUT", "600"))
+# A worker (with its ffmpeg children) over this much RSS is killed; 0 turns the check off
+ENCODE_MEMORY_LIMIT_MB = float(os.getenv("ENCODE_MEMORY_LIMIT_MB", "2048"))
+ENCODE_CHECK_INTERVAL = 0.5
+
+ENCODE_JOBS = counter("clanker_encode_jobs_total",
+                      "Encode jobs by outcome (ok, error, timeout, memory, crashed, cancelled)")
+ENCODE_SECONDS = histogram("clanker_encode_seconds", "Time encode jobs spent in a worker process")
+log = get_logger("encode")
+
+
+class EncodeError(Exception):
+    """Raised by EncodePool.run when the job fails, times out or its worker is killed"""
+
+
+def _serve(conn, preload):
+    """Worker process: runs (func, args) jobs from the pipe until it closes"""
+    if hasattr(os, "setsid"):
+        os.setsid()  # own process group, so killing the worker also kills its ffmpeg children
+    for name in preload:
+        importlib.import_module(name)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        func, args = job
+        try:
+            reply = ("ok", func(*args))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+
+def _proc_group_rss(pgid: int) -> int:
+    """RSS of every process in a process group, from /proc (Linux without psutil)"""
+    page = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except OSError:
+            continue
+        # fields[0] is stat field 3 (state): pgrp is field 5, rss (pages) field 24
+        if int(fields[2]) == pgid:
+            total += int(fields[21]) * page
+    return total
+
+
+@contextmanager
+def _slim_main():
+    """
+    Hides the running script from spawn while a worker starts. A spawned child
+    normally re-runs the parent's __main__ (bot.py: the bot, job store, cache
+    scan and asset hosting); with an empty one it only imports what it needs.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class _Worker:
+    def __init__(self, ctx, preload):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child, tuple(preload)), name="encode-worker", daemon=True)
+        with _slim_main():
+            self.process.start()
+        child.close()
+
+    def rss(self):
+        """Bytes used by the worker and its children, or None when it cannot be measured here"""
+        try:
+            if psutil is not None:
+                process = psutil.Process(self.process.pid)
+                return process.memory_info().rss + sum(child.memory_info().rss
+                                                       for child in process.children(recursive=True))
+            if os.path.isdir("/proc"):
+                return _proc_group_rss(self.process.pid)
+        except Exception:
+            pass
+        return None
+
+    def kill(self):
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class EncodePool:
+    """
+    Runs CPU-heavy encodes (MoviePy's frame loop holds the GIL) in worker
+    processes, so the event loop keeps ticking while they run.
+
+    At most `workers` jobs run at once; the rest wait their turn. Workers are
+    spawned on first use (or by start()) and reused. A job that runs past its
+    timeout, or whose worker grows past memory_limit_mb including ffmpeg
+    children, has its worker killed and replaced, and run() raises
+    EncodeError. Jobs are a module-level function of an importable module (the
+    workers do not run the script that started them) plus picklable arguments,
+    and should hand back something small, such as the output file path.
+    """
+
+    def __init__(self, workers: int = ENCODE_WORKERS, timeout: float = ENCODE_TIMEOUT,
+                 memory_limit_mb: float = ENCODE_MEMORY_LIMIT_MB, preload=()):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.preload = tuple(preload)  # modules each worker imports up front, e.g. the lesson pipeline
+        self._ctx = multiprocessing.get_context("spawn")  # forking a process full of threads is not safe
+        self._slots = asyncio.Semaphore(self.workers)
+        self._idle = []
+        self.killed = 0
+        self.peak_rss = 0
+
+    def start(self):
+        """Spawns every worker now, so the first encode does not wait for one to boot"""
+        while len(self._idle) < self.workers:
+            self._idle.append(_Worker(self._ctx, self.preload))
+
+    async def run(self, func, *args, timeout: float = None):
+        """Runs func(*args) in a worker process and returns its result"""
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else _Worker(self._ctx, self.preload)
+            reusable = False
+            started = time.monotonic()
+            outcome = "cancelled"
+            try:
+                outcome, value = await self._wait(worker, func, args, timeout or self.timeout)
+                reusable = outcome in ("ok", "error")
+            finally:
+                elapsed = time.monotonic() - started
+                if reusable:
+                    self._idle.append(worker)
+                else:
+                    self.killed += 1
+                    worker.kill()
+                ENCODE_JOBS.inc(outcome=outcome)
+                ENCODE_SECONDS.observe(elapsed, outcome=outcome)
+        if outcome != "ok":
+            log.warning("encode_failed", job=getattr(func, "__name__", func), outcome=outcome,
+                        seconds=f"{elapsed:.1f}", error=value)
+            raise EncodeError(value)
+        return value
+
+    async def _wait(self, worker, func, args, timeout):
+        loop = asyncio.get_running_loop()
+        worker.conn.send((func, args))
+        started = time.monotonic()
+        while not worker.conn.poll():
+            if not worker.process.is_alive():
+                return "crashed", f"encode worker exited with code {worker.process.exitcode}"
+            if time.monotonic() - started > timeout:
+                return "timeout", f"encode took longer than {timeout:.0f}s"
+            if self.memory_limit:
+                rss = await loop.run_in_executor(None, worker.rss)  # a /proc scan is too slow for the loop
+                if rss is not None:
+                    self.peak_rss = max(self.peak_rss, rss)
+                    if rss > self.memory_limit:
+                        return "memory", (f"encode used {rss / 1024 / 1024:.0f}MB, over the "
+                                          f"{self.memory_limit / 1024 / 1024:.0f}MB limit")
+            await asyncio.sleep(ENCODE_CHECK_INTERVAL)
+        try:
+            return worker.conn.recv()
+        except EOFError:
+            return "crashed", f"encode worker exited with code {worker.process.exitcode}"
+
+    async def close(self):
+        """Stops idle workers (jobs still running are killed when their run() is cancelled)"""
+        idle, self._idle = self._idle, []
+        loop = asyncio.get_running_loop()
+        for worker in idle:
+            await loop.run_in_executor(None, worker.stop)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import random
+import sys
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+# http_pool lives next to bot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from http_pool import HTTPPool
+from telemetry import counter, get_logger
+
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+DEFAULT_MODEL = "gemini-2.0-flash"
+# Limits (overridable from .env)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+GEMINI_RETRIES = int(os.getenv("GEMINI_RETRIES", "3"))
+RETRIES = counter("clanker_gemini_retries_total", "Gemini requests retried after a rate limit or transient error")
+log = get_logger("gemini")
+# Worth another try: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 16.0
+
+
+class GeminiError(Exception):
+    """Raised by GeminiClient.stream when Gemini fails before or during the stream"""
+
+
+class GeminiClient:
+    """Async Gemini REST client shared by the bot and the lesson tools.
+
+    Requests go through an HTTPPool (a private one is created and closed with
+    the client when none is passed), so the TLS connection to Gemini is
+    reused between calls. Each call has its own timeout, rate-limit and
+    server errors are retried with jittered exponential backoff, and at most
+    max_concurrency requests are in flight at once.
+    """
+
+    def __init__(self, api_key: str = None, model: str = DEFAULT_MODEL, pool: HTTPPool = None,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY, timeout: float = GEMINI_TIMEOUT,
+                 retries: int = GEMINI_RETRIES):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.model = model
+        self.owns_pool = pool is None
+        self.pool = pool or HTTPPool()
+        self.timeout = timeout
+        self.retries = retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.calls = 0
+        self.retried = 0
+
+    async def close(self):
+        """Close the pool, if this client created it"""
+        if self.owns_pool:
+            await self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        # Full jitter keeps retries from many callers from lining up
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def _text(data):
+        """Joins the text parts of the first candidate; returns (text, error)"""
+        candidates = data.get("candidates") or []
+        if not candidates:
+            reason = data.get("promptFeedback", {}).get("blockReason")
+            return None, f"No candidates in response{f' (blocked: {reason})' if reason else ''}"
+        parts = candidates[0].get("content", {}).get("parts") or []
+        text = "".join(part.get("text", "") for part in parts).strip()
+        if not text:
+            return None, f"Empty response (finish reason: {candidates[0].get('finishReason')})"
+        return text, None
+
+    def _payload(self, prompt, temperature, max_output_tokens):
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        config = {}
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_output_tokens is not None:
+            config["maxOutputTokens"] = max_output_tokens
+        if config:
+            payload["generationConfig"] = config
+        return payload
+
+    @staticmethod
+    def _describe(e, timeout):
+        if isinstance(e, asyncio.TimeoutError):
+            return f"Gemini API timeout after {timeout.total or timeout.sock_read:.0f} seconds"
+        return f"Gemini API connection error: {e}"
+
+    @asynccontextmanager
+    async def _response(self, url, payload, timeout: aiohttp.ClientTimeout):
+        """
+        Holds a concurrency slot and yields the first 200 response. Rate limits,
+        server errors and failures to connect are retried with backoff; errors
+        raised while the caller reads the response are not. Raises GeminiError.
+        """
+        if not self.api_key:
+            raise GeminiError("GEMINI_API_KEY is not set")
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+        error = None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            opened = False
+            async with self.semaphore:
+                self.calls += 1
+                try:
+                    async with self.pool.session().post(url, json=payload, headers=headers,
+                                                        timeout=timeout) as resp:
+                        if resp.status == 200:
+                            opened = True
+                            yield resp
+                            return
+                        body = await resp.text()
+                        error = f"Gemini API error ({resp.status}): {body[:300]}"
+                        if resp.status not in RETRY_STATUSES:
+                            raise GeminiError(error)
+                        if resp.headers.get("Retry-After", "").isdigit():
+                            retry_after = min(float(resp.headers["Retry-After"]), BACKOFF_MAX)
+                except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                    if opened:
+                        raise
+                    error = self._describe(e, timeout)
+
+            if attempt < self.retries:
+                delay = self._backoff(attempt, retry_after)
+                self.retried += 1
+                RETRIES.inc()
+                log.warning("retrying", error=error, delay=f"{delay:.1f}", attempt=f"{attempt + 1}/{self.retries}")
+                await asyncio.sleep(delay)
+        raise GeminiError(error)
+
+    async def generate(self, prompt: str, model: str = None, temperature: float = None,
+                       max_output_tokens: int = None, timeout: float = None):
+        """Generates text for prompt; returns (text, error)"""
+        url = f"{GEMINI_API_BASE}/models/{model or self.model}:generateContent"
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        try:
+            async with self._response(url, self._payload(prompt, temperature, max_output_tokens),
+                                      client_timeout) as resp:
+                return self._text(await resp.json())
+        except GeminiError as e:
+            return None, str(e)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            return None, self._describe(e, client_timeout)
+
+    async def stream(self, prompt: str, model: str = None, temperature: float = None,
+                     max_output_tokens: int = None, timeout: float = None):
+        """
+        Yields the response text piece by piece as Gemini writes it
+        (streamGenerateContent over server-sent events). timeout applies to
+        each read, so a long but steady response is not cut off. Raises
+        GeminiError if the request fails or the stream breaks off.
+        """
+        url = f"{GEMINI_API_BASE}/models/{model or self.model}:streamGenerateContent?alt=sse"
+        client_timeout = aiohttp.ClientTimeout(sock_connect=timeout or self.timeout,
+                                               sock_read=timeout or self.timeout)
+        try:
+            async with self._response(url, self._payload(prompt, temperature, max_output_tokens),
+                                      client_timeout) as resp:
+                async for line in resp.content:
+                    if not line.startswith(b"data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    reason = event.get("promptFeedback", {}).get("blockReason")
+                    if reason:
+                        raise GeminiError(f"Prompt blocked: {reason}")
+                    for candidate in event.get("candidates", [])[:1]:
+                        parts = candidate.get("content", {}).get("parts") or []
+                        text = "".join(part.get("text", "") for part in parts)
+                        if text:
+                            yield text
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            raise GeminiError(self._describe(e, client_timeout)) from e
@@ -1,11 +1,25 @@
+import asyncio
 import os
+import re
+import sys
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+# result_cache lives next to bot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from result_cache import default_cache
+
+from LLM.gemini_client import GeminiClient
 
 # Load environment variables from a .env file if it exists
 load_dotenv()
 
-def generate_text(prompt, api_key=None):
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+# End of a sentence: punctuation, optional closing quote/bracket, then whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+# Sentences shorter than this are voiced together with the next one
+MIN_SEGMENT_CHARS = 60
+
+async def generate_text(prompt, api_key=None, client=None):
     """
     Generates text using the Google Gemini API.
     
@@ -13,35 +27,30 @@ def generate_text(prompt, api_key=None):
         prompt (str): The text prompt to send to the model.
         api_key (str, optional): The Gemini API key. If not provided, 
                                  it will attempt to look for 'GEMINI_API_KEY' environment variable.
+        client (GeminiClient, optional): Shared client to reuse its connections.
+                                 A temporary one is used when omitted.
     
     Returns:
         str: The generated text response.
     """
-    
-    # key configuration
-    if not api_key:
-        api_key = os.environ.get('GEMINI_API_KEY')
-    
-    if not api_key:
-        raise ValueError("API Key is required. Please provide it as an argument or set 'GEMINI_API_KEY' environment variable.")
+    if client is None:
+        # key configuration
+        if not api_key:
+            api_key = os.environ.get('GEMINI_API_KEY')
 
-    genai.configure(api_key=api_key)
+        if not api_key:
+            raise ValueError("API Key is required. Please provide it as an argument or set 'GEMINI_API_KEY' environment variable.")
 
-    # Use the gemini-1.5-flash model (efficient and fast)
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
-    
-    try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error generating text: {str(e)}"
+        async with GeminiClient(api_key) as client:
+            return await generate_text(prompt, client=client)
 
-def generate_video_description(user_input, api_key=None):
-    """
-    Wraps the user input in a specific prompt for video motion description
-    and generates the response using Gemini.
-    """
-    ai_prompt = f"""
+    text, error = await client.generate(prompt, model=GEMINI_MODEL)
+    if error:
+        return f"Error generating text: {error}"
+    return text
+
+def _lesson_prompt(user_input):
+    return f"""
     You are an expert teacher creating short educational scripts for text-to-video generation.
 
 I will give you a topic (a word, phrase, or short sentence).
@@ -78,7 +87,85 @@ Short summary or takeaway
 
 Topic: {user_input}
 """
-    return generate_text(ai_prompt, api_key)
+
+
+def split_sentences(text, final=False):
+    """
+    Splits text into sentence segments of at least MIN_SEGMENT_CHARS.
+    Returns (segments, rest) where rest is the unfinished tail; with
+    final=True the tail is returned as the last segment instead.
+    """
+    segments = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if match.end() - start >= MIN_SEGMENT_CHARS:
+            segments.append(" ".join(text[start:match.end()].split()))
+            start = match.end()
+    rest = text[start:]
+    if final:
+        if rest.strip():
+            segments.append(" ".join(rest.split()))
+        rest = ""
+    return segments, rest
+
+
+async def generate_video_description(user_input, api_key=None, client=None):
+    """
+    Wraps the user input in a specific prompt for video motion description
+    and generates the response using Gemini (through client when given).
+    """
+    ai_prompt = _lesson_prompt(user_input)
+    # Same topic + prompt + model -> reuse the script instead of calling Gemini again
+    cache_params = {"prompt": ai_prompt, "model": GEMINI_MODEL}
+    cache = default_cache()
+    entry = await asyncio.get_running_loop().run_in_executor(None, cache.get, "lesson_script", cache_params)
+    if entry is not None:
+        return entry.value
+
+    script = await generate_text(ai_prompt, api_key, client)
+    if script and not script.startswith("Error generating text:"):
+        await asyncio.get_running_loop().run_in_executor(
+            None, cache.put, "lesson_script", cache_params, script
+        )
+    return script
+
+
+async def stream_video_description(user_input, api_key=None, client=None):
+    """
+    Streaming generate_video_description: yields the script one sentence
+    segment at a time while Gemini is still writing the rest. Shares its
+    cache entries. Raises GeminiError if generation fails.
+    """
+    ai_prompt = _lesson_prompt(user_input)
+    cache_params = {"prompt": ai_prompt, "model": GEMINI_MODEL}
+    cache = default_cache()
+    entry = await asyncio.get_running_loop().run_in_executor(None, cache.get, "lesson_script", cache_params)
+    if entry is not None:
+        for segment in split_sentences(entry.value, final=True)[0]:
+            yield segment
+        return
+
+    if client is None:
+        async with GeminiClient(api_key) as client:
+            async for segment in stream_video_description(user_input, client=client):
+                yield segment
+        return
+
+    pieces = []
+    rest = ""
+    async for text in client.stream(ai_prompt, model=GEMINI_MODEL):
+        pieces.append(text)
+        segments, rest = split_sentences(rest + text)
+        for segment in segments:
+            yield segment
+    for segment in split_sentences(rest, final=True)[0]:
+        yield segment
+
+    script = "".join(pieces).strip()
+    if script:
+        await asyncio.get_running_loop().run_in_executor(
+            None, cache.put, "lesson_script", cache_params, script
+        )
 
 if __name__ == "__main__":
     # Example usage code for testing
@@ -131,7 +218,7 @@ User input:
                 continue
                 
             print(f"\nGenerative response...")
-            result = generate_video_description(user_input)
+            result = asyncio.run(generate_video_description(user_input))
             print("-" * 20)
             print(result)
             print("-" * 20)
@@ -0,0 +1,88 @@
+import os
+import subprocess
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+AUDIO_BITRATE_KBPS = 128
+# Container overhead allowance on top of the raw stream sizes
+MUX_OVERHEAD = 1.02
+
+
+def probe(path):
+    """Returns ffmpeg's stream info for a media file (duration, bitrates, codecs...)"""
+    return ffmpeg_parse_infos(path, decode_file=False)
+
+
+def run_ffmpeg(args):
+    """Runs the ffmpeg binary MoviePy uses, raising RuntimeError with its stderr on failure"""
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y"] + args
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.decode(errors='replace')[-500:]}")
+
+
+def estimate_looped_size(video_path, video_duration, target_duration, audio_kbps=AUDIO_BITRATE_KBPS):
+    """Bytes a stream-copied loop of video_path covering target_duration (plus narration) will take"""
+    loops = target_duration / video_duration
+    video_bytes = os.path.getsize(video_path) * loops
+    audio_bytes = audio_kbps * 1000 / 8 * target_duration
+    return (video_bytes + audio_bytes) * MUX_OVERHEAD
+
+
+def stream_copy_audio_video(video_path, audio_path, output_path, max_size_mb=7.5):
+    """
+    Loops the video with -stream_loop and copies its frames untouched, only
+    encoding the narration to AAC. Returns output_path, or None when the copy
+    would not fit max_size_mb (the caller should re-encode at a lower bitrate).
+    """
+    video_info = probe(video_path)
+    audio_info = probe(audio_path)
+    video_duration = video_info.get("video_duration") or video_info.get("duration")
+    duration = audio_info.get("duration")
+    if not video_info.get("video_found") or not video_duration or not duration:
+        print("Stream copy: could not read durations, falling back to re-encode")
+        return None
+
+    max_bytes = max_size_mb * 1024 * 1024
+    estimate = estimate_looped_size(video_path, video_duration, duration)
+    if estimate > max_bytes:
+        print(f"Stream copy: estimated {estimate / 1024 / 1024:.1f}MB exceeds {max_size_mb}MB, re-encoding instead")
+        return None
+
+    print(f"Stream copy: looping {video_duration:.1f}s clip to {duration:.1f}s without re-encoding video")
+    run_ffmpeg([
+        "-stream_loop", "-1", "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE_KBPS}k",
+        "-t", f"{duration:.3f}",
+        "-movflags", "+faststart",
+        output_path,
+    ])
+
+    # The estimate is conservative, but never hand back a file over budget
+    if os.path.getsize(output_path) > max_bytes:
+        print("Stream copy: output exceeded the size budget, re-encoding instead")
+        os.remove(output_path)
+        return None
+    return output_path
+
+
+def concat_audio(audio_paths, output_path):
+    """
+    Joins audio files end to end into one MP3 with ffmpeg's concat filter,
+    which accepts segments in any format or sample rate. Returns output_path.
+    """
+    args = []
+    for path in audio_paths:
+        args += ["-i", path]
+    inputs = "".join(f"[{i}:a:0]" for i in range(len(audio_paths)))
+    run_ffmpeg(args + [
+        "-filter_complex", f"{inputs}concat=n={len(audio_paths)}:v=0:a=1[out]",
+        "-map", "[out]",
+        "-c:a", "libmp3lame", "-b:a", f"{AUDIO_BITRATE_KBPS}k",
+        output_path,
+    ])
+    return output_path
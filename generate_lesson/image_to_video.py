@@ -1,7 +1,12 @@
 from magic_hour import Client
 import os
+import sys
 from dotenv import load_dotenv
 
+# MagicHourAPI lives next to bot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from magic_hour_api import MagicHourAPI
+
 load_dotenv()
 
 def generate_video(prompt, image_path="input/image.png", output_dir="outputs"):
@@ -38,6 +43,42 @@ def generate_video(prompt, image_path="input/image.png", output_dir="outputs"):
         print(f"Error generating video: {e}")
         return None
 
+async def generate_video_async(prompt, image_path="input/image.png", output_dir="outputs", api=None):
+    """
+    Async version of generate_video built on MagicHourAPI. Local images are
+    uploaded first; the render is polled without holding a thread.
+    """
+    if api is None:
+        api_key = os.getenv("MAGIC_HOUR_API_KEY_PREMIUM")
+        if not api_key:
+            print("Error: MAGIC_HOUR_API_KEY_PREMIUM is not set.")
+            return None
+        async with MagicHourAPI(api_key) as api:
+            return await generate_video_async(prompt, image_path, output_dir, api)
+
+    print(f"Generating video with prompt: {prompt[:50]}...")
+
+    try:
+        image_file_path = await api.upload_file(image_path)
+    except Exception as e:
+        print(f"Error uploading image: {e}")
+        return None
+
+    result, error = await api.image_to_video(image_file_path, prompt, duration=30)
+    if error:
+        print(f"Error generating video: {error}")
+        return None
+
+    try:
+        video_result = await api.download_outputs(result, output_dir)
+    except Exception as e:
+        print(f"Error downloading video: {e}")
+        return None
+
+    print(f"Video created with id {video_result.id}, spent {video_result.credits_charged} credits.")
+    print(f"Video outputs saved at {video_result.downloaded_paths}")
+    return video_result
+
 if __name__ == "__main__":
     # Test execution
     test_prompt = "A simple camera pan."
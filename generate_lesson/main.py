@@ -1,19 +1,84 @@
+import argparse
+import asyncio
+import hashlib
+import json
 import os
+import re
 import sys
+import time
 
 # Ensure we can find the LLM module
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from LLM.llm import generate_video_description
-from text_to_video import generate_text_to_video
-from text_speech import generate_speech
+from LLM.llm import generate_video_description, stream_video_description, split_sentences
+from LLM.gemini_client import GeminiClient
+from text_to_video import generate_text_to_video_async
+from text_speech import generate_speech_stream_async
+from magic_hour_api import MagicHourAPI
+from admission import SlotPool
+from encode_pool import EncodePool
+from job_store import JobStore
+from result_cache import default_cache
+from poll_strategy import AdaptivePollStrategy
+from pipeline import Stage, run_stages, StageFailed, format_timings
+from ffmpeg_tools import stream_copy_audio_video
+from size_target import SizeLimitExceeded, encode_to_size
+from telemetry import span
 from moviepy import VideoFileClip, AudioFileClip, vfx
 
-def combine_audio_video(video_path, audio_path, output_path="outputs/final_video.mp4", max_size_mb=7.5):
+# Lessons generated at once in --batch mode (overridable from .env)
+LESSON_BATCH_PARALLEL = int(os.getenv("LESSON_BATCH_PARALLEL", "3"))
+
+def combine_audio_video(video_path, audio_path, output_path="outputs/final_video.mp4", max_size_mb=7.5, mode="auto"):
     """
     Combines video and audio files into a single video file.
     Automatically adjusts bitrate to keep file under max_size_mb (default 7.5MB for Discord's 8MB limit).
+
+    mode="auto" first tries the ffmpeg stream-copy path (video frames are looped
+    and copied, only the narration is encoded) and re-encodes only when a lower
+    bitrate is needed to fit max_size_mb. "copy" and "reencode" force one path.
     """
+    if mode in ("auto", "copy"):
+        try:
+            copied = stream_copy_audio_video(video_path, audio_path, output_path, max_size_mb)
+            if copied:
+                print(f"Final video saved to: {output_path}")
+                return copied
+        except Exception as e:
+            print(f"Stream copy failed, re-encoding instead: {e}")
+        if mode == "copy":
+            return None
+    return reencode_audio_video(video_path, audio_path, output_path, max_size_mb)
+
+
+def reencode_audio_video(video_path, audio_path, output_path="outputs/final_video.mp4", max_size_mb=7.5):
+    """
+    Loops and re-encodes the video at a bitrate that fits max_size_mb, using the
+    size-targeting ffmpeg encoder (probe encode + per-source history) so the
+    result lands just under the limit. Falls back to MoviePy only if ffmpeg
+    fails; returns None rather than a file over max_size_mb.
+    """
+    try:
+        print(f"Combining video ({video_path}) and audio ({audio_path})...")
+        encode_to_size(video_path, audio_path, output_path, max_size_mb)
+        print(f"Final video saved to: {output_path}")
+        return output_path
+    except SizeLimitExceeded as e:
+        # MoviePy's one-shot bitrate guess would only render it a third time
+        print(f"Error combining video and audio: {e}")
+        return None
+    except Exception as e:
+        print(f"Size-targeted encode failed, falling back to MoviePy: {e}")
+    output = moviepy_reencode_audio_video(video_path, audio_path, output_path, max_size_mb)
+    if output and os.path.getsize(output) > max_size_mb * 1024 * 1024:
+        print(f"Error combining video and audio: MoviePy output is over the {max_size_mb}MB limit")
+        os.remove(output)
+        return None
+    return output
+
+
+def moviepy_reencode_audio_video(video_path, audio_path, output_path="outputs/final_video.mp4", max_size_mb=7.5):
+    """Loops and re-encodes the video with MoviePy using a one-shot bitrate estimate"""
     try:
         print(f"Combining video ({video_path}) and audio ({audio_path})...")
 
@@ -52,7 +117,225 @@ def combine_audio_video(video_path, audio_path, output_path="outputs/final_video
         print(f"Error combining video and audio: {e}")
         return None
 
-def main():
+async def _run_blocking(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+async def _segments_of(script):
+    for segment in split_sentences(script, final=True)[0]:
+        yield segment
+
+
+def lesson_stages(topic, final_output, api=None, max_size_mb=7.5, encode_slot=None, gemini=None, on_script=None,
+                  encode_pool=None):
+    """
+    Builds the lesson pipeline: the script streams in from Gemini and each
+    finished sentence goes straight to narration, the video visuals start
+    once the whole script is in, then audio and video are combined.
+    The script comes from the async Gemini client (pass `gemini` to share
+    one) and audio and video use the async Magic Hour client (pass `api` to
+    share one), so only the CPU-bound combine step runs on a thread. The
+    final video is sized to land just under max_size_mb. Pass encode_slot (a
+    factory for an async context manager, e.g. Admission.encode.slot) to cap
+    how many combines run at once, on_script (awaited with the script so
+    far) to show the script as it is written, and encode_pool (an
+    EncodePool) to run the combine in a worker process instead of on a
+    thread, where MoviePy would hold the GIL the event loop needs.
+    """
+    sentences = asyncio.Queue()
+
+    async def script(results):
+        segments = []
+        async for segment in stream_video_description(topic, client=gemini):
+            segments.append(segment)
+            sentences.put_nowait(segment)
+            if on_script is not None:
+                try:
+                    await on_script(" ".join(segments))
+                except Exception as e:
+                    print(f"Script callback failed: {e}")
+        sentences.put_nowait(None)
+        return " ".join(segments)
+
+    async def streamed_segments():
+        while (segment := await sentences.get()) is not None:
+            yield segment
+
+    async def audio(results):
+        # A seeded script (approved in the CLI) is voiced the same way
+        source = _segments_of(results["script"]) if "script" in results else streamed_segments()
+        return await generate_speech_stream_async(source, api=api)
+
+    async def video(results):
+        # We can optionally prepend a style instruction to the script for the video generator
+        video_prompt = f"Educational video, clear visualization. {results['script']}"
+        video_result = await generate_text_to_video_async(video_prompt, api=api)
+        if not video_result or not video_result.downloaded_paths:
+            return None
+        return video_result.downloaded_paths[0]
+
+    async def combine(results):
+        async def encode():
+            args = (results["video"], results["audio"], final_output, max_size_mb)
+            with span("encode", output=os.path.basename(final_output)):
+                if encode_pool is not None:
+                    return await encode_pool.run(combine_audio_video, *args)
+                return await _run_blocking(combine_audio_video, *args)
+
+        if encode_slot is None:
+            return await encode()
+        async with encode_slot():
+            return await encode()
+
+    return [
+        Stage("script", script, label="script"),
+        Stage("audio", audio, label="audio narration"),
+        Stage("video", video, deps=["script"], label="video visuals"),
+        Stage("combine", combine, deps=["audio", "video"], label="combining audio and video"),
+    ]
+
+
+async def _print_progress(name, state):
+    print(f"  [{name}] {state}")
+
+
+async def _run_lesson(topic, lesson_script, final_output):
+    """Runs the remaining lesson stages with one Magic Hour client for the whole lesson"""
+    api_key = os.getenv("MAGIC_HOUR_API_KEY_PREMIUM") or os.getenv("MAGIC_HOUR_API_KEY")
+    async with MagicHourAPI(api_key, strategy=AdaptivePollStrategy()) as api:
+        return await run_stages(
+            lesson_stages(topic, final_output, api),
+            results={"script": lesson_script},
+            on_progress=_print_progress,
+        )
+
+
+def lesson_filename(topic):
+    """Stable output name for a topic, so a rerun finds lessons it already made"""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", topic).strip("_")[:60] or "lesson"
+    return f"{slug}_{hashlib.sha256(topic.encode('utf-8')).hexdigest()[:8]}.mp4"
+
+
+def read_topics(source):
+    """Topics from a file (or stdin for '-'), one per line; blank lines, # comments and repeats are skipped"""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    topics = []
+    for line in lines:
+        topic = " ".join(line.split())
+        if topic and not topic.startswith("#") and topic not in topics:
+            topics.append(topic)
+    return topics
+
+
+def read_manifest(path):
+    """Latest manifest entry per topic; a line cut short by an interrupted run is ignored"""
+    entries = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry.get("topic")] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+async def run_batch(topics, output_dir, parallel=LESSON_BATCH_PARALLEL, mux_workers=None, max_size_mb=7.5,
+                    manifest_path=None):
+    """
+    Generates a lesson per topic without prompting, `parallel` at a time, with
+    the combines on an EncodePool of mux_workers processes (default: one per CPU).
+
+    Topics whose video is already in output_dir are skipped. Videos are
+    encoded to a .part.mp4 name and renamed once complete, and each finished
+    topic is appended to the JSONL manifest straight away, so an interrupted
+    run can simply be started again: finished stages come back from the
+    result cache and Magic Hour renders that were still going are picked up
+    from the job store kept next to the videos.
+
+    Returns the number of topics that failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.jsonl")
+    mux_workers = mux_workers or os.cpu_count() or 1
+    # Encodes cut off by the last run are redone from scratch
+    for name in os.listdir(output_dir):
+        if name.endswith(".part.mp4"):
+            os.remove(os.path.join(output_dir, name))
+    recorded = read_manifest(manifest_path)
+
+    lesson_slots = SlotPool("lessons", parallel)
+    encode_slots = SlotPool("encode", mux_workers)
+    store = JobStore(os.path.join(output_dir, ".batch_jobs.sqlite3"))
+    store.start()
+    encode_pool = EncodePool(mux_workers)
+    failed = 0
+    api_key = os.getenv("MAGIC_HOUR_API_KEY_PREMIUM") or os.getenv("MAGIC_HOUR_API_KEY")
+    try:
+        with open(manifest_path, "a", encoding="utf-8") as manifest:
+            def record(entry):
+                entry["finished_at"] = round(time.time(), 3)
+                manifest.write(json.dumps(entry) + "\n")
+                manifest.flush()
+                os.fsync(manifest.fileno())
+
+            async with GeminiClient() as gemini, MagicHourAPI(api_key, strategy=AdaptivePollStrategy(),
+                                                              cache=default_cache(), store=store) as api:
+                async def lesson(n, topic):
+                    nonlocal failed
+                    output = os.path.join(output_dir, lesson_filename(topic))
+                    if os.path.exists(output):
+                        print(f"[{n}/{len(topics)}] {topic}: already done, skipping", flush=True)
+                        if recorded.get(topic, {}).get("status") != "ok":
+                            record({"topic": topic, "status": "skipped", "output": output})
+                        return
+
+                    async def on_progress(name, state):
+                        print(f"[{n}/{len(topics)}] {topic}: {name} {state}", flush=True)
+
+                    async with lesson_slots.slot():
+                        started = time.perf_counter()
+                        partial = output[:-len(".mp4")] + ".part.mp4"
+                        stages = lesson_stages(topic, partial, api, max_size_mb, encode_slots.slot, gemini,
+                                               encode_pool=encode_pool)
+                        entry = {"topic": topic, "output": output}
+                        try:
+                            results, timings = await run_stages(stages, on_progress=on_progress)
+                            os.replace(results["combine"], output)
+                            entry.update(status="ok", size_bytes=os.path.getsize(output))
+                        except StageFailed as e:
+                            entry.update(status="failed", stage=e.stage.name, error=str(e))
+                            timings = {}
+                        except Exception as e:
+                            entry.update(status="failed", error=str(e) or type(e).__name__)
+                            timings = {}
+                        total = time.perf_counter() - started
+                        entry.update(timings={name: round(seconds, 2) for name, seconds in timings.items()},
+                                     total_seconds=round(total, 2))
+                        record(entry)
+                    if entry["status"] == "ok":
+                        print(f"[{n}/{len(topics)}] {topic}: saved to {output} "
+                              f"({format_timings(timings, total)})", flush=True)
+                    else:
+                        failed += 1
+                        print(f"[{n}/{len(topics)}] {topic}: failed: {entry['error']}", flush=True)
+
+                await asyncio.gather(*(lesson(n, topic) for n, topic in enumerate(topics, 1)))
+    finally:
+        await encode_pool.close()
+        await store.close()
+    return failed
+
+
+def interactive():
     print("Welcome to the AI Video Teacher!")
     print("----------------------------------")
     
@@ -70,7 +353,7 @@ def main():
         try:
             # Step 1: Generate Lesson Script using Gemini
             print(f"\n[1/2] Generating lesson script for '{user_input}'...")
-            lesson_script = generate_video_description(user_input)
+            lesson_script = asyncio.run(generate_video_description(user_input))
             
             print("\nGenerated Script:")
             print("-" * 20)
@@ -82,34 +365,49 @@ def main():
                 print("Skipping video generation.")
                 continue
 
-            # Step 2: Generate Audio using Magic Hour (Text-to-Speech)
-            print("\n[2/4] Generating Audio for script...")
-            audio_path = generate_speech(lesson_script)
-            if not audio_path:
-                print("Failed to generate audio. Stopping.")
-                continue
-
-            # Step 3: Generate Video using Magic Hour (Text-to-Video)
-            print("\n[3/4] Generating Video visual for script...")
-            
-            # We can optionally prepend a style instruction to the script for the video generator
-            # or just pass the script as is. Since we want an educational video:
-            video_prompt = f"Educational video, clear visualization. {lesson_script}"
-            
-            video_result = generate_text_to_video(video_prompt)
-            if not video_result or not video_result.downloaded_paths:
-                print("Failed to generate video. Stopping.")
+            # Steps 2-4: audio and video run in parallel, then combine
+            print("\n[2/2] Generating audio and video, then combining...")
+            final_output = f"outputs/final_lesson_{user_input.replace(' ', '_')}.mp4"
+            started = time.perf_counter()
+            try:
+                results, timings = asyncio.run(_run_lesson(user_input, lesson_script, final_output))
+            except StageFailed as e:
+                print(f"Failed: {e}. Stopping.")
                 continue
-            
-            video_path = video_result.downloaded_paths[0]
+            print(f"\nLesson saved to: {results['combine']}")
+            print(f"Timings: {format_timings(timings, time.perf_counter() - started)}")
 
-            # Step 4: Combine
-            print("\n[4/4] Combining Audio and Video...")
-            final_output = f"outputs/final_lesson_{user_input.replace(' ', '_')}.mp4"
-            combine_audio_video(video_path, audio_path, final_output)
-            
         except Exception as e:
             print(f"An error occurred: {e}")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Video Teacher: turn a topic into a narrated lesson video")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="generate a lesson for every topic in FILE (one per line, '-' for stdin) without prompting")
+    parser.add_argument("--output-dir", default=os.path.join("outputs", "lessons"), help="where batch lessons go")
+    parser.add_argument("--parallel", type=int, default=LESSON_BATCH_PARALLEL, help="lessons generated at once")
+    parser.add_argument("--mux-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes combining audio and video (default: one per CPU)")
+    parser.add_argument("--max-size-mb", type=float, default=7.5, help="size each lesson video is encoded to fit")
+    parser.add_argument("--manifest", help="JSONL file of results and timings (default: manifest.jsonl in the output dir)")
+    args = parser.parse_args()
+
+    if not args.batch:
+        interactive()
+        return
+    topics = read_topics(args.batch)
+    print(f"Generating {len(topics)} lesson(s) into {args.output_dir}, {args.parallel} at a time", flush=True)
+    try:
+        failed = asyncio.run(run_batch(topics, args.output_dir, args.parallel, args.mux_workers, args.max_size_mb,
+                                       args.manifest))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to pick up where this left off", flush=True)
+        sys.exit(130)
+    sys.exit(1 if failed else 0)
+
+
 if __name__ == "__main__":
-    main()
+    # Run the importable copy, so encode jobs reach the workers as main.combine_audio_video
+    import main as lesson_cli
+    lesson_cli.main()
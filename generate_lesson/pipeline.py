@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import span
+
+
+class StageFailed(Exception):
+    """Raised when a pipeline stage errors out or returns no result"""
+
+    def __init__(self, stage, message):
+        super().__init__(f"{stage.label}: {message}")
+        self.stage = stage
+
+
+class Stage:
+    """One step of a pipeline.
+
+    func is an async callable that receives the dict of finished results
+    (keyed by stage name) and returns this stage's result. A stage starts as
+    soon as every stage named in deps has finished.
+    """
+
+    def __init__(self, name, func, deps=(), label=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.label = label or name
+
+
+async def _notify(on_progress, name, state):
+    if on_progress is None:
+        return
+    try:
+        await on_progress(name, state)
+    except Exception as e:
+        print(f"Progress callback failed for {name}: {e}")
+
+
+async def _traced(stage, results):
+    with span(f"stage.{stage.name}"):
+        return await stage.func(results)
+
+
+async def run_stages(stages, results=None, on_progress=None):
+    """
+    Runs a list of stages, starting each one as soon as its dependencies finish,
+    so independent stages run at the same time.
+
+    Stages whose name is already in `results` are treated as done (lets a caller
+    seed e.g. an approved script). on_progress(name, state) is awaited with
+    "running", "done" or "failed".
+
+    Each stage runs in its own span (stage.<name>) under the caller's trace.
+    Returns (results, timings) where timings maps stage name to seconds.
+    Raises StageFailed for the first stage that fails; the rest are cancelled.
+    """
+    results = dict(results or {})
+    timings = {}
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name and dep not in results:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    pending = [stage for stage in stages if stage.name not in results]
+    running = {}
+    started = {}
+    try:
+        while pending or running:
+            for stage in list(pending):
+                if all(dep in results for dep in stage.deps):
+                    pending.remove(stage)
+                    started[stage.name] = time.perf_counter()
+                    await _notify(on_progress, stage.name, "running")
+                    running[asyncio.ensure_future(_traced(stage, results))] = stage
+
+            if not running:
+                raise StageFailed(pending[0], "dependencies form a cycle")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage = running.pop(task)
+                timings[stage.name] = time.perf_counter() - started[stage.name]
+                try:
+                    value = task.result()
+                except Exception as e:
+                    await _notify(on_progress, stage.name, "failed")
+                    raise StageFailed(stage, str(e)) from e
+                if not value:
+                    await _notify(on_progress, stage.name, "failed")
+                    raise StageFailed(stage, "returned no result")
+                results[stage.name] = value
+                await _notify(on_progress, stage.name, "done")
+    finally:
+        for task in running:
+            task.cancel()
+        # Let them unwind (and release encode slots) before the caller sees StageFailed
+        await asyncio.gather(*running, return_exceptions=True)
+
+    return results, timings
+
+
+def format_progress(stages, states, timings=None):
+    """One line per stage, e.g. 'Audio narration - done (12.3s)'"""
+    timings = timings or {}
+    lines = []
+    for stage in stages:
+        state = states.get(stage.name, "waiting")
+        line = f"{stage.label[:1].upper()}{stage.label[1:]} - {state}"
+        if stage.name in timings:
+            line += f" ({timings[stage.name]:.1f}s)"
+        elif state == "running":
+            line += "..."
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_timings(timings, total=None):
+    """Compact per-stage timing summary, e.g. 'script 3.1s | audio 12.0s | total 98.4s'"""
+    parts = [f"{name} {seconds:.1f}s" for name, seconds in timings.items()]
+    if total is not None:
+        parts.append(f"total {total:.1f}s")
+    return " | ".join(parts)
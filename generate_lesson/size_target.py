@@ -0,0 +1,188 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from ffmpeg_tools import probe, run_ffmpeg, AUDIO_BITRATE_KBPS
+
+ENCODE_HISTORY_PATH = os.getenv(
+    "ENCODE_HISTORY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "encode_history.json"),
+)
+# Fraction of the size budget we aim for (the rest is safety margin)
+BUDGET_FILL = 0.96
+MIN_VIDEO_KBPS = 100
+MAX_VIDEO_KBPS = 5000
+PROBE_MAX_SECONDS = 10
+HISTORY_WEIGHT = 0.3
+
+
+class SizeLimitExceeded(RuntimeError):
+    """The encode worked but could not be brought under the size limit"""
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on path (created if missing), held across processes"""
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EncodeHistory:
+    """
+    Remembers, per kind of source clip, how the achieved video bitrate compares
+    to the bitrate we asked libx264 for (achieved / requested). Stored in a
+    small JSON file so the correction carries over between runs. Encodes run
+    in several processes at once, so record() re-reads the file under a lock
+    and updates it from there.
+    """
+
+    def __init__(self, path=ENCODE_HISTORY_PATH):
+        self.path = path
+        self.ratios = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable encode history at {self.path}: {e}")
+            return {}
+
+    def ratio(self, source_key):
+        return self.ratios.get(source_key, {}).get("ratio", 1.0)
+
+    def record(self, source_key, requested_kbps, achieved_kbps):
+        if requested_kbps <= 0 or achieved_kbps <= 0:
+            return
+        observed = achieved_kbps / requested_kbps
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            with _file_lock(f"{self.path}.lock"):
+                # Other processes may have recorded since this one loaded the file
+                self.ratios = self._load()
+                entry = self.ratios.get(source_key)
+                if entry is None:
+                    entry = {"ratio": observed, "samples": 0}
+                else:
+                    entry["ratio"] = (1 - HISTORY_WEIGHT) * entry["ratio"] + HISTORY_WEIGHT * observed
+                entry["samples"] += 1
+                self.ratios[source_key] = entry
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(self.ratios, f, indent=1)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+        except Exception as e:
+            print(f"Failed to save encode history: {e}")
+
+
+def source_key(video_info):
+    """Groups sources that compress alike: codec, resolution and frame rate"""
+    width, height = video_info.get("video_size") or (0, 0)
+    return f"{video_info.get('video_codec_name')}-{width}x{height}-{video_info.get('video_fps')}"
+
+
+def _x264_args(kbps):
+    # maxrate/bufsize keep the rate controller close to the target across the whole file
+    return ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k"]
+
+
+def _probe_ratio(video_path, seconds, kbps):
+    """Encodes `seconds` of the looped clip at kbps and returns achieved / requested"""
+    fd, probe_path = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    try:
+        run_ffmpeg(["-stream_loop", "-1", "-i", video_path, "-t", f"{seconds:.3f}", "-an"]
+                   + _x264_args(kbps) + [probe_path])
+        achieved_kbps = os.path.getsize(probe_path) * 8 / 1000 / seconds
+        return achieved_kbps / kbps
+    finally:
+        os.remove(probe_path)
+
+
+def _encode(video_path, audio_path, output_path, duration, kbps):
+    """Full encode: the clip looped to `duration` at kbps plus the narration"""
+    run_ffmpeg(["-stream_loop", "-1", "-i", video_path, "-i", audio_path,
+                "-map", "0:v:0", "-map", "1:a:0"]
+               + _x264_args(kbps)
+               + ["-c:a", "aac", "-b:a", f"{AUDIO_BITRATE_KBPS}k",
+                  "-t", f"{duration:.3f}", "-movflags", "+faststart", output_path])
+
+
+def encode_to_size(video_path, audio_path, output_path, max_size_mb=7.5, history=None):
+    """
+    Loops the video to the narration length and encodes it so the file lands
+    just under max_size_mb on the first full encode.
+
+    The requested bitrate is corrected by the stored achieved/requested ratio
+    for this kind of source and then by a quick probe encode of one loop of the
+    clip (the output is that loop repeated, so the probe is representative).
+    Returns output_path. Raises SizeLimitExceeded if the file is still over
+    max_size_mb after one corrected retry (the output is removed), or
+    RuntimeError if ffmpeg fails.
+    """
+    history = history or EncodeHistory()
+    video_info = probe(video_path)
+    duration = probe(audio_path).get("duration")
+    clip_duration = video_info.get("video_duration") or video_info.get("duration")
+    if not duration or not clip_duration:
+        raise RuntimeError("Could not read media durations")
+    key = source_key(video_info)
+
+    max_bytes = max_size_mb * 1024 * 1024
+    budget_kbits = max_bytes * BUDGET_FILL * 8 / 1000
+    target_video_kbps = (budget_kbits - AUDIO_BITRATE_KBPS * duration) / duration
+
+    # First guess from history, then correct it with a probe encode
+    requested = target_video_kbps / history.ratio(key)
+    requested = int(max(MIN_VIDEO_KBPS, min(requested, MAX_VIDEO_KBPS)))
+    probe_seconds = min(clip_duration, duration, PROBE_MAX_SECONDS)
+    ratio = _probe_ratio(video_path, probe_seconds, requested)
+    history.record(key, requested, requested * ratio)
+    requested = int(max(MIN_VIDEO_KBPS, min(target_video_kbps / ratio, MAX_VIDEO_KBPS)))
+
+    print(f"Size target: {max_size_mb}MB over {duration:.1f}s -> video {requested}k "
+          f"(probe ratio {ratio:.2f}, source {key})")
+    _encode(video_path, audio_path, output_path, duration, requested)
+
+    size = os.path.getsize(output_path)
+    achieved_video_kbps = max(size * 8 / 1000 / duration - AUDIO_BITRATE_KBPS, 1)
+    history.record(key, requested, achieved_video_kbps)
+    print(f"Size target: wrote {size / 1024 / 1024:.2f}MB ({size / max_bytes:.0%} of budget)")
+
+    if size > max_bytes:
+        # Should be rare once history has settled; one corrected retry beats giving up
+        corrected = int(max(MIN_VIDEO_KBPS, requested * (max_bytes * BUDGET_FILL) / size))
+        print(f"Size target: over budget, retrying at {corrected}k")
+        _encode(video_path, audio_path, output_path, duration, corrected)
+        size = os.path.getsize(output_path)
+        if size > max_bytes:
+            os.remove(output_path)
+            raise SizeLimitExceeded(f"Encode is still {size / 1024 / 1024:.2f}MB at {corrected}k, "
+                               f"over the {max_size_mb}MB limit")
+    return output_path
@@ -1,10 +1,28 @@
 from magic_hour import Client
 from os import getenv
+import asyncio
 import os
+import sys
+import time
+import uuid
 from dotenv import load_dotenv
 
+# MagicHourAPI lives next to bot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from magic_hour_api import MagicHourAPI
+from result_cache import default_cache
+from ffmpeg_tools import concat_audio
+
 load_dotenv()
 
+VOICE_NAME = "Morgan Freeman"
+# Narration segments being voiced at once by generate_speech_stream_async
+SPEECH_SEGMENT_CONCURRENCY = int(os.getenv("LESSON_TTS_CONCURRENCY", "3"))
+
+
+def _cache_params(text):
+    return {"text": text, "voice": VOICE_NAME, "provider": "magic_hour"}
+
 def generate_speech(text, output_dir="outputs"):
     # Try to get the premium key first, then fallback to standard
     api_key = getenv("MAGIC_HOUR_API_KEY_PREMIUM") or getenv("MAGIC_HOUR_API_KEY")
@@ -13,6 +31,10 @@ def generate_speech(text, output_dir="outputs"):
         print("[ERROR] MAGIC_HOUR_API_KEY_PREMIUM or MAGIC_HOUR_API_KEY is missing from environment/env file.")
         return None
 
+    cached = default_cache().get("speech", _cache_params(text))
+    if cached is not None:
+        return cached.files[0]
+
     client = Client(token=api_key)
 
     try:
@@ -20,7 +42,7 @@ def generate_speech(text, output_dir="outputs"):
         result = client.v1.ai_voice_generator.generate(
             style={
                 "prompt": text,
-                "voice_name": "Morgan Freeman"
+                "voice_name": VOICE_NAME
             },
             name="Voice Generator audio",
             wait_for_completion=True,
@@ -33,6 +55,7 @@ def generate_speech(text, output_dir="outputs"):
             # print(f"Credits charged: {result.credits_charged}")
             if result.downloaded_paths and len(result.downloaded_paths) > 0:
                 print(f"Downloaded to: {result.downloaded_paths[0]}")
+                default_cache().put("speech", _cache_params(text), files=[result.downloaded_paths[0]])
                 return result.downloaded_paths[0]
             return None
         else:
@@ -47,5 +70,100 @@ def generate_speech(text, output_dir="outputs"):
             print(f"Error Body: {e.body}")
         return None
 
+async def generate_speech_async(text, output_dir="outputs", api=None):
+    """
+    Async version of generate_speech built on MagicHourAPI: the render is polled
+    without holding a thread and the audio is streamed to disk.
+    Pass the caller's MagicHourAPI to share its connection pool and poller.
+    """
+    loop = asyncio.get_running_loop()
+    cache = default_cache()
+    cached = await loop.run_in_executor(None, cache.get, "speech", _cache_params(text))
+    if cached is not None:
+        return cached.files[0]
+
+    if api is None:
+        api_key = getenv("MAGIC_HOUR_API_KEY_PREMIUM") or getenv("MAGIC_HOUR_API_KEY")
+        if not api_key:
+            print("[ERROR] MAGIC_HOUR_API_KEY_PREMIUM or MAGIC_HOUR_API_KEY is missing from environment/env file.")
+            return None
+        async with MagicHourAPI(api_key) as api:
+            return await generate_speech_async(text, output_dir, api)
+
+    print("Sending request to Magic Hour Voice Generator...")
+    result, error = await api.ai_voice_generator(text, voice_name=VOICE_NAME, name="Voice Generator audio")
+    if error:
+        print(f"[ERROR] Voice generation failed: {error}")
+        return None
+
+    try:
+        audio_result = await api.download_outputs(result, output_dir)
+    except Exception as e:
+        print(f"[ERROR] Failed to download voice audio: {e}")
+        return None
+
+    print(f"[OK] Voice generation complete!")
+    if audio_result.downloaded_paths:
+        print(f"Downloaded to: {audio_result.downloaded_paths[0]}")
+        await loop.run_in_executor(None, lambda: cache.put("speech", _cache_params(text),
+                                                           files=[audio_result.downloaded_paths[0]]))
+        return audio_result.downloaded_paths[0]
+    return None
+
+async def generate_speech_stream_async(sentences, output_dir="outputs", api=None,
+                                       concurrency=SPEECH_SEGMENT_CONCURRENCY):
+    """
+    Voices each segment from the async iterator `sentences` as soon as it
+    arrives (at most `concurrency` at a time, each cached on its own like
+    generate_speech_async) and joins the results in order into one file.
+    Narration can start while the script is still being written.
+    """
+    if api is None:
+        api_key = getenv("MAGIC_HOUR_API_KEY_PREMIUM") or getenv("MAGIC_HOUR_API_KEY")
+        if not api_key:
+            print("[ERROR] MAGIC_HOUR_API_KEY_PREMIUM or MAGIC_HOUR_API_KEY is missing from environment/env file.")
+            return None
+        async with MagicHourAPI(api_key) as api:
+            return await generate_speech_stream_async(sentences, output_dir, api, concurrency)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    first = []
+
+    async def voice(sentence):
+        async with semaphore:
+            path = await generate_speech_async(sentence, output_dir, api)
+        if path and not first:
+            first.append(path)
+            print(f"[OK] First narration segment ready after {time.perf_counter() - started:.1f}s")
+        return path
+
+    tasks = []
+    try:
+        async for sentence in sentences:
+            tasks.append(asyncio.ensure_future(voice(sentence)))
+        paths = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if not paths or not all(paths):
+        print(f"[ERROR] {len([p for p in paths if not p])} of {len(paths)} narration segments failed")
+        return None
+    if len(paths) == 1:
+        return paths[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"narration_{uuid.uuid4().hex[:12]}.mp3")
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, concat_audio, paths, output_path)
+    except Exception as e:
+        print(f"[ERROR] Failed to join narration segments: {e}")
+        return None
+    print(f"[OK] Joined {len(paths)} narration segments into {output_path}")
+    return output_path
+
 if __name__ == "__main__":
     generate_speech("Testing voice generation.")
\ No newline at end of file
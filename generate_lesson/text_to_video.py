@@ -3,11 +3,35 @@ import os
 from dotenv import load_dotenv
 
 from magic_hour import Client
+import asyncio
 import os
+import sys
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
+# MagicHourAPI lives next to bot.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from magic_hour_api import MagicHourAPI
+from result_cache import default_cache
+
 load_dotenv()
 
+END_SECONDS = 10.0  # Increased slightly for a lesson clip
+ORIENTATION = "landscape"
+
+
+def _cache_params(prompt):
+    return {"prompt": prompt, "end_seconds": END_SECONDS, "orientation": ORIENTATION, "model": "magic_hour"}
+
+
+def _cached_video(prompt):
+    """Returns a result shaped like the SDK's for a cached video, or None"""
+    entry = default_cache().get("text_to_video", _cache_params(prompt))
+    if entry is None:
+        return None
+    return SimpleNamespace(id=entry.value.get("id"), status="complete", credits_charged=0,
+                           downloaded_paths=entry.files)
+
 def generate_text_to_video(prompt, output_dir="outputs"):
     """
     Generates a video from a text prompt using Magic Hour.
@@ -20,14 +44,18 @@ def generate_text_to_video(prompt, output_dir="outputs"):
         print("Error: MAGIC_HOUR_API_KEY_PREMIUM or MAGIC_HOUR_API_KEY is not set.")
         return None
 
+    cached = _cached_video(prompt)
+    if cached is not None:
+        return cached
+
     client = Client(token=api_key)
 
     print(f"Generating video for script: {prompt[:50]}...")
 
     try:
         video_result = client.v1.text_to_video.generate(
-            end_seconds=10.0, # Increased slightly for a lesson clip
-            orientation="landscape",
+            end_seconds=END_SECONDS,
+            orientation=ORIENTATION,
             style={
                 "prompt": prompt,
             },
@@ -38,11 +66,53 @@ def generate_text_to_video(prompt, output_dir="outputs"):
 
         print(f"Video created with id {video_result.id}, spent {video_result.credits_charged} credits.")
         print(f"Video outputs saved at {video_result.downloaded_paths}")
+        if video_result.downloaded_paths:
+            default_cache().put("text_to_video", _cache_params(prompt),
+                                {"id": video_result.id}, files=video_result.downloaded_paths)
         return video_result
     except Exception as e:
         print(f"Error generating video: {e}")
         return None
 
+async def generate_text_to_video_async(prompt, output_dir="outputs", api=None):
+    """
+    Async version of generate_text_to_video built on MagicHourAPI. Returns an
+    object with the same id / credits_charged / downloaded_paths fields.
+    Pass the caller's MagicHourAPI to share its connection pool and poller.
+    """
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(None, _cached_video, prompt)
+    if cached is not None:
+        return cached
+
+    if api is None:
+        api_key = os.getenv("MAGIC_HOUR_API_KEY_PREMIUM") or os.getenv("MAGIC_HOUR_API_KEY")
+        if not api_key:
+            print("Error: MAGIC_HOUR_API_KEY_PREMIUM or MAGIC_HOUR_API_KEY is not set.")
+            return None
+        async with MagicHourAPI(api_key) as api:
+            return await generate_text_to_video_async(prompt, output_dir, api)
+
+    print(f"Generating video for script: {prompt[:50]}...")
+
+    result, error = await api.text_to_video(prompt, duration=END_SECONDS, orientation=ORIENTATION)
+    if error:
+        print(f"Error generating video: {error}")
+        return None
+
+    try:
+        video_result = await api.download_outputs(result, output_dir)
+    except Exception as e:
+        print(f"Error downloading video: {e}")
+        return None
+
+    print(f"Video created with id {video_result.id}, spent {video_result.credits_charged} credits.")
+    print(f"Video outputs saved at {video_result.downloaded_paths}")
+    if video_result.downloaded_paths:
+        await loop.run_in_executor(None, lambda: default_cache().put(
+            "text_to_video", _cache_params(prompt), {"id": video_result.id}, files=video_result.downloaded_paths))
+    return video_result
+
 if __name__ == "__main__":
     # Test execution
     generate_text_to_video("A teacher explaining physics in a classroom.")
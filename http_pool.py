@@ -0,0 +1,47 @@
+import os
+import aiohttp
+
+# Connection pool tuning (overridable from .env)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_POOL_DNS_TTL = int(os.getenv("HTTP_POOL_DNS_TTL", "300"))
+HTTP_POOL_KEEPALIVE = float(os.getenv("HTTP_POOL_KEEPALIVE", "30"))
+
+
+class HTTPPool:
+    """Long-lived aiohttp session shared by every outbound HTTP call.
+
+    Keeps TCP/TLS connections alive between requests and caches DNS lookups,
+    so repeated polls to the same host skip the connect and handshake.
+    The session is created lazily on first use (it must be built inside a
+    running event loop) and closed once in close().
+    """
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_ttl: int = HTTP_POOL_DNS_TTL, keepalive_timeout: float = HTTP_POOL_KEEPALIVE,
+                 trace_configs: list = None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.trace_configs = trace_configs
+        self._session = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=self.trace_configs)
+        return self._session
+
+    async def close(self):
+        """Close the shared session and every pooled connection"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
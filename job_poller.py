@@ -0,0 +1,239 @@
+import asyncio
+import contextvars
+import os
+import time
+
+from telemetry import COUNT_BUCKETS, counter, get_logger, histogram
+
+# Global cap on status requests per second across every in-flight job
+POLL_MAX_QPS = float(os.getenv("MAGIC_HOUR_POLL_QPS", "2"))
+POLL_INTERVAL = 5.0
+POLL_TIMEOUT = 600.0  # 10 minutes
+# Status answers worth asking again (with backoff) instead of failing the render; so is any 5xx
+POLL_RETRY_STATUSES = {408, 429}
+POLL_MAX_BACKOFF = 60.0
+
+POLLS = counter("clanker_poll_requests_total", "Status checks sent for in-flight render jobs")
+POLLS_PER_JOB = histogram("clanker_polls_per_job", "Status checks a render job needed before it finished",
+                          buckets=COUNT_BUCKETS)
+log = get_logger("poller")
+
+
+class _Job:
+    def __init__(self, project_id: str, project_type: str, kind: str, priority: int, future: asyncio.Future):
+        self.project_id = project_id
+        self.project_type = project_type
+        self.kind = kind
+        self.priority = priority
+        self.future = future
+        self.listeners = []
+        self.created = time.monotonic()
+        self.next_check = self.created
+        self.in_flight = False
+        self.last_state = None
+        self.polls = 0
+        self.failures = 0  # status checks in a row that failed transiently
+        self.context = contextvars.copy_context()  # checks run (and log) under the watcher's trace
+
+
+class PollPacer:
+    """Spaces status requests at least 1/max_qps apart. Pollers sharing one share the cap."""
+
+    def __init__(self, max_qps: float = POLL_MAX_QPS):
+        self.min_gap = 1.0 / max_qps
+        self.last_request = 0.0
+
+    def wait(self, now: float) -> float:
+        """Seconds until the next request may go out"""
+        return self.last_request + self.min_gap - now
+
+    def take(self, now: float):
+        self.last_request = now
+
+
+class JobPoller:
+    """One background task that owns every in-flight Magic Hour project.
+
+    Commands register a project with watch() and await the returned future,
+    which resolves to the usual (result, error) tuple. Due jobs are checked
+    highest priority first, then oldest first, and status requests are paced
+    so the whole bot never exceeds max_qps no matter how many jobs are running
+    (pass one PollPacer to several pollers to cap them together). With a
+    strategy (see poll_strategy.py) the gap between checks of a job follows
+    its expected render time instead of the fixed interval. Network errors,
+    429s and 5xx answers are retried with backoff until the timeout; only
+    other error statuses or a failed render end the job early.
+    """
+
+    def __init__(self, fetch_status, max_qps: float = POLL_MAX_QPS, strategy=None,
+                 interval: float = POLL_INTERVAL, timeout: float = POLL_TIMEOUT, pacer: PollPacer = None):
+        self.fetch_status = fetch_status  # async (project_id, project_type) -> (result, http_status)
+        self.strategy = strategy
+        self.pacer = pacer or PollPacer(max_qps)
+        self.interval = interval
+        self.timeout = timeout
+        self._jobs = {}
+        self._wakeup = None
+        self._task = None
+        self._checks = set()
+
+    def watch(self, project_id: str, project_type: str = "video", kind: str = None, priority: int = 0,
+              on_status=None) -> asyncio.Future:
+        """Start tracking a project and return a future for its (result, error)"""
+        job = self._jobs.get(project_id)
+        if job is None or job.future.done():
+            job = _Job(project_id, project_type, kind or project_type, priority,
+                       asyncio.get_running_loop().create_future())
+            if self.strategy is not None:
+                job.next_check = job.created + self.strategy.next_delay(job.kind, 0.0)
+            self._jobs[project_id] = job
+        else:
+            job.priority = max(job.priority, priority)
+        if on_status is not None:
+            job.listeners.append(on_status)
+        self._ensure_running()
+        self._wakeup.set()
+        return job.future
+
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            # Created here so the event binds to the bot's running loop
+            self._wakeup = asyncio.Event()
+            # Started from an empty context, so it is not part of whichever command created it
+            # (create_task copies the current context; its context= argument needs Python 3.11)
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+
+    async def stop(self):
+        """Stop polling, cancel every pending job future and save the strategy's render times"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for check in list(self._checks):
+            check.cancel()
+        for job in self._jobs.values():
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+        if self.strategy is not None:
+            await self.strategy.flush()
+
+    def _next_due(self, now: float):
+        """Pick the due job with the highest priority, oldest first"""
+        best = None
+        for project_id, job in list(self._jobs.items()):
+            if job.future.done():
+                # Caller gave up (cancelled) or job already resolved
+                del self._jobs[project_id]
+                continue
+            if job.in_flight or job.next_check > now:
+                continue
+            if best is None or (-job.priority, job.created) < (-best.priority, best.created):
+                best = job
+        return best
+
+    def _seconds_until_next(self, now: float) -> float:
+        pending = [job.next_check for job in self._jobs.values() if not job.in_flight]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - now)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            job = self._next_due(now)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._seconds_until_next(now))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Global pacing: never send status checks faster than max_qps
+            gap = self.pacer.wait(now)
+            if gap > 0:
+                await asyncio.sleep(gap)
+                continue
+
+            self.pacer.take(now)
+            job.in_flight = True
+            check = job.context.run(asyncio.create_task, self._check(job))
+            self._checks.add(check)
+            check.add_done_callback(self._checks.discard)
+
+    async def _check(self, job: _Job):
+        try:
+            job.polls += 1
+            POLLS.inc(kind=job.kind)
+            try:
+                result, status = await self.fetch_status(job.project_id, job.project_type)
+                error = None if status == 200 else f"HTTP {status}: {result}"
+            except Exception as e:
+                result, status, error = None, None, e
+
+            elapsed = time.monotonic() - job.created
+            if error is not None:
+                if status is not None and status not in POLL_RETRY_STATUSES and status < 500:
+                    self._resolve(job, None, f"Error checking status: {result}")
+                    return
+                # Network error, rate limit or server error: the render is fine, ask again later
+                job.failures += 1
+                log.warning("status_check_failed", project=job.project_id, status=status, failures=job.failures,
+                            error=error)
+                if elapsed > self.timeout:
+                    self._resolve(job, None, f"Error checking status: {error}")
+                    return
+                job.next_check = time.monotonic() + min(self.interval * 2 ** (job.failures - 1), POLL_MAX_BACKOFF)
+                return
+            job.failures = 0
+
+            state = result.get("status") if result else None
+            if state == "complete":
+                if self.strategy is not None:
+                    self.strategy.record(job.kind, elapsed)
+                self._resolve(job, result, None)
+                return
+            if state == "error":
+                self._resolve(job, None, f"Generation failed: {result.get('error', 'Unknown error')}")
+                return
+            if state == "canceled":
+                self._resolve(job, None, "Generation was canceled")
+                return
+
+            log.debug("poll", project=job.project_id, kind=job.kind, state=state, polls=job.polls,
+                      elapsed=f"{elapsed:.1f}")
+            if state is not None and state != job.last_state:
+                job.last_state = state
+                for listener in list(job.listeners):
+                    try:
+                        await listener(state, result)
+                    except Exception as e:
+                        log.warning("status_listener_failed", project=job.project_id, error=e)
+
+            if elapsed > self.timeout:
+                self._resolve(job, None, f"Timeout: Generation took longer than {int(self.timeout // 60)} minutes")
+                return
+            if self.strategy is not None:
+                job.next_check = time.monotonic() + self.strategy.next_delay(job.kind, elapsed)
+            else:
+                job.next_check = time.monotonic() + self.interval
+        finally:
+            job.in_flight = False
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _resolve(self, job: _Job, result, error):
+        POLLS_PER_JOB.observe(job.polls, kind=job.kind, outcome="ok" if error is None else "error")
+        log.info("job_finished", project=job.project_id, kind=job.kind, polls=job.polls,
+                 seconds=f"{time.monotonic() - job.created:.1f}", error=error)
+        if not job.future.done():
+            job.future.set_result((result, error))
+        if self._jobs.get(job.project_id) is job:
+            del self._jobs[job.project_id]
@@ -0,0 +1,257 @@
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3"))
+# Writes are coalesced and committed together at most this often
+JOB_STORE_FLUSH_INTERVAL = float(os.getenv("JOB_STORE_FLUSH_INTERVAL", "0.5"))
+# Unfinished jobs older than this are not worth resuming
+JOB_RESUME_MAX_AGE = float(os.getenv("JOB_RESUME_MAX_AGE_HOURS", "6")) * 3600
+FINISHED_JOB_TTL = 7 * 24 * 3600
+
+# Job the running task works for; set by the command that owns it so that
+# upstream projects it starts are linked to the job
+current_job = contextvars.ContextVar("current_job", default=None)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    command TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    application_id INTEGER,
+    interaction_token TEXT,
+    channel_id INTEGER,
+    user_id INTEGER,
+    guild_id INTEGER,
+    upstream TEXT NOT NULL,
+    artifacts TEXT NOT NULL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS projects (
+    key TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    project_type TEXT,
+    kind TEXT,
+    created REAL NOT NULL
+);
+"""
+
+JOB_COLUMNS = ("id", "command", "params", "status", "stage", "application_id", "interaction_token", "channel_id",
+               "user_id", "guild_id", "upstream", "artifacts", "error", "created", "updated")
+JSON_COLUMNS = ("params", "upstream", "artifacts")
+
+
+class JobStore:
+    """
+    SQLite record of every in-flight generation, so work that was already
+    paid for survives a restart.
+
+    jobs: one row per command invocation (interaction token, channel, stage,
+        upstream project IDs and artifacts); status is running, done or failed.
+    projects: upstream projects (Magic Hour project IDs, Veo operation names)
+        keyed by the request that started them, so re-issuing the same request
+        after a restart picks the project up again instead of paying twice.
+
+    Reads come from an in-memory copy of unfinished rows. Writes only mark rows
+    dirty; a background task commits everything dirty in one transaction every
+    flush_interval seconds, so the hot path never waits on the disk.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, flush_interval: float = JOB_STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.jobs = {}
+        self.projects = {}
+        self._dirty_jobs = set()
+        self._dirty_projects = set()
+        self._lock = threading.RLock()  # rows are mutated on the loop and serialized on the writer thread
+        self._write_lock = threading.Lock()  # one commit at a time on the shared connection
+        self._wake = None
+        self._task = None
+        self.flushes = 0
+        self.rows_written = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._load()
+
+    def _load(self):
+        now = time.time()
+        with self._db:
+            self._db.execute("DELETE FROM jobs WHERE status != 'running' AND updated < ?", (now - FINISHED_JOB_TTL,))
+        cursor = self._db.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE status = 'running'")
+        for values in cursor.fetchall():
+            job = dict(zip(JOB_COLUMNS, values))
+            for column in JSON_COLUMNS:
+                job[column] = json.loads(job[column])
+            self.jobs[job["id"]] = job
+        cursor = self._db.execute("SELECT key, project_id, project_type, kind, created FROM projects")
+        for key, project_id, project_type, kind, created in cursor.fetchall():
+            self.projects[key] = {"project_id": project_id, "project_type": project_type,
+                                  "kind": kind, "created": created}
+
+    def _mark(self, job_id=None, project_key=None):
+        with self._lock:
+            if job_id is not None:
+                self._dirty_jobs.add(job_id)
+            if project_key is not None:
+                self._dirty_projects.add(project_key)
+        if self._wake is not None:
+            self._wake.set()
+
+    def create(self, command: str, params: dict, application_id=None, interaction_token=None,
+               channel_id=None, user_id=None, guild_id=None) -> str:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.jobs[job_id] = {
+                "id": job_id, "command": command, "params": params, "status": "running", "stage": "queued",
+                "application_id": application_id, "interaction_token": interaction_token, "channel_id": channel_id,
+                "user_id": user_id, "guild_id": guild_id, "upstream": [], "artifacts": {}, "error": None,
+                "created": now, "updated": now,
+            }
+            self._mark(job_id=job_id)
+        return job_id
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def update(self, job_id: str, stage: str = None, artifacts: dict = None):
+        """Records the stage a job reached and any artifacts (URLs, paths) it produced"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            if stage is not None:
+                job["stage"] = stage
+            if artifacts:
+                job["artifacts"].update(artifacts)
+            job["updated"] = time.time()
+            self._mark(job_id=job_id)
+
+    def finish(self, job_id: str, error: str = None):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = "failed" if error else "done"
+            job["error"] = error
+            job["updated"] = time.time()
+            self._mark(job_id=job_id)
+
+    def unfinished(self) -> list:
+        with self._lock:
+            return [dict(job) for job in self.jobs.values() if job["status"] == "running"]
+
+    def project(self, key: str):
+        """The upstream project started for this request key, if it has not finished"""
+        return self.projects.get(key)
+
+    def remember_project(self, key: str, project_id: str, project_type: str = None, kind: str = None):
+        with self._lock:
+            self.projects[key] = {"project_id": project_id, "project_type": project_type,
+                                  "kind": kind, "created": time.time()}
+            self._mark(project_key=key)
+            job = self.jobs.get(current_job.get())
+            if job is not None and project_id not in job["upstream"]:
+                job["upstream"].append(project_id)
+                job["updated"] = time.time()
+                self._mark(job_id=job["id"])
+
+    def forget_project(self, key: str):
+        with self._lock:
+            if self.projects.pop(key, None) is not None:
+                self._mark(project_key=key)
+
+    def _write(self):
+        """Commits every dirty row in one transaction (runs on an executor thread)"""
+        with self._write_lock:
+            self._write_dirty()
+
+    def _write_dirty(self):
+        with self._lock:
+            job_ids, self._dirty_jobs = self._dirty_jobs, set()
+            project_keys, self._dirty_projects = self._dirty_projects, set()
+            job_rows, finished = [], []
+            for job_id in job_ids:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    continue
+                job_rows.append(tuple(json.dumps(job[column]) if column in JSON_COLUMNS else job[column]
+                                      for column in JOB_COLUMNS))
+                if job["status"] != "running":
+                    finished.append(job_id)
+            project_rows, deleted = [], []
+            for key in project_keys:
+                project = self.projects.get(key)
+                if project is None:
+                    deleted.append((key,))
+                else:
+                    project_rows.append((key, project["project_id"], project["project_type"],
+                                         project["kind"], project["created"]))
+        if not (job_rows or project_rows or deleted):
+            return
+        try:
+            with self._db:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO jobs ({', '.join(JOB_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_COLUMNS))})",
+                    job_rows)
+                self._db.executemany("INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?)", project_rows)
+                self._db.executemany("DELETE FROM projects WHERE key = ?", deleted)
+        except Exception:
+            # Nothing was committed: keep the rows dirty so the next flush writes them
+            with self._lock:
+                self._dirty_jobs |= job_ids
+                self._dirty_projects |= project_keys
+            raise
+        with self._lock:
+            for job_id in finished:
+                if job_id not in self._dirty_jobs:
+                    del self.jobs[job_id]  # finished rows only live on disk
+        self.flushes += 1
+        self.rows_written += len(job_rows) + len(project_rows) + len(deleted)
+
+    async def flush(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._write)
+
+    async def _flush_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            # Let more writes pile up so they share one commit
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[JobStore] Flush failed, retrying: {e}", flush=True)
+                self._wake.set()
+
+    def start(self):
+        """Start the background writer (call from inside the running event loop)"""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._wake.set()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._write()
+        self._db.close()
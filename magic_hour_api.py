@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from http_pool import HTTPPool
+from job_poller import JobPoller, PollPacer
+from result_cache import normalize
+from single_flight import SingleFlight
+from spool import Spool
+
+# Point at benchmarks/fake_backends.py (or another stand-in) to run without credits
+API_BASE_URL = os.getenv("MAGIC_HOUR_API_BASE", "https://api.magichour.ai/v1").rstrip("/")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAGIC_HOUR_RESULT_TTL = float(os.getenv("MAGIC_HOUR_RESULT_TTL_HOURS", "24")) * 3600
+MAGIC_HOUR_URL_MARGIN = 5 * 60  # stop serving a cached result this long before its download links expire
+
+
+def result_ttl(result: dict, ttl: float = MAGIC_HOUR_RESULT_TTL):
+    """
+    Seconds a finished result can be served from the cache: ttl, cut short by
+    the earliest downloads[].expires_at. None when a link is about to expire
+    (or its expiry cannot be read), in which case the result is not cached.
+    """
+    for download in result.get("downloads") or []:
+        expires_at = download.get("expires_at")
+        if not expires_at:
+            continue
+        try:
+            expires = datetime.fromisoformat(str(expires_at).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+        ttl = min(ttl, expires - MAGIC_HOUR_URL_MARGIN - time.time())
+    return ttl if ttl > 0 else None
+
+
+class MagicHourAPI:
+    """Async Magic Hour REST client.
+
+    All calls go through an HTTPPool (a private one is created and closed with
+    the client when none is passed) and all status polling goes through one
+    JobPoller per client, so nothing here holds a thread while a render runs.
+    With a ResultCache, finished project results are reused for identical
+    requests instead of starting (and paying for) a new render. With a
+    JobStore, started project IDs are recorded so the same request made after
+    a restart resumes polling the existing project. Clients sharing a
+    PollPacer share one status-request rate cap.
+    """
+
+    def __init__(self, api_key: str, pool: HTTPPool = None, strategy=None, cache=None, store=None,
+                 pacer: PollPacer = None):
+        self.api_key = api_key
+        self.cache = cache
+        self.store = store
+        # Project IDs belong to an account, so stored projects are scoped by key
+        self.store_scope = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+        self.owns_pool = pool is None
+        self.pool = pool or HTTPPool()
+        self.poller = JobPoller(self._fetch_project_status, strategy=strategy, pacer=pacer)
+        self.inflight = SingleFlight()
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+    async def _request(self, method: str, endpoint: str, data: dict = None):
+        url = f"{API_BASE_URL}{endpoint}"
+        async with self.pool.session().request(method, url, headers=self.headers, json=data) as resp:
+            return await resp.json(), resp.status
+
+    async def _fetch_project_status(self, project_id: str, project_type: str):
+        return await self._request("GET", f"/{project_type}-projects/{project_id}")
+
+    async def _poll_project(self, project_id: str, project_type: str = "video", kind: str = None,
+                            priority: int = 0, on_status=None):
+        """Wait for the shared poller to report the project as finished"""
+        return await self.poller.watch(project_id, project_type, kind, priority, on_status)
+
+    async def _generate(self, endpoint: str, data: dict, project_type: str = "video", kind: str = None,
+                        priority: int = 0, on_status=None):
+        """
+        Create a project and wait for it. Identical requests reuse a cached
+        result, or share one upstream project while it is still rendering.
+        """
+        loop = asyncio.get_running_loop()
+        cache_params = {"endpoint": endpoint, "data": data}
+        if self.cache is not None:
+            entry = await loop.run_in_executor(None, self.cache.get, "magic_hour", cache_params)
+            if entry is not None:
+                return entry.value, None
+
+        flight_key = json.dumps({"endpoint": endpoint, "data": normalize(data)}, sort_keys=True)
+        store_key = f"magic_hour:{self.store_scope}:{flight_key}"
+
+        async def create_and_poll(publish):
+            stored = self.store.project(store_key) if self.store is not None else None
+            if stored is not None:
+                project_id = stored["project_id"]
+                print(f"Resuming Magic Hour project {project_id}", flush=True)
+            else:
+                result, status = await self._request("POST", endpoint, data)
+                if status not in [200, 201]:
+                    return None, f"API Error ({status}): {result.get('message', result)}"
+                project_id = result.get("id")
+                if self.store is not None:
+                    self.store.remember_project(store_key, project_id, project_type, kind)
+
+            result, error = await self._poll_project(project_id, project_type, kind, priority, publish)
+            if self.store is not None:
+                self.store.forget_project(store_key)
+            ttl = result_ttl(result) if result is not None and self.cache is not None else None
+            if ttl is not None:
+                # Download links are signed, so these only live as long as the links do
+                await loop.run_in_executor(None, lambda: self.cache.put("magic_hour", cache_params, result, ttl=ttl))
+            return result, error
+
+        return await self.inflight.do(flight_key, create_and_poll, on_status)
+
+    async def close(self):
+        """Stop the poller (and the pool, if this client created it)"""
+        await self.poller.stop()
+        if self.owns_pool:
+            await self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def download_video(self, url: str) -> bytes:
+        """Download video from URL"""
+        async with self.pool.session().get(url) as resp:
+            if resp.status == 200:
+                return await resp.read()
+            return None
+
+    async def download_to_spool(self, url: str, max_bytes: int = None) -> Spool:
+        """
+        Stream a download into a Spool (in memory up to a point, then a temp
+        file). Returns None when it fails or turns out larger than max_bytes,
+        which is known from Content-Length before anything is downloaded.
+        """
+        async with self.pool.session().get(url) as resp:
+            if resp.status != 200:
+                return None
+            if max_bytes is not None and resp.content_length and resp.content_length > max_bytes:
+                return None
+
+            async def chunks():
+                received = 0
+                async for data in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    received += len(data)
+                    if max_bytes is not None and received > max_bytes:
+                        raise ValueError(f"download is larger than {max_bytes} bytes")
+                    yield data
+
+            spool = Spool()
+            try:
+                await spool.fill(chunks())
+            except Exception as e:
+                print(f"Download from {urlparse(url).netloc} abandoned: {e}", flush=True)
+                spool.close()
+                return None
+            return spool
+
+    async def download_to_file(self, url: str, output_dir: str = "outputs") -> str:
+        """Stream a file to output_dir chunk by chunk, returns its path"""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, os.path.basename(urlparse(url).path) or "download")
+        async with self.pool.session().get(url) as resp:
+            resp.raise_for_status()
+            with open(path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        return path
+
+    async def download_outputs(self, result: dict, output_dir: str = "outputs"):
+        """
+        Downloads every output of a finished project. Returns an object shaped
+        like the magic_hour SDK result (id, status, credits_charged, downloaded_paths).
+        """
+        urls = [d.get("url") for d in result.get("downloads") or [] if d.get("url")]
+        paths = await asyncio.gather(*(self.download_to_file(url, output_dir) for url in urls))
+        return SimpleNamespace(
+            id=result.get("id"),
+            status=result.get("status"),
+            credits_charged=result.get("credits_charged"),
+            downloaded_paths=list(paths),
+        )
+
+    async def upload_file(self, file_path: str) -> str:
+        """Upload a local file for use as an asset, returns its api-assets/ path"""
+        if file_path.startswith(("http://", "https://", "api-assets/")):
+            return file_path
+        extension = os.path.splitext(file_path)[1].lstrip(".").lower()
+        mime_type = mimetypes.guess_type(file_path)[0] or ""
+        file_type = mime_type.split("/")[0] if mime_type else "image"
+        result, status = await self._request("POST", "/files/upload-urls",
+                                             {"items": [{"extension": extension, "type": file_type}]})
+        if status not in [200, 201] or not result.get("items"):
+            raise RuntimeError(f"API Error ({status}): {result.get('message', result)}")
+        upload = result["items"][0]
+        with open(file_path, "rb") as f:
+            # aiohttp streams file objects instead of reading them into memory
+            async with self.pool.session().put(upload["upload_url"], data=f) as resp:
+                resp.raise_for_status()
+        return upload["file_path"]
+
+    async def text_to_video(self, prompt: str, duration: int = 5, orientation: str = None):
+        data = {
+            "end_seconds": duration,
+            "style": {
+                "prompt": prompt
+            }
+        }
+        if orientation:
+            data["orientation"] = orientation
+        return await self._generate("/text-to-video", data, "video", kind="text-to-video")
+
+    async def image_to_video(self, image_url: str, prompt: str = "", duration: int = 5):
+        data = {
+            "end_seconds": duration,
+            "assets": {
+                "image_file_path": image_url
+            }
+        }
+        if prompt:
+            data["style"] = {"prompt": prompt}
+        return await self._generate("/image-to-video", data, "video", kind="image-to-video")
+
+    async def face_swap(self, video_url: str, face_image_url: str):
+        data = {
+            "assets": {
+                "video_url": video_url,
+                "face_image_url": face_image_url
+            }
+        }
+        return await self._generate("/face-swap", data, "video", kind="face-swap")
+
+    async def animation(self, prompt: str, image_url: str = None,
+                        art_style: str = "Photograph", camera_effect: str = "Simple Zoom In",
+                        duration: float = 3, fps: int = 8, audio_url: str = None, on_status=None):
+        data = {
+            "fps": fps,
+            "end_seconds": duration,
+            "height": 576,
+            "width": 576,
+            "style": {
+                "art_style": art_style,
+                "camera_effect": camera_effect,
+                "prompt_type": "custom",
+                "prompt": prompt,
+                "transition_speed": 5
+            },
+            "assets": {
+                "audio_source": "none" if not audio_url else "file",
+            }
+        }
+        if image_url:
+            data["assets"]["image_file_path"] = image_url
+        if audio_url:
+            data["assets"]["audio_file_path"] = audio_url
+        # A listener means someone is watching live, so check it ahead of background jobs
+        return await self._generate("/animation", data, "video", kind="animation",
+                                    priority=1 if on_status else 0, on_status=on_status)
+
+    async def lip_sync(self, video_url: str, audio_url: str):
+        data = {
+            "assets": {
+                "video_url": video_url,
+                "audio_url": audio_url
+            }
+        }
+        return await self._generate("/lip-sync", data, "video", kind="lip-sync")
+
+    async def ai_talking_photo(self, image_url: str, audio_url: str):
+        data = {
+            "assets": {
+                "image_url": image_url,
+                "audio_url": audio_url
+            }
+        }
+        return await self._generate("/ai-talking-photo", data, "video", kind="ai-talking-photo")
+
+    async def ai_voice_generator(self, text: str, voice_name: str = "Morgan Freeman",
+                                 name: str = "Voice Generator audio"):
+        data = {
+            "name": name,
+            "style": {
+                "prompt": text,
+                "voice_name": voice_name
+            }
+        }
+        return await self._generate("/ai-voice-generator", data, "audio", kind="voice")
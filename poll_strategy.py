@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+
+POLL_STATS_PATH = os.getenv("POLL_STATS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "poll_stats.json"))
+
+# Starting guesses (seconds) used until we have observed real renders
+DEFAULT_RENDER_SECONDS = {
+    "text-to-video": 90,
+    "image-to-video": 90,
+    "animation": 60,
+    "face-swap": 60,
+    "lip-sync": 90,
+    "ai-talking-photo": 90,
+    "veo": 120,
+}
+MAX_SAMPLES = 50
+# Renders finishing close together share one write of the stats file
+POLL_STATS_SAVE_DELAY = 5.0
+
+
+class AdaptivePollStrategy:
+    """Decides how long to wait before the next status check of a render.
+
+    Keeps the last MAX_SAMPLES observed render times per project kind (saved
+    to a small JSON file so they survive restarts). Polls rarely while the
+    render is far from its expected finish, densely around it, and backs off
+    with jitter once it runs late. Inside an event loop the file is written
+    on an executor thread, at most once per POLL_STATS_SAVE_DELAY.
+    """
+
+    def __init__(self, path: str = POLL_STATS_PATH, min_delay: float = 2.0, max_delay: float = 30.0):
+        self.path = path
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.samples = {}
+        self._save_handle = None
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.samples = {kind: [float(s) for s in values][-MAX_SAMPLES:] for kind, values in data.items()}
+        except FileNotFoundError:
+            self.samples = {}
+        except Exception as e:
+            print(f"Ignoring unreadable poll stats at {self.path}: {e}", flush=True)
+            self.samples = {}
+
+    def _snapshot(self) -> dict:
+        return {kind: list(values) for kind, values in self.samples.items()}
+
+    def _save(self, samples: dict):
+        try:
+            with self._save_lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(samples, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Failed to save poll stats: {e}", flush=True)
+
+    def _save_later(self):
+        self._save_handle = None
+        asyncio.get_running_loop().run_in_executor(None, self._save, self._snapshot())
+
+    def record(self, kind: str, seconds: float):
+        """Remember how long a finished render of this kind took"""
+        values = self.samples.setdefault(kind, [])
+        values.append(round(seconds, 1))
+        del values[:-MAX_SAMPLES]
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._save(self._snapshot())
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(POLL_STATS_SAVE_DELAY, self._save_later)
+
+    async def flush(self):
+        """Writes a pending save now (on shutdown)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+            await asyncio.get_running_loop().run_in_executor(None, self._save, self._snapshot())
+
+    def expected(self, kind: str) -> tuple:
+        """Return (expected_seconds, spread_seconds) for a project kind"""
+        values = self.samples.get(kind)
+        if not values:
+            default = DEFAULT_RENDER_SECONDS.get(kind, 90)
+            return float(default), default / 3
+        expected = statistics.median(values)
+        if len(values) >= 4:
+            spread = statistics.pstdev(values)
+        else:
+            spread = expected / 3
+        return expected, max(spread, 5.0)
+
+    def next_delay(self, kind: str, elapsed: float) -> float:
+        """Seconds to wait before checking a render that has run for `elapsed` seconds"""
+        expected, spread = self.expected(kind)
+        window_start = expected - spread
+        window_end = expected + spread
+
+        if elapsed < window_start:
+            # Early: sleep about half of the remaining time to the window
+            delay = (window_start - elapsed) / 2
+        elif elapsed <= window_end:
+            # Around the expected finish: poll densely (tighter for predictable kinds)
+            delay = spread / 6
+        else:
+            # Running late: exponential backoff with jitter
+            overdue = min((elapsed - window_end) / max(spread, 1.0), 20.0)
+            delay = self.min_delay * (1.5 ** overdue)
+            delay *= random.uniform(0.75, 1.25)
+        return max(self.min_delay, min(delay, self.max_delay))
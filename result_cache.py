@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from telemetry import counter, get_logger
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "2048"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL_HOURS", "168")) * 3600  # 1 week
+
+LOOKUPS = counter("clanker_cache_lookups_total", "Result cache lookups by namespace and result (hit or miss)")
+log = get_logger("cache")
+
+
+# Parameters holding prose, where case and spacing do not change the request.
+# Everything else (URLs, asset paths, IDs, voice names) is kept byte-exact.
+FREE_TEXT_FIELDS = {"prompt", "text", "topic"}
+
+
+def normalize_text(text: str) -> str:
+    """Trimmed, case- and whitespace-insensitive form of free text"""
+    return " ".join(text.split()).casefold()
+
+
+def normalize(value, field: str = None):
+    """Canonical form of request parameters: folded free text (see FREE_TEXT_FIELDS), float numbers"""
+    if isinstance(value, str):
+        return normalize_text(value) if field in FREE_TEXT_FIELDS else value
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        return {str(k): normalize(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v, field) for v in value]
+    return str(value)
+
+
+def _identity(stat):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class CacheEntry:
+    def __init__(self, key, value, files, created, expires):
+        self.key = key
+        self.value = value
+        self.files = files
+        self.created = created
+        self.expires = expires
+
+
+class ResultCache:
+    """
+    Content-addressed disk cache for generated results (scripts, audio, videos,
+    Magic Hour project results).
+
+    Entries are keyed by a SHA-256 of the namespace plus normalized request
+    parameters, so identical requests map to the same entry. Each entry is a
+    directory holding meta.json and any result files. Entries expire after
+    their TTL and the least recently used ones are evicted once the cache grows
+    past max_mb. Safe to use from the event loop and from executor threads.
+    """
+
+    def __init__(self, root: str = RESULT_CACHE_DIR, max_mb: float = RESULT_CACHE_MAX_MB,
+                 ttl: float = RESULT_CACHE_TTL):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = {}  # key -> [size_bytes, last_access]
+        self._scan()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _scan(self):
+        """Rebuild the size/last-access index from disk"""
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                entry_dir = os.path.join(shard_dir, key)
+                meta_path = os.path.join(entry_dir, "meta.json")
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        expired = json.load(f)["expires"] <= time.time()
+                except Exception:
+                    expired = True  # half-written or unreadable entry
+                if expired:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+                self._index[key] = [size, os.path.getmtime(meta_path)]
+
+    def key(self, namespace: str, params: dict) -> str:
+        blob = json.dumps({"namespace": namespace, "params": normalize(params)}, sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, params: dict):
+        """Returns the CacheEntry for these parameters, or None on a miss"""
+        key = self.key(namespace, params)
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        entry = None
+        stale = None  # identity of a meta.json that was read and found expired, incomplete or unreadable
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                identity = _identity(os.fstat(f.fileno()))
+                try:
+                    meta = json.load(f)
+                    files = [os.path.join(entry_dir, name) for name in meta["files"]]
+                    if meta["expires"] > time.time() and all(os.path.exists(path) for path in files):
+                        entry = CacheEntry(key, meta["value"], files, meta["created"], meta["expires"])
+                    else:
+                        stale = identity
+                except Exception as e:
+                    log.warning("dropping_unreadable_entry", key=key[:12], error=e)
+                    stale = identity
+        except OSError:
+            pass  # no entry, or a put() is replacing it right now
+
+        with self._lock:
+            if entry is None:
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                LOOKUPS.inc(namespace=namespace, result="miss")
+                if stale is not None and self._unchanged(meta_path, stale):
+                    self._remove(key)
+                return None
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+            LOOKUPS.inc(namespace=namespace, result="hit")
+            now = time.time()
+            if key in self._index:
+                self._index[key][1] = now
+        try:
+            os.utime(meta_path, (now, now))  # last access survives restarts
+        except OSError:
+            pass
+        log.info("hit", namespace=namespace, key=key[:12])
+        return entry
+
+    def put(self, namespace: str, params: dict, value=None, files=(), ttl: float = None):
+        """Stores a result (JSON-serializable value plus optional files) and returns its CacheEntry"""
+        key = self.key(namespace, params)
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        names = []
+        for path in files:
+            name = os.path.basename(path)
+            target = os.path.join(tmp_dir, name)
+            # Copy rather than hard-link: outputs may later be rewritten in place
+            shutil.copy2(path, target)
+            names.append(name)
+
+        now = time.time()
+        meta = {"namespace": namespace, "value": value, "files": names,
+                "created": now, "expires": now + (ttl if ttl is not None else self.ttl)}
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        size = sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir))
+        with self._lock:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            self._index[key] = [size, now]
+            self._evict()
+        return CacheEntry(key, value, [os.path.join(entry_dir, name) for name in names], now, meta["expires"])
+
+    @staticmethod
+    def _unchanged(meta_path, identity) -> bool:
+        """True while meta_path is still the file that was read (a put() in between writes a new one)"""
+        try:
+            return _identity(os.stat(meta_path)) == identity
+        except OSError:
+            return False
+
+    def _remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        self._index.pop(key, None)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes (lock held)"""
+        total = sum(size for size, _ in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": sum(size for size, _ in self._index.values()),
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> ResultCache:
+    """Process-wide cache shared by the bot and the lesson tools"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+    return _default_cache
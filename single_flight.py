@@ -0,0 +1,69 @@
+import asyncio
+
+from telemetry import counter, get_logger
+
+SHARED = counter("clanker_singleflight_shared_total", "Requests answered by joining an identical in-flight request")
+log = get_logger("single_flight")
+
+
+class _Flight:
+    def __init__(self):
+        self.task = None
+        self.listeners = []
+        self.last_status = None
+        self.callers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests into one upstream call.
+
+    The first caller for a key starts fn(publish); anyone who asks for the same
+    key while it is running awaits the same result instead of starting a
+    duplicate job. fn reports progress through publish(*status), which fans out
+    to every caller's own on_status listener (late joiners get the latest
+    status straight away). A caller being cancelled never cancels the shared
+    call for the others.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.shared = 0  # calls that piggybacked on an existing flight
+
+    async def do(self, key, fn, on_status=None):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+
+            async def publish(*status):
+                flight.last_status = status
+                for listener in list(flight.listeners):
+                    try:
+                        await listener(*status)
+                    except Exception as e:
+                        log.warning("status_listener_failed", error=e)
+
+            flight.task = asyncio.ensure_future(fn(publish))
+            flight.task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.shared += 1
+            SHARED.inc()
+            log.debug("joined", callers=flight.callers + 1)
+            if on_status is not None and flight.last_status is not None:
+                try:
+                    await on_status(*flight.last_status)
+                except Exception as e:
+                    log.warning("status_listener_failed", error=e)
+
+        if on_status is not None:
+            flight.listeners.append(on_status)
+        flight.callers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            if on_status is not None and on_status in flight.listeners:
+                flight.listeners.remove(on_status)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
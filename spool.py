@@ -0,0 +1,91 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+# Bytes kept in memory before the spool moves to a temp file on disk
+SPOOL_MAX_MEMORY = int(os.getenv("SPOOL_MAX_MEMORY_KB", "1024")) * 1024
+SPOOL_READ_SIZE = 64 * 1024
+
+
+class Spool:
+    """
+    Write-once byte buffer that can be read while it is still being written.
+
+    fill() drains an async iterator of chunks into a SpooledTemporaryFile (in
+    memory up to max_memory, then on disk), so chunks are never concatenated.
+    Each stream() call replays the data from the start and then follows the
+    writer until it finishes, so an upload can start on the first chunk and a
+    retry after a failed upload does not need the producer again.
+    """
+
+    def __init__(self, max_memory: int = SPOOL_MAX_MEMORY):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self.size = 0
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def fill(self, chunks):
+        """Writes every chunk from the async iterator; always marks the spool finished"""
+        try:
+            async for data in chunks:
+                if data:
+                    self.file.seek(0, os.SEEK_END)
+                    self.file.write(data)
+                    self.size += len(data)
+                    self._notify()
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.done = True
+            self._notify()
+
+    async def wait_for_data(self) -> bool:
+        """Waits for the first byte; False if the producer finished without writing any"""
+        while self.size == 0 and not self.done:
+            await self._changed.wait()
+        return self.size > 0
+
+    async def wait_done(self):
+        while not self.done:
+            await self._changed.wait()
+
+    async def stream(self, read_size: int = SPOOL_READ_SIZE):
+        position = 0
+        while True:
+            changed = self._changed
+            if position < self.size:
+                self.file.seek(position)
+                data = self.file.read(min(read_size, self.size - position))
+                position += len(data)
+                yield data
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+    def fileobj(self):
+        """
+        The finished contents as a rewound io.IOBase (BytesIO in memory, the
+        temp file once on disk), for APIs such as discord.File that require
+        one: SpooledTemporaryFile itself only subclasses it from Python 3.11.
+        """
+        self.file.seek(0)
+        return self.file._file
+
+    def save(self, path: str):
+        """Copies the finished contents to path (blocking; run it in an executor)"""
+        self.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(self.file, f)
+
+    def close(self):
+        self.file.close()
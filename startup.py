@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+# Where the hash of the last command tree synced to each guild is kept
+COMMAND_SYNC_PATH = os.getenv("COMMAND_SYNC_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 ".cache", "command_sync.json"))
+COMMAND_SYNC_CONCURRENCY = int(os.getenv("COMMAND_SYNC_CONCURRENCY", "5"))
+# Set to 1 to sync every guild even when the command tree has not changed
+COMMAND_SYNC_FORCE = os.getenv("COMMAND_SYNC_FORCE", "0") == "1"
+
+
+class StartupTimer:
+    """Collects how long each startup step took (imports, login, command sync)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self) -> str:
+        """Multi-line breakdown: imports and other steps one per line, guild syncs summarized"""
+        lines = [f"Startup timing ({time.perf_counter() - self.started:.2f}s since launch):"]
+        syncs = {}
+        for name, seconds in self.phases.items():
+            if name.startswith("sync "):
+                syncs[name[5:]] = seconds
+            else:
+                lines.append(f"  {name:<28}{seconds:>7.2f}s")
+        if syncs:
+            slowest = max(syncs, key=syncs.get)
+            lines.append(f"  {f'guild syncs ({len(syncs)}, summed)':<28}{sum(syncs.values()):>7.2f}s"
+                         f"  (slowest: {slowest} {syncs[slowest]:.2f}s)")
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer()
+
+
+class LazyModule:
+    """
+    A module imported the first time it is used instead of at startup.
+    Attribute access imports it on the spot; await aload() (or warm()) to do
+    the import on a worker thread so the event loop is not held up.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with startup_timer.phase(f"import {self.name}"):
+                        self._module = importlib.import_module(self.name)
+        return self._module
+
+    async def aload(self):
+        if self._module is not None:
+            return self._module
+        return await asyncio.get_running_loop().run_in_executor(None, self.load)
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+async def warm(modules):
+    """Imports lazy modules one after another in the background, logging failures"""
+    for module in modules:
+        try:
+            await module.aload()
+        except Exception as e:
+            print(f"CRITICAL ERROR importing {module.name}: {e}", flush=True)
+            traceback.print_exc()
+
+
+def _command_payload(command, tree) -> dict:
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()  # discord.py before 2.4 takes no tree
+
+
+def command_tree_hash(tree) -> str:
+    """Hash of the global command payloads, which is what gets copied to each guild"""
+    payload = sorted((_command_payload(command, tree) for command in tree.get_commands()), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CommandSync:
+    """
+    Syncs the command tree to guilds concurrently, skipping guilds that
+    already have this exact tree (per the hash stored on disk), so a restart
+    or reconnect with unchanged commands makes no sync calls at all.
+    """
+
+    def __init__(self, tree, path: str = COMMAND_SYNC_PATH, concurrency: int = COMMAND_SYNC_CONCURRENCY,
+                 force: bool = COMMAND_SYNC_FORCE):
+        self.tree = tree
+        self.path = path
+        self.concurrency = concurrency
+        self.force = force
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: dict):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    async def sync(self, guilds):
+        """Returns (synced, unchanged, failed) guild counts"""
+        digest = command_tree_hash(self.tree)
+        state = self._load()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sync_guild(guild):
+            # Always needed locally so the tree resolves the guild's commands
+            self.tree.copy_global_to(guild=guild)
+            key = f"{self.tree.client.application_id}:{guild.id}"
+            if not self.force and state.get(key) == digest:
+                return "unchanged"
+            async with semaphore:
+                with startup_timer.phase(f"sync {guild.name}"):
+                    await self.tree.sync(guild=guild)
+            state[key] = digest
+            print(f"Synced commands to {guild.name}", flush=True)
+            return "synced"
+
+        results = await asyncio.gather(*(sync_guild(guild) for guild in guilds), return_exceptions=True)
+        failed = 0
+        for guild, result in zip(guilds, results):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"Failed to sync commands to {guild.name}: {result}", flush=True)
+        self._save(state)
+        return results.count("synced"), results.count("unchanged"), failed
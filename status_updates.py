@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+
+import discord
+
+from telemetry import counter, get_logger
+
+# Edit pacing (overridable from .env). Discord allows about 5 edits per 5s
+# in a channel; going faster only buys 429s and backoff sleeps.
+STATUS_EDIT_INTERVAL = float(os.getenv("STATUS_EDIT_INTERVAL", "1.5"))  # min seconds between edits of one message
+STATUS_CHANNEL_BURST = int(os.getenv("STATUS_CHANNEL_BURST", "5"))
+STATUS_CHANNEL_WINDOW = 5.0
+STATUS_MAX_EDITS_PER_SECOND = float(os.getenv("STATUS_MAX_EDITS_PER_SECOND", "10"))  # across every channel
+
+EDITS = counter("clanker_status_edits_total", "Status message updates by result (sent, coalesced, failed)")
+log = get_logger("status")
+
+
+class StatusMessage:
+    """
+    A live status message. update() and report() only record the latest
+    state and return; the StatusBoard sends it when the message, its channel
+    and the bot are all under their edit limits, so a burst of updates turns
+    into one edit of the newest state.
+    """
+
+    def __init__(self, board, edit, channel_id=None, header: str = None):
+        self.board = board
+        self.edit = edit  # async (**kwargs), e.g. Message.edit or Interaction.edit_original_response
+        self.channel_id = channel_id
+        self.header = header
+        self.pending = None
+        self.in_flight = False
+        self.closed = False
+        # Tracked right after the message was sent (or the response deferred), which counts as a write
+        self.last_edit = time.monotonic()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def update(self, **kwargs):
+        """Replaces whatever has not been sent yet with these edit() arguments"""
+        if self.closed:
+            return
+        if self.pending is not None:
+            EDITS.inc(result="coalesced")
+        self.pending = kwargs
+        self._idle.clear()
+        self.board._schedule(self)
+
+    def report(self, stage: str, pct: float = None):
+        """Shows stage (and a percentage) under the header"""
+        line = stage if pct is None else f"{stage} ({pct:.0f}%)"
+        self.update(content=f"{self.header}\n{line}" if self.header else line)
+
+    async def flush(self):
+        """Waits until the latest state has been sent (or the message is gone)"""
+        await self._idle.wait()
+
+    async def close(self):
+        """Drops unsent updates and waits out an edit in progress, e.g. before deleting the message"""
+        self.closed = True
+        if self.pending is not None:
+            self.pending = None
+            if not self.in_flight:
+                self._idle.set()
+        await self._idle.wait()
+
+
+class StatusBoard:
+    """
+    One background task that sends every status edit in the bot.
+
+    Messages are edited at most once per interval, channels at most
+    channel_burst times per window and the bot at most max_per_second times
+    a second, so concurrent jobs share the edit budget instead of each
+    running into Discord's rate limits. Only the newest state of a message
+    is ever sent.
+    """
+
+    def __init__(self, interval: float = STATUS_EDIT_INTERVAL, channel_burst: int = STATUS_CHANNEL_BURST,
+                 channel_window: float = STATUS_CHANNEL_WINDOW, max_per_second: float = STATUS_MAX_EDITS_PER_SECOND):
+        self.interval = interval
+        self.channel_burst = channel_burst
+        self.channel_window = channel_window
+        self.max_per_second = max_per_second
+        self._dirty = {}  # insertion-ordered set of messages with something to send
+        self._channels = {}  # channel id -> deque of recent edit times
+        self._recent = deque()
+        self._edits = set()
+        self._wakeup = None
+        self._task = None
+
+    def track(self, edit, channel_id=None, header: str = None) -> StatusMessage:
+        return StatusMessage(self, edit, channel_id, header)
+
+    def _schedule(self, message: StatusMessage):
+        self._dirty[message] = None
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            # Not part of whichever command happened to start it (create_task copies the current context)
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+        self._wakeup.set()
+
+    @staticmethod
+    def _ready_at(times: deque, limit: float, window: float, now: float) -> float:
+        while times and times[0] <= now - window:
+            times.popleft()
+        return now if len(times) < limit else times[0] + window
+
+    def _next_slot(self, message: StatusMessage, now: float) -> float:
+        ready = max(message.last_edit + self.interval,
+                    self._ready_at(self._recent, self.max_per_second, 1.0, now))
+        if message.channel_id is not None:
+            times = self._channels.setdefault(message.channel_id, deque())
+            ready = max(ready, self._ready_at(times, self.channel_burst, self.channel_window, now))
+        return ready
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            wait = None
+            # Oldest first, so a chatty message cannot starve the others in its channel
+            for message in list(self._dirty):
+                if message.pending is None:
+                    del self._dirty[message]
+                    continue
+                if message.in_flight:
+                    continue
+                ready = self._next_slot(message, now)
+                if ready <= now:
+                    del self._dirty[message]
+                    self._start(message, now)
+                else:
+                    wait = ready - now if wait is None else min(wait, ready - now)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start(self, message: StatusMessage, now: float):
+        kwargs, message.pending = message.pending, None
+        message.in_flight = True
+        message.last_edit = now
+        self._recent.append(now)
+        if message.channel_id is not None:
+            self._channels[message.channel_id].append(now)
+            # Channels that have gone quiet do not need their history kept
+            for channel_id in [key for key, times in self._channels.items() if not times]:
+                del self._channels[channel_id]
+        task = asyncio.create_task(self._edit(message, kwargs))
+        self._edits.add(task)
+        task.add_done_callback(self._edits.discard)
+
+    async def _edit(self, message: StatusMessage, kwargs: dict):
+        try:
+            await message.edit(**kwargs)
+            EDITS.inc(result="sent")
+        except discord.NotFound:
+            message.closed = True
+            message.pending = None
+            EDITS.inc(result="failed")
+        except Exception as e:
+            EDITS.inc(result="failed")
+            log.warning("edit_failed", channel=message.channel_id, error=e)
+        finally:
+            message.in_flight = False
+            message.last_edit = time.monotonic()
+            if message.pending is not None and not message.closed:
+                self._dirty[message] = None
+            else:
+                message._idle.set()
+            self._wakeup.set()
+
+    async def close(self):
+        """Stops sending; unsent updates are dropped"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._edits):
+            task.cancel()
+        for message in self._dirty:
+            message.pending = None
+            message._idle.set()
+        self._dirty.clear()
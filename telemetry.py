@@ -0,0 +1,430 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import aiohttp
+
+# Local metrics endpoint (/metrics for Prometheus, /traces for recent spans); 0 turns it off
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+# Leveled logging: DEBUG shows every poll; each event logs at most LOG_RATE_LIMIT times per window
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # or "json"
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "20"))
+LOG_RATE_WINDOW = 10.0
+TRACE_BUFFER = 500
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(pairs, extra=()) -> str:
+    items = list(pairs) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()  # cache lookups and encodes report from executor threads
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines += self._render_value(key, value)
+        return lines
+
+    def _render_value(self, key, value) -> list:
+        return [f"{self.name}{_labels(key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, value: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key, state) -> list:
+        counts, total, count = state
+        lines = [f"{self.name}_bucket{_labels(key, [('le', f'{bound:g}')])} {n}"
+                 for bound, n in zip(self.buckets, counts)]
+        lines.append(f"{self.name}_bucket{_labels(key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_labels(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    """Named metrics, rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines += self._metrics[name].render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+
+# Tracing
+
+SPAN_SECONDS = histogram("clanker_span_seconds", "Duration of traced operations")
+_current_span = contextvars.ContextVar("current_span", default=None)
+recent_spans = deque(maxlen=TRACE_BUFFER)
+
+
+class Span:
+    def __init__(self, name: str, parent, attrs: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attrs = attrs
+        self.started = time.time()
+        self.duration = None
+        self.status = "running"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_id": self.parent_id, "started": self.started, "duration": self.duration,
+                "status": self.status, "attrs": self.attrs}
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times a block as a span of the current trace (a new trace when there is
+    none). Tasks started inside inherit it, so stages of a command nest
+    under the command. Durations also go to clanker_span_seconds{span=name}.
+    """
+    current = Span(name, _current_span.get(), attrs)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+        current.status = "ok"
+    except asyncio.CancelledError:
+        current.status = "cancelled"
+        raise
+    except BaseException as e:
+        current.status = "error"
+        current.attrs["error"] = str(e)[:200] or type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - started
+        SPAN_SECONDS.observe(current.duration, span=name, status=current.status)
+        recent_spans.append(current)
+
+
+def current_trace_id():
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
+
+
+def recent_traces(limit: int = 20) -> list:
+    """The latest finished spans grouped by trace, newest trace first"""
+    traces = {}
+    for finished in reversed(recent_spans):
+        if finished.trace_id not in traces:
+            if len(traces) >= limit:
+                continue
+            traces[finished.trace_id] = []
+        traces[finished.trace_id].append(finished.to_dict())
+    return [{"trace_id": trace_id, "spans": spans[::-1]} for trace_id, spans in traces.items()]
+
+
+# Event loop
+
+LOOP_LAG = histogram("clanker_event_loop_lag_seconds", "How late the event loop woke up for a timer",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+
+async def watch_loop_lag(interval: float = 0.25):
+    """Records how late each wakeup is; anything holding the loop (or the GIL) shows up here"""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - due))
+
+
+# Upstream HTTP
+
+UPSTREAM_SECONDS = histogram("clanker_upstream_request_seconds",
+                             "Time from sending an upstream request to its response headers")
+UPSTREAM_BYTES = counter("clanker_upstream_bytes_total", "Bytes sent to and received from upstream hosts")
+_ID_SEGMENT = re.compile(r"^(?:[0-9a-fA-F-]{8,}|\d+|(?=[A-Za-z_-]*\d)[A-Za-z0-9_-]{12,})$")
+_FILE_SEGMENT = re.compile(r"^[^.:]+\.[A-Za-z0-9]{1,5}$")
+
+
+def endpoint_label(path: str) -> str:
+    """
+    URL path with IDs folded into {id} (query strings, which may hold keys,
+    are never used). Downloads, i.e. paths ending in a file name, keep only
+    their first directory: /videos/{file}, since CDNs and asset hosts name
+    every file (and often its folders) differently.
+    """
+    parts = path.split("/")
+    if _FILE_SEGMENT.match(parts[-1]):
+        parts = parts[:2] + ["{file}"] if len(parts) > 2 else ["", "{file}"]
+    segments = []
+    for segment in parts:
+        stem, suffix = re.match(r"^([^.:]*)(.*)$", segment).groups()
+        segments.append("{id}" + suffix if _ID_SEGMENT.match(stem) else segment)
+    return "/".join(segments)
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """aiohttp hooks that time every request and count bytes per upstream host"""
+    async def on_start(session, ctx, params):
+        ctx.started = time.perf_counter()
+
+    def labels(params, status):
+        return {"host": params.url.host, "method": params.method,
+                "endpoint": endpoint_label(params.url.path), "status": status}
+
+    async def on_end(session, ctx, params):
+        UPSTREAM_SECONDS.observe(time.perf_counter() - ctx.started, **labels(params, params.response.status))
+        # Streamed downloads never pass through the response chunk hook, so count what was announced
+        if params.response.content_length:
+            UPSTREAM_BYTES.inc(params.response.content_length, host=params.url.host, direction="in")
+
+    async def on_exception(session, ctx, params):
+        UPSTREAM_SECONDS.observe(time.perf_counter() - ctx.started, **labels(params, "error"))
+
+    async def on_chunk_sent(session, ctx, params):
+        UPSTREAM_BYTES.inc(len(params.chunk), host=params.url.host, direction="out")
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    trace.on_request_exception.append(on_exception)
+    trace.on_request_chunk_sent.append(on_chunk_sent)
+    return trace
+
+
+# Logging
+
+class _RateLimit(logging.Filter):
+    """Lets each event through at most `limit` times per window; errors always pass"""
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._buckets = {}  # (logger, event) -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or self.limit <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None or now - bucket[0] >= self.window:
+            if bucket is not None and bucket[2]:
+                record.suppressed = bucket[2]
+            self._buckets[key] = [now, 1, 0]
+            return True
+        if bucket[1] < self.limit:
+            bucket[1] += 1
+            return True
+        bucket[2] += 1
+        return False
+
+
+class _EventFormatter(logging.Formatter):
+    def format(self, record):
+        fields = {name: value for name, value in getattr(record, "fields", {}).items() if value is not None}
+        if getattr(record, "suppressed", 0):
+            fields["suppressed"] = record.suppressed
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            fields["trace"] = trace_id
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+        source = record.name.split(".", 1)[-1]
+        if LOG_FORMAT == "json":
+            return json.dumps({"ts": round(record.created, 3), "level": record.levelname, "source": source,
+                               "event": record.getMessage(), **fields}, default=str)
+        parts = [time.strftime("%H:%M:%S", time.localtime(record.created)), record.levelname, source,
+                 record.getMessage()]
+        for name, value in fields.items():
+            text = str(value)
+            parts.append(f"{name}={json.dumps(text) if not text or ' ' in text or '=' in text else text}")
+        return " ".join(parts)
+
+
+_configured = False
+
+
+def _configure():
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    root = logging.getLogger("clanker")
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    root.propagate = False
+    # stdout, so these interleave with the existing print() output
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_EventFormatter())
+    handler.addFilter(_RateLimit(LOG_RATE_LIMIT, LOG_RATE_WINDOW))
+    root.addHandler(handler)
+
+
+class EventLogger:
+    """Structured logger: log.debug("poll", project=..., state=...) -> 'DEBUG poller poll project=... state=...'"""
+
+    def __init__(self, name: str):
+        _configure()
+        self._logger = logging.getLogger(f"clanker.{name}")
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info,
+                             extra={"fields": fields, "trace_id": current_trace_id()})
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info)
+
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(name)
+
+
+# Endpoint
+
+class MetricsServer:
+    """Serves /metrics (Prometheus text format) and /traces (recent spans as JSON) locally"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        if not self.port:
+            return
+        from aiohttp import web
+
+        async def metrics(request):
+            return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                                headers={"X-Content-Type-Options": "nosniff"})
+
+        async def traces(request):
+            try:
+                limit = max(0, int(request.query.get("limit") or "20"))
+            except ValueError:
+                return web.json_response({"error": "limit must be a whole number"}, status=400)
+            return web.json_response(recent_traces(limit), dumps=lambda data: json.dumps(data, default=str))
+
+        app = web.Application()
+        app.router.add_get("/metrics", metrics)
+        app.router.add_get("/traces", traces)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        get_logger("telemetry").info("metrics_endpoint", url=f"http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
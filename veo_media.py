@@ -0,0 +1,130 @@
+import base64
+import json
+import os
+import uuid
+
+VEO_OUTPUT_DIR = "outputs"
+VEO_READ_SIZE = 64 * 1024
+# Everything in a Veo response except the video itself is small
+MAX_JSON_BYTES = 1024 * 1024
+
+_PAYLOAD_KEY = b'"bytesBase64Encoded"'
+
+
+def _output_path(output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, f"veo_{uuid.uuid4().hex[:12]}.mp4")
+
+
+class _Base64File:
+    """Decodes base64 text written in arbitrary pieces straight into a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.pending = b""
+        self.size = 0
+
+    def write(self, text):
+        # JSON may escape "/" as "\/"; base64 itself never contains a backslash
+        text = self.pending + text.replace(b"\\", b"")
+        usable = len(text) // 4 * 4
+        self.pending = text[usable:]
+        if usable:
+            data = base64.b64decode(text[:usable])
+            self.file.write(data)
+            self.size += len(data)
+
+    def close(self):
+        try:
+            if self.pending:
+                data = base64.b64decode(self.pending + b"=" * (-len(self.pending) % 4))
+                self.file.write(data)
+                self.size += len(data)
+        finally:
+            self.file.close()
+
+
+async def read_veo_response(resp, output_dir: str = VEO_OUTPUT_DIR):
+    """
+    Parses a Veo JSON response without ever holding the video in memory.
+
+    Every bytesBase64Encoded value is decoded into its own file under
+    output_dir as it streams in and replaced by "" in the parsed JSON.
+    Returns (parsed_json, [video_paths]). Raises ValueError for malformed
+    responses (the partial files are removed).
+    """
+    text = bytearray()  # the response minus the base64 payloads
+    buf = b""
+    state = "json"
+    sink = None
+    paths = []
+    try:
+        async for chunk in resp.content.iter_chunked(VEO_READ_SIZE):
+            buf += chunk
+            while buf:
+                if state == "json":
+                    i = buf.find(_PAYLOAD_KEY)
+                    if i < 0:
+                        # Keep a tail in case the key is split across chunks
+                        cut = max(0, len(buf) - (len(_PAYLOAD_KEY) - 1))
+                        text += buf[:cut]
+                        buf = buf[cut:]
+                        break
+                    text += buf[:i + len(_PAYLOAD_KEY)]
+                    buf = buf[i + len(_PAYLOAD_KEY):]
+                    state = "open"
+                elif state == "open":
+                    # Skip ': "' up to the opening quote of the value
+                    j = buf.find(b'"')
+                    if j < 0:
+                        text += buf
+                        buf = b""
+                        break
+                    text += buf[:j + 1]
+                    buf = buf[j + 1:]
+                    sink = _Base64File(_output_path(output_dir))
+                    paths.append(sink.path)
+                    state = "payload"
+                else:
+                    j = buf.find(b'"')
+                    if j < 0:
+                        sink.write(buf)
+                        buf = b""
+                        break
+                    sink.write(buf[:j])
+                    sink.close()
+                    sink = None
+                    buf = buf[j:]  # the closing quote belongs to the JSON
+                    state = "json"
+            if len(text) > MAX_JSON_BYTES:
+                raise ValueError("Veo response is larger than expected")
+        text += buf
+        if state != "json":
+            raise ValueError("Veo response ended inside the video payload")
+        return json.loads(bytes(text)), paths
+    except ValueError:  # includes binascii.Error from bad base64
+        if sink is not None:
+            sink.file.close()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+
+async def download_veo_file(session, uri: str, api_key: str, output_dir: str = VEO_OUTPUT_DIR, timeout=None) -> str:
+    """Streams a Veo file reference (files/...:download URI) to disk and returns its path"""
+    if "key=" not in uri:
+        uri = f"{uri}{'&' if '?' in uri else '?'}key={api_key}"
+    path = _output_path(output_dir)
+    try:
+        async with session.get(uri, timeout=timeout) as resp:
+            resp.raise_for_status()
+            with open(path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(VEO_READ_SIZE):
+                    f.write(chunk)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path